@@ -0,0 +1,195 @@
+from backends import get_backend
+from cache import cached_query
+from migrations import METRICS
+from repository.base import cursor_frame, read_connection
+from snapshot import snapshot_connection
+
+# Mean of each metric, named after the metric so charts can use the same
+# column names as the raw evaluations table.
+_MEANS = ', '.join(f'{m}_sum / eval_count AS {m}' for m in METRICS)
+_RANGES = ', '.join(f'{m}_min, {m}_max' for m in METRICS)
+
+
+def _connection():
+    # Reports read the analytics snapshot once one exists, and the live
+    # database until then or when snapshots are off
+    conn = snapshot_connection()
+    return conn if conn is not None else read_connection()
+
+
+def _frame(query, params=()):
+    return cursor_frame(_connection().execute(query, params))
+
+
+def _stats_scope(manager_id, employee_id=None, *_, **__):
+    return employee_id, manager_id
+
+
+@cached_query('evaluations', _stats_scope)
+def get_employee_stats(manager_id, employee_id=None):
+    # One row per employee evaluated by this manager, from the
+    # pre-aggregated evaluation_stats_employee table
+    query = f'''SELECT employee_id, eval_count, final_count, {_MEANS}, {_RANGES}
+                FROM evaluation_stats_employee WHERE manager_id = ?'''
+    params = (manager_id,)
+    if employee_id is not None:
+        query += " AND employee_id = ?"
+        params += (int(employee_id),)
+    return _frame(query, params)
+
+
+# Date buckets for trend charts, finest first. Manager views of month and
+# coarser roll up the monthly stats table; everything else groups the raw
+# evaluations, which are indexed by (employee_id, review_date). review_date
+# is ISO text, so substr works on every backend; only weeks need date math.
+_RAW_BUCKETS = {
+    'day': "review_date",
+    'week': get_backend().week_bucket.format(column='review_date'),
+    'month': "substr(review_date, 1, 7)",
+    'quarter': "substr(review_date, 1, 4) || '-Q' || ((CAST(substr(review_date, 6, 2) AS INTEGER) + 2) / 3)",
+    'year': "substr(review_date, 1, 4)",
+}
+_PERIOD_BUCKETS = {
+    'month': "period",
+    'quarter': "substr(period, 1, 4) || '-Q' || ((CAST(substr(period, 6, 2) AS INTEGER) + 2) / 3)",
+    'year': "substr(period, 1, 4)",
+}
+BUCKETS = tuple(_RAW_BUCKETS)
+# Buckets the monthly stats table can serve
+PERIOD_BUCKETS = tuple(_PERIOD_BUCKETS)
+_ROLLED_MEANS = ', '.join(f'SUM({m}_sum) / SUM(eval_count) AS {m}' for m in METRICS)
+_RAW_MEANS = ', '.join(f'AVG({m}) AS {m}' for m in METRICS)
+_COMPLETE = ' AND '.join(f'{m} IS NOT NULL' for m in METRICS)
+_TEAM_MEANS = ', '.join(f's.{m}_sum / s.eval_count AS {m}' for m in METRICS)
+
+
+@cached_query('evaluations', _stats_scope)
+def get_team_averages(manager_id):
+    # Per-employee averages with names joined in SQL, one row per employee
+    query = f'''SELECT COALESCE(u.username, 'Employee ' || s.employee_id) AS employee_name,
+                       s.employee_id, s.eval_count, {_TEAM_MEANS}
+                FROM evaluation_stats_employee s
+                LEFT JOIN users u ON u.id = s.employee_id
+                WHERE s.manager_id = ?
+                ORDER BY employee_name'''
+    return _frame(query, (manager_id,))
+
+
+@cached_query('evaluations', _stats_scope)
+def get_score_summary(manager_id, employee_id=None):
+    # Evaluation count and overall metric means as a plain dict
+    query = f'''SELECT COALESCE(SUM(eval_count), 0) AS eval_count, {_ROLLED_MEANS}
+                FROM evaluation_stats_employee WHERE manager_id = ?'''
+    params = (manager_id,)
+    if employee_id is not None:
+        query += " AND employee_id = ?"
+        params += (int(employee_id),)
+    cursor = _connection().execute(query, params)
+    names = [d[0] for d in cursor.description]
+    return dict(zip(names, cursor.fetchone()))
+
+
+# Org roll-ups join the stats table to the org_closure subtree of one
+# manager, so a director's whole organisation is a single grouped query.
+# They are cached unscoped: a write by any manager below may change them.
+
+
+@cached_query('evaluations')
+def get_org_rollup(manager_id):
+    # One row per team under manager_id (their own included), nearest first
+    query = f'''SELECT s.manager_id, COALESCE(u.username, 'Manager ' || s.manager_id) AS manager_name, c.depth,
+                       COUNT(*) AS employees, SUM(s.eval_count) AS eval_count, {_ROLLED_MEANS}
+                FROM org_closure c
+                JOIN evaluation_stats_employee s ON s.manager_id = c.descendant_id
+                LEFT JOIN users u ON u.id = s.manager_id
+                WHERE c.ancestor_id = ?
+                GROUP BY s.manager_id, u.username, c.depth
+                ORDER BY c.depth, manager_name'''
+    return _frame(query, (int(manager_id),))
+
+
+@cached_query('evaluations')
+def get_org_summary(manager_id):
+    # Totals over the whole subtree as a plain dict, like get_score_summary
+    query = f'''SELECT COUNT(DISTINCT s.manager_id) AS teams, COUNT(DISTINCT s.employee_id) AS employees,
+                       COALESCE(SUM(s.eval_count), 0) AS eval_count, {_ROLLED_MEANS}
+                FROM org_closure c
+                JOIN evaluation_stats_employee s ON s.manager_id = c.descendant_id
+                WHERE c.ancestor_id = ?'''
+    cursor = _connection().execute(query, (int(manager_id),))
+    names = [d[0] for d in cursor.description]
+    return dict(zip(names, cursor.fetchone()))
+
+
+@cached_query('evaluations')
+def get_org_period_means(manager_id, bucket='month', start=None, end=None):
+    """Metric means per employee and date bucket over the subtree of
+    ``manager_id``, ordered by employee then bucket.
+
+    One grouped pass over evaluation_stats_period; an employee evaluated by
+    several managers in the subtree gets one row per bucket, weighted by
+    evaluation count. Only month and coarser buckets are available.
+    """
+    if bucket not in _PERIOD_BUCKETS:
+        raise ValueError(f"Unknown bucket: {bucket}")
+    window, window_params = _window('s.period', start, end, month=True)
+    query = f'''SELECT s.employee_id, {_PERIOD_BUCKETS[bucket]} AS bucket, SUM(s.eval_count) AS eval_count,
+                       {_ROLLED_MEANS}
+                FROM org_closure c
+                JOIN evaluation_stats_period s ON s.manager_id = c.descendant_id
+                WHERE c.ancestor_id = ?{window}
+                GROUP BY s.employee_id, bucket
+                ORDER BY s.employee_id, bucket'''
+    return _frame(query, (int(manager_id),) + window_params)
+
+
+def _window(column, start, end, month=False):
+    # Optional inclusive date range; the stats table only knows whole months
+    clauses, params = [], ()
+    for op, value in (('>=', start), ('<=', end)):
+        if value is not None:
+            value = str(value)
+            clauses.append(f" AND {column} {op} ?")
+            params += (value[:7] if month else value,)
+    return ''.join(clauses), params
+
+
+@cached_query('evaluations', _stats_scope)
+def get_score_trend(manager_id, employee_id, bucket='month', start=None, end=None):
+    """Metric means per date bucket for one employee, oldest first.
+
+    ``manager_id`` None covers evaluations from every manager (the
+    employee's own view). ``start``/``end`` limit the rows read to a date
+    window so charts only fetch what they show.
+    """
+    if bucket not in _RAW_BUCKETS:
+        raise ValueError(f"Unknown bucket: {bucket}")
+    if manager_id is not None and bucket in _PERIOD_BUCKETS:
+        window, window_params = _window('period', start, end, month=True)
+        query = f'''SELECT {_PERIOD_BUCKETS[bucket]} AS bucket, SUM(eval_count) AS eval_count, {_ROLLED_MEANS}
+                    FROM evaluation_stats_period
+                    WHERE manager_id = ? AND employee_id = ?{window}
+                    GROUP BY bucket ORDER BY bucket'''
+        return _frame(query, (manager_id, int(employee_id)) + window_params)
+    where, params = "employee_id = ?", (int(employee_id),)
+    if manager_id is not None:
+        where += " AND manager_id = ?"
+        params += (int(manager_id),)
+    window, window_params = _window('review_date', start, end)
+    query = f'''SELECT {_RAW_BUCKETS[bucket]} AS bucket, COUNT(*) AS eval_count, {_RAW_MEANS}
+                FROM evaluations
+                WHERE {where} AND {_COMPLETE}{window}
+                GROUP BY bucket ORDER BY bucket'''
+    return _frame(query, params + window_params)
+
+
+@cached_query('evaluations', _stats_scope)
+def get_evaluation_dates(manager_id, employee_id):
+    # (first, last) review_date for the date-range picker, or (None, None).
+    # Read live: an index probe, and the picker must cover new evaluations
+    where, params = "employee_id = ?", (int(employee_id),)
+    if manager_id is not None:
+        where += " AND manager_id = ?"
+        params += (int(manager_id),)
+    query = f"SELECT MIN(review_date), MAX(review_date) FROM evaluations WHERE {where}"
+    return tuple(read_connection().execute(query, params).fetchone())
@@ -0,0 +1,343 @@
+"""JSON API over the performance data for HRIS and reporting integrations.
+
+Runs on its own (``python api.py --port 8600``) or inside the Streamlit
+server when PERF_API_PORT is set. Every request authenticates with HTTP
+Basic using an app account and sees what that user sees in the UI::
+
+    GET  /api/me
+    GET  /api/evaluations   ?cursor=&limit=
+    POST /api/evaluations   {"employee_id", "quality", "punctuality", "teamwork", "targets", "comments"}
+    GET  /api/goals | /api/feedback | /api/meetings | /api/training   ?employee_id=&cursor=&limit=
+
+Managers may narrow the last four to one of their employees with
+``employee_id``.
+
+List responses are ``{"items": [...], "next_cursor": ...}``; pass
+``next_cursor`` back as ``cursor`` for the next page. Responses carry an
+ETag and Last-Modified, so a poller that sends If-None-Match or
+If-Modified-Since gets an empty 304 while the data is unchanged, and are
+gzipped for clients that accept it.
+"""
+import argparse
+import base64
+import binascii
+import gzip
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from log import get_logger
+from repository import (PAGE_SIZE, authenticate_user, get_evaluations_page, get_feedback_page, get_goals_page,
+                        get_meetings_page, get_team_employees, get_training_page, save_evaluation)
+from writer import write_session
+
+API_PORT = os.environ.get('PERF_API_PORT')
+MAX_LIMIT = 200
+MAX_BODY_BYTES = 64 * 1024
+# Smaller bodies are not worth the CPU to compress
+GZIP_MIN_BYTES = 1024
+# How long a POST waits for the writer to commit before answering 202
+WRITE_TIMEOUT = 10.0
+
+log = get_logger('api')
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# --- Cursors ---
+# Page cursors are the repository's keyset tuples, sent as opaque base64url.
+# Each endpoint knows the shape of its own keyset:
+EVALUATION_CURSOR = (str, int)  # (review_date, id)
+ID_CURSOR = (int,)  # (id,)
+
+
+def encode_cursor(cursor):
+    if cursor is None:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(list(cursor)).encode()).decode().rstrip('=')
+
+
+def decode_cursor(text, types):
+    """The keyset tuple in ``text``, which must hold exactly one value of
+    each of ``types``; anything else is a 400 rather than a query error."""
+    if not text:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(text + '=' * (-len(text) % 4)))
+    except (binascii.Error, ValueError):
+        raise ApiError(400, "Malformed cursor")
+    # type() rather than isinstance(), so true/false do not pass for ids
+    if (not isinstance(values, list) or len(values) != len(types)
+            or not all(type(value) is expected for value, expected in zip(values, types))):
+        raise ApiError(400, "Malformed cursor")
+    return tuple(values)
+
+
+# --- Conditional GET ---
+class FirstSeen:
+    """Remembers when each ETag was first served, as its Last-Modified.
+
+    The tables carry no modification times, so the first time this server
+    produced a representation is the best honest answer; it only moves when
+    the content does.
+    """
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, etag):
+        with self._lock:
+            seen = self._seen.setdefault(etag, int(time.time()))
+            self._seen.move_to_end(etag)
+            while len(self._seen) > self.maxsize:
+                self._seen.popitem(last=False)
+            return seen
+
+
+first_seen = FirstSeen()
+
+
+def make_etag(body):
+    # Weak, because the same entity may go out gzipped or not
+    return f'W/"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+
+
+def not_modified(headers, etag, last_modified):
+    # If-None-Match wins over If-Modified-Since when both are sent (RFC 9110)
+    if_none_match = headers.get('If-None-Match')
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        return '*' in tags or etag in tags or etag[2:] in tags
+    if_modified_since = headers.get('If-Modified-Since')
+    if if_modified_since:
+        try:
+            return last_modified <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+# --- JSON ---
+def _json_value(value):
+    if hasattr(value, 'item'):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def frame_items(df):
+    return [{column: _json_value(value) for column, value in zip(df.columns, row)}
+            for row in df.itertuples(index=False, name=None)]
+
+
+# --- Handlers ---
+def _limit(query):
+    try:
+        limit = int(query.get('limit', PAGE_SIZE))
+    except ValueError:
+        raise ApiError(400, "limit must be an integer")
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def _scope(user, query):
+    """(employee_id, manager_id) a list request is limited to."""
+    if user.role == 'employee':
+        return user.id, user.manager_id
+    if user.role != 'manager':
+        raise ApiError(403, "Only employees and managers can read evaluation data")
+    employee_id = query.get('employee_id')
+    if employee_id is None:
+        return None, user.id
+    try:
+        employee_id = int(employee_id)
+    except ValueError:
+        raise ApiError(400, "employee_id must be an integer")
+    if employee_id not in {member.id for member in get_team_employees(user.id)}:
+        raise ApiError(403, "Not one of your team members")
+    return employee_id, user.id
+
+
+def _page(fetch_page, cursor_types=ID_CURSOR):
+    def handler(user, query):
+        employee_id, manager_id = _scope(user, query)
+        cursor = decode_cursor(query.get('cursor'), cursor_types)
+        df, cursor = fetch_page(user, employee_id, manager_id, cursor, _limit(query))
+        return 200, {'items': frame_items(df), 'next_cursor': encode_cursor(cursor)}
+    return handler
+
+
+def _evaluations_page(user, employee_id, manager_id, cursor, limit):
+    # Evaluation pages are keyed per employee or per manager, not per pair
+    if user.role == 'employee':
+        return get_evaluations_page(user.id, 'employee', user.id, cursor, limit)
+    if employee_id is not None:
+        raise ApiError(400, "employee_id is not supported for evaluations")
+    return get_evaluations_page(None, 'manager', manager_id, cursor, limit)
+
+
+def _pair_page(get_page):
+    return lambda user, employee_id, manager_id, cursor, limit: get_page(
+        employee_id, user.role, manager_id, cursor, limit)
+
+
+def me(user, query):
+    return 200, {'id': user.id, 'role': user.role, 'manager_id': user.manager_id}
+
+
+def create_evaluation(user, body):
+    if user.role != 'manager':
+        raise ApiError(403, "Only managers can save evaluations")
+    try:
+        employee_id = int(body['employee_id'])
+        scores = [float(body[metric]) for metric in ('quality', 'punctuality', 'teamwork', 'targets')]
+    except KeyError as e:
+        raise ApiError(400, f"Missing field {e.args[0]}")
+    except (TypeError, ValueError):
+        raise ApiError(400, "employee_id and scores must be numbers")
+    if not all(0.0 <= score <= 5.0 for score in scores):
+        raise ApiError(400, "Scores must be between 0 and 5")
+    if employee_id not in {member.id for member in get_team_employees(user.id)}:
+        raise ApiError(403, "Not one of your team members")
+    future = save_evaluation(employee_id, user.id, *scores, str(body.get('comments', '')))
+    try:
+        return 201, {'id': future.result(WRITE_TIMEOUT)}
+    except TimeoutError:
+        return 202, {'status': 'queued'}
+
+
+GET_ROUTES = {
+    '/api/me': me,
+    '/api/evaluations': _page(_evaluations_page, EVALUATION_CURSOR),
+    '/api/goals': _page(_pair_page(get_goals_page)),
+    '/api/feedback': _page(_pair_page(get_feedback_page)),
+    '/api/meetings': _page(_pair_page(get_meetings_page)),
+    '/api/training': _page(_pair_page(get_training_page)),
+}
+POST_ROUTES = {
+    '/api/evaluations': create_evaluation,
+}
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    server_version = 'PerfAPI/1.0'
+
+    def _user(self):
+        header = self.headers.get('Authorization', '')
+        if header.startswith('Basic '):
+            try:
+                username, _, password = base64.b64decode(header[6:]).decode('utf-8').partition(':')
+            except (binascii.Error, UnicodeDecodeError):
+                username = password = None
+            user = authenticate_user(username, password) if username else None
+            if user:
+                return user
+        raise ApiError(401, "Authentication required")
+
+    def _dispatch(self, routes, call):
+        started = time.perf_counter()
+        url = urlsplit(self.path)
+        try:
+            handler = routes.get(url.path.rstrip('/'))
+            if handler is None:
+                raise ApiError(404, "No such endpoint")
+            user = self._user()
+            # Each account gets read-your-writes across its own requests
+            with write_session(f'api:{user.id}'):
+                status, payload = call(handler, user, url)
+        except ApiError as e:
+            status, payload = e.status, {'error': str(e)}
+        except Exception:
+            log.exception('api_error', method=self.command, path=url.path)
+            status, payload = 500, {'error': "Internal error"}
+        self._send(status, payload)
+        log.debug('api_request', method=self.command, path=url.path, status=status,
+                  ms=round((time.perf_counter() - started) * 1000, 2))
+
+    def do_GET(self):
+        def call(handler, user, url):
+            query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            return handler(user, query)
+        self._dispatch(GET_ROUTES, call)
+
+    def do_POST(self):
+        def call(handler, user, url):
+            length = int(self.headers.get('Content-Length') or 0)
+            if length > MAX_BODY_BYTES:
+                raise ApiError(413, "Request body too large")
+            try:
+                body = json.loads(self.rfile.read(length) or b'{}')
+            except ValueError:
+                raise ApiError(400, "Body must be JSON")
+            if not isinstance(body, dict):
+                raise ApiError(400, "Body must be a JSON object")
+            return handler(user, body)
+        self._dispatch(POST_ROUTES, call)
+
+    def _send(self, status, payload):
+        body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        headers = {'Content-Type': 'application/json'}
+        if status == 401:
+            headers['WWW-Authenticate'] = 'Basic realm="perf", charset="UTF-8"'
+        if self.command == 'GET' and status == 200:
+            etag = make_etag(body)
+            last_modified = first_seen.get(etag)
+            headers.update({'ETag': etag, 'Last-Modified': formatdate(last_modified, usegmt=True),
+                            'Cache-Control': 'private, no-cache', 'Vary': 'Authorization, Accept-Encoding'})
+            if not_modified(self.headers, etag, last_modified):
+                status, body = 304, b''
+        if len(body) >= GZIP_MIN_BYTES and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body, compresslevel=6)
+            headers['Content-Encoding'] = 'gzip'
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if status != 304:
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # requests are logged by _dispatch
+
+
+def start_api_server(port, host='127.0.0.1'):
+    """Serve the API on a daemon thread. Binds to localhost unless told
+    otherwise; put TLS in front of it before exposing Basic auth."""
+    server = ThreadingHTTPServer((host, int(port)), ApiHandler)
+    threading.Thread(target=server.serve_forever, name='api-http', daemon=True).start()
+    log.info('api_server_started', host=host, port=int(port))
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the performance data as a JSON API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=int(API_PORT or 8600))
+    args = parser.parse_args(argv)
+    from db import get_connection
+    from migrations import migrate
+    migrate(get_connection())
+    server = ThreadingHTTPServer((args.host, args.port), ApiHandler)
+    log.info('api_server_started', host=args.host, port=args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
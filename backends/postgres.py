@@ -0,0 +1,198 @@
+import functools
+import re
+import time
+from contextlib import contextmanager
+
+from metrics import observe
+
+try:
+    import psycopg2
+    import psycopg2.extensions
+except ImportError:  # only needed when the postgres backend is configured
+    psycopg2 = None
+
+# Tables with an identity id column. INSERTs into them get RETURNING id so
+# cursor.lastrowid works as it does with sqlite3.
+_ID_TABLES = {'users', 'evaluations', 'goals', 'feedback', 'self_evaluations', 'documents', 'meetings', 'training'}
+_INSERT_INTO = re.compile(r'\s*INSERT\s+INTO\s+(\w+)', re.IGNORECASE)
+# Any constant works; it only has to be the same in every process
+_MIGRATION_LOCK_KEY = 0x70657266
+
+
+@functools.lru_cache(maxsize=1024)
+def _translate(sql, has_params, single):
+    # qmark -> psycopg2's format style. psycopg2 only interpolates when
+    # parameters are passed, so literal % signs are escaped only then.
+    statement = sql.replace('%', '%%').replace('?', '%s') if has_params else sql
+    match = _INSERT_INTO.match(sql)
+    returns_id = bool(single and match and match.group(1).lower() in _ID_TABLES
+                      and 'RETURNING' not in sql.upper())
+    if returns_id:
+        statement += ' RETURNING id'
+    return statement, returns_id
+
+
+class PgCursor:
+    """sqlite3-style cursor over a psycopg2 cursor.
+
+    psycopg2's default cursors pull the whole result at execute time, so
+    the timing recorded for metrics already includes the fetch.
+    """
+
+    def __init__(self, conn):
+        self.connection = conn
+        self._cursor = conn.raw.cursor()
+        self._returned_id = False
+        self.lastrowid = None
+        self.arraysize = 1
+
+    @property
+    def description(self):
+        return None if self._returned_id else self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def _run(self, method, sql, params, single):
+        statement, self._returned_id = _translate(sql, bool(params), single)
+        start = time.perf_counter()
+        try:
+            method(statement, params if params else None)
+        except psycopg2.Error:
+            observe(sql, time.perf_counter() - start, 0, error=True)
+            raise
+        rows = max(self._cursor.rowcount, 0)
+        observe(sql, time.perf_counter() - start, rows,
+                explain=lambda: self.connection.explain(statement, params) if single else [])
+        if self._returned_id:
+            row = self._cursor.fetchone()
+            self.lastrowid = row[0] if row else None
+        return self
+
+    def execute(self, sql, params=()):
+        return self._run(self._cursor.execute, sql, tuple(params), True)
+
+    def executemany(self, sql, seq_of_params):
+        return self._run(self._cursor.executemany, sql, [tuple(p) for p in seq_of_params], False)
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size=None):
+        return self._cursor.fetchmany(self.arraysize if size is None else size)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def close(self):
+        self._cursor.close()
+
+
+class PgConnection:
+    """sqlite3-style connection over a psycopg2 connection.
+
+    The underlying connection runs in autocommit mode, so plain reads never
+    leave a transaction open; ``with conn:`` opens one explicitly and
+    commits or rolls it back like sqlite3 does.
+    """
+
+    def __init__(self, raw):
+        self.raw = raw
+
+    def cursor(self):
+        return PgCursor(self)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+    @property
+    def in_transaction(self):
+        return self.raw.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def _command(self, sql):
+        with self.raw.cursor() as cursor:
+            cursor.execute(sql)
+
+    def commit(self):
+        if self.in_transaction:
+            self._command('COMMIT')
+
+    def rollback(self):
+        if self.in_transaction:
+            self._command('ROLLBACK')
+
+    def __enter__(self):
+        if not self.in_transaction:
+            self._command('BEGIN')
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
+
+    def explain(self, statement, params):
+        try:
+            with self.raw.cursor() as cursor:
+                cursor.execute('EXPLAIN ' + statement, params if params else None)
+                return [row[0] for row in cursor.fetchall()]
+        except psycopg2.Error as e:
+            return [f"(plan unavailable: {e})"]
+
+    def close(self):
+        self.raw.close()
+
+
+class PostgresBackend:
+    name = 'postgres'
+    week_bucket = "to_char(CAST({column} AS date), 'IYYY-\"W\"IW')"
+
+    def __init__(self, settings):
+        if psycopg2 is None:
+            raise RuntimeError("The postgres backend needs psycopg2 (pip install psycopg2-binary)")
+        if not settings.get('url'):
+            raise ValueError("The postgres backend needs a connection url (PERF_DB_URL)")
+        self.url = settings['url']
+        self.location = re.sub(r'//([^:/@]+):[^@]*@', r'//\1:***@', self.url)
+        self.max_idle = int(settings.get('max_idle', 8))
+        self.Error = psycopg2.Error
+        self.IntegrityError = psycopg2.IntegrityError
+
+    def connect(self):
+        raw = psycopg2.connect(self.url)
+        raw.autocommit = True
+        return PgConnection(raw)
+
+    # The applied migration version lives in a one-row schema_version table
+    def get_schema_version(self, conn):
+        if conn.execute("SELECT to_regclass('schema_version')").fetchone()[0] is None:
+            return 0
+        row = conn.execute('SELECT version FROM schema_version').fetchone()
+        return row[0] if row else 0
+
+    def set_schema_version(self, conn, version):
+        conn.execute('CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)')
+        conn.execute('DELETE FROM schema_version')
+        conn.execute('INSERT INTO schema_version (version) VALUES (?)', (int(version),))
+
+    @contextmanager
+    def transaction(self, conn):
+        with conn:
+            yield
+
+    @contextmanager
+    def migration_lock(self, conn):
+        # A transaction-scoped advisory lock serialises migrating processes;
+        # PostgreSQL DDL is transactional, so a failure leaves no trace
+        with conn:
+            conn.execute('SELECT pg_advisory_xact_lock(?)', (_MIGRATION_LOCK_KEY,))
+            yield
@@ -0,0 +1,62 @@
+import sqlite3
+from contextlib import contextmanager
+
+from metrics import connection_factory
+
+# Applied once to every new connection. WAL lets readers run alongside the
+# single writer, and NORMAL sync is safe under WAL while avoiding an fsync
+# per commit.
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA mmap_size = 134217728",
+)
+
+
+class SQLiteBackend:
+    name = 'sqlite'
+    Error = sqlite3.Error
+    IntegrityError = sqlite3.IntegrityError
+    # ISO-ish week label; %W counts weeks from the first Monday of the year
+    week_bucket = "strftime('%Y-W%W', {column})"
+
+    def __init__(self, settings):
+        self.path = settings.get('path', 'performance.db')
+        self.location = self.path
+        self.max_idle = int(settings.get('max_idle', 8))
+
+    def connect(self):
+        # A larger statement cache lets the repository's fixed SQL strings
+        # stay prepared across calls; the factory adds query timing
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5.0, cached_statements=256,
+                               factory=connection_factory())
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    # The applied migration version lives in PRAGMA user_version, so
+    # checking for pending work is a single read that takes no write lock.
+    def get_schema_version(self, conn):
+        return conn.execute('PRAGMA user_version').fetchone()[0]
+
+    def set_schema_version(self, conn, version):
+        conn.execute(f'PRAGMA user_version = {int(version)}')
+
+    @contextmanager
+    def transaction(self, conn):
+        # BEGIN IMMEDIATE takes the write lock up front instead of at the
+        # first write, so a transaction never fails halfway on a busy lock
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def migration_lock(self, conn):
+        # Two processes starting together migrate one after the other
+        return self.transaction(conn)
@@ -0,0 +1,12 @@
+"""Synthetic data and benchmarks for the performance database and app.
+
+Run from the repository root against a scratch database, never the real
+one, since the write benchmarks insert rows::
+
+    PERF_DB_PATH=bench.db python -m benchmarks.datagen --managers 50 --employees 10 --years 3
+    PERF_DB_PATH=bench.db python -m benchmarks.bench_repository --json repo.json
+    PERF_DB_PATH=bench.db python -m benchmarks.bench_dashboards --json dash.json
+
+Pass ``--baseline <earlier json>`` to either benchmark to fail (exit 1) when
+a case's p95 got slower than the baseline by more than ``--tolerance``.
+"""
@@ -0,0 +1,77 @@
+import ast
+import os
+import sys
+
+from streamlit.testing.v1 import AppTest
+
+from benchmarks.datagen import employee_name, find_user_id, manager_name
+from benchmarks.timing import finish, measure, new_parser
+from cache import query_cache
+from db import get_connection
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'pradeep_app.py')
+
+
+def _logged_in(role, user_id, manager_id):
+    # Session state as auth_page leaves it after a successful login
+    at = AppTest.from_file(APP, default_timeout=120)
+    at.session_state['user_id'] = user_id
+    at.session_state['role'] = role
+    at.session_state['manager_id'] = manager_id
+    return at
+
+
+def _run(at):
+    at.run()
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+
+
+def _tab_names(role):
+    # Keys of EMPLOYEE_TABS/MANAGER_TABS, read from the source: importing
+    # the app would run it outside Streamlit and leave its widget state
+    # behind for the AppTest runs
+    name = f'{role.upper()}_TABS'
+    with open(APP, encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(getattr(t, 'id', None) == name for t in node.targets):
+            return [ast.literal_eval(key) for key in node.value.keys]
+    raise LookupError(f"{name} not found in {APP}")
+
+
+def dashboard_cases(role, user_id, manager_id):
+    """One case per dashboard tab: a full script run with that tab selected.
+
+    AppTest runs the script in this process, so the app shares the
+    connection pool and query cache with the benchmark.
+    """
+    router_key = f'{role}_tab'
+    cases = []
+    # The radio shows tab names with unread badges, so take the names from
+    # the tab tables themselves
+    for tab in _tab_names(role):
+        at = _logged_in(role, user_id, manager_id)
+        at.session_state[router_key] = tab
+        cases.append((f"{role}_dashboard[{tab}]", lambda at=at: _run(at)))
+    return cases
+
+
+def main(argv=None):
+    parser = new_parser("Time full dashboard renders through Streamlit's AppTest")
+    parser.set_defaults(repeat=10)
+    parser.add_argument('--warm', action='store_true', help="let reads hit the query cache instead of clearing it")
+    args = parser.parse_args(argv)
+
+    conn = get_connection()
+    manager_id = find_user_id(conn, manager_name(0))
+    employee_id = find_user_id(conn, employee_name(0, 0))
+    cases = dashboard_cases('employee', employee_id, manager_id) + dashboard_cases('manager', manager_id, None)
+    setup = None if args.warm else query_cache.clear
+    results = [measure(name, func, args.repeat, warmup=1, setup=setup) for name, func in cases
+               if not args.filter or args.filter in name]
+    return finish(args, results)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,101 @@
+import itertools
+import sys
+from datetime import date, datetime, timedelta
+
+from analytics import get_org_rollup, get_org_summary, get_score_summary, get_score_trend, get_team_averages
+from benchmarks.datagen import PASSWORD, employee_name, find_user_id, manager_name
+from benchmarks.timing import finish, measure, new_parser
+from cache import query_cache
+from db import get_connection
+from repository import (authenticate_user, find_meeting_conflict, get_all_reports, get_calendar, get_documents,
+                        get_evaluations, get_evaluations_page, get_feedback, get_feedback_page, get_goals,
+                        get_managers, get_meetings, get_meetings_page, get_new_changes, get_unread_counts,
+                        get_self_evaluations, get_team_employees, get_training, get_training_page, save_evaluation,
+                        save_feedback, save_goal, save_self_evaluation, save_training, schedule_meeting, search_page)
+from trends import get_team_trends
+
+
+def read_cases(employee_id, manager_id):
+    e, m = employee_id, manager_id
+    return [
+        ('authenticate_user', lambda: authenticate_user(employee_name(0, 0), PASSWORD)),
+        ('get_managers', get_managers),
+        ('get_team_employees', lambda: get_team_employees(m)),
+        ('get_all_reports', lambda: get_all_reports(m)),
+        ('get_evaluations[employee]', lambda: get_evaluations(e, 'employee', e)),
+        ('get_evaluations[manager]', lambda: get_evaluations(None, 'manager', m)),
+        ('get_evaluations_page[manager]', lambda: get_evaluations_page(None, 'manager', m)),
+        ('get_goals[employee]', lambda: get_goals(e, 'employee', m)),
+        ('get_goals[manager]', lambda: get_goals(None, 'manager', m)),
+        ('get_feedback[manager]', lambda: get_feedback(None, 'manager', m)),
+        ('get_feedback_page[employee]', lambda: get_feedback_page(e, 'employee', m)),
+        ('get_meetings[manager]', lambda: get_meetings(None, 'manager', m)),
+        ('get_meetings_page[employee]', lambda: get_meetings_page(e, 'employee', m)),
+        ('get_calendar[month]', lambda: get_calendar(m, date.today() - timedelta(days=30), date.today())),
+        ('find_meeting_conflict', lambda: find_meeting_conflict(e, m, '2030-01-01 09:00', '2030-01-01 10:00')),
+        ('get_training[manager]', lambda: get_training(None, 'manager', m)),
+        ('get_training_page[employee]', lambda: get_training_page(e, 'employee', m)),
+        ('get_self_evaluations[manager]', lambda: get_self_evaluations(None, 'manager', m)),
+        ('get_documents', lambda: get_documents(e)),
+        ('get_unread_counts', lambda: get_unread_counts(e)),
+        ('get_new_changes', lambda: get_new_changes(e)),
+        ('get_team_averages', lambda: get_team_averages(m)),
+        ('get_score_summary', lambda: get_score_summary(m)),
+        ('get_org_rollup', lambda: get_org_rollup(m)),
+        ('get_org_summary', lambda: get_org_summary(m)),
+        ('get_score_trend[month]', lambda: get_score_trend(m, e)),
+        ('get_score_trend[week]', lambda: get_score_trend(m, e, 'week')),
+        ('get_team_trends[month]', lambda: get_team_trends(m)),
+        ('get_team_trends[quarter]', lambda: get_team_trends(m, 'quarter')),
+        ('search_page[manager]', lambda: search_page('teamwork deadline', 'manager', m)),
+    ]
+
+
+def meeting_slots(manager_id):
+    # Back-to-back half hours after the manager's last meeting, so repeated
+    # runs never book a slot that is already taken
+    latest = get_connection().execute('SELECT MAX(ends_at) FROM meetings WHERE manager_id = ?',
+                                      (manager_id,)).fetchone()[0]
+    start = max(datetime.fromisoformat(latest), datetime(2030, 1, 1)) if latest else datetime(2030, 1, 1)
+    return (start + timedelta(minutes=30 * i) for i in itertools.count())
+
+
+def write_cases(employee_id, manager_id):
+    # Saves are queued on the writer thread; waiting on the Future times
+    # the full round trip to the commit
+    e, m = employee_id, manager_id
+    slots = meeting_slots(m)
+
+    def schedule():
+        starts_at = next(slots)
+        return schedule_meeting(e, m, starts_at, starts_at + timedelta(minutes=30), 'Benchmark meeting').result()
+    return [
+        ('save_evaluation', lambda: save_evaluation(e, m, 3, 4, 3.5, 4, 'Benchmark evaluation comment').result()),
+        ('save_goal', lambda: save_goal(e, m, 'Benchmark goal').result()),
+        ('save_feedback', lambda: save_feedback(e, m, 'Benchmark feedback message').result()),
+        ('schedule_meeting', schedule),
+        ('save_training', lambda: save_training(e, m, 'Benchmark training').result()),
+        ('save_self_evaluation', lambda: save_self_evaluation(e, 'Benchmark self-evaluation').result()),
+    ]
+
+
+def main(argv=None):
+    parser = new_parser("Time every repository and analytics function")
+    parser.add_argument('--warm', action='store_true', help="let reads hit the query cache instead of clearing it")
+    parser.add_argument('--no-writes', action='store_true', help="skip the save_* cases, which insert rows")
+    args = parser.parse_args(argv)
+
+    conn = get_connection()
+    manager_id = find_user_id(conn, manager_name(0))
+    employee_id = find_user_id(conn, employee_name(0, 0))
+    setup = None if args.warm else query_cache.clear
+    cases = [(name, func, setup) for name, func in read_cases(employee_id, manager_id)]
+    if not args.no_writes:
+        cases += [(name, func, None) for name, func in write_cases(employee_id, manager_id)]
+    results = [measure(name, func, args.repeat, setup=setup) for name, func, setup in cases
+               if not args.filter or args.filter in name]
+    return finish(args, results)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,159 @@
+import argparse
+import random
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+from db import DB_LOCATION, get_connection
+from migrations import migrate
+from repository.meetings import TIME_FORMAT
+
+# Every generated account uses this password so the dashboard benchmark can
+# log in as any of them
+PASSWORD = 'pass123'
+BATCH_SIZE = 5000
+
+_WORDS = ('excellent', 'solid', 'needs', 'improvement', 'communication', 'delivery', 'quality', 'leadership',
+          'initiative', 'teamwork', 'deadline', 'customer', 'ownership', 'mentoring', 'planning', 'testing',
+          'documentation', 'presentation', 'reliable', 'proactive', 'consistent', 'growth', 'feedback', 'goals')
+_PROGRAMS = ('Python 101', 'Advanced SQL', 'Leadership Essentials', 'Public Speaking', 'Time Management',
+             'Data Visualization', 'Conflict Resolution', 'Cloud Fundamentals')
+
+
+def manager_name(m):
+    return f'gen_m{m:04d}'
+
+
+def employee_name(m, e):
+    return f'gen_e{m:04d}_{e:03d}'
+
+
+def find_user_id(conn, username):
+    row = conn.execute('SELECT id FROM users WHERE username = ?', (username,)).fetchone()
+    if row is None:
+        raise SystemExit(f"{username} not found in {DB_LOCATION}; run python -m benchmarks.datagen first")
+    return row[0]
+
+
+def _text(rnd, words=10):
+    return ' '.join(rnd.choices(_WORDS, k=words)).capitalize()
+
+
+def _insert(conn, query, rows):
+    # executemany in fixed-size transactions so memory stays flat however
+    # many rows the generator yields
+    count = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            with conn:
+                conn.executemany(query, batch)
+            count += len(batch)
+            batch.clear()
+    if batch:
+        with conn:
+            conn.executemany(query, batch)
+        count += len(batch)
+    return count
+
+
+def generate(conn, managers=10, employees=8, years=2, seed=0, end=None, span=0):
+    """Fill the database with a synthetic org and its history.
+
+    With ``span`` set, managers form a tree under gen_m0000 with up to
+    ``span`` managers reporting to each, and they are evaluated by their
+    own manager like employees; otherwise they are all top level.
+    Each of ``managers`` managers gets ``employees`` reports, and each
+    employee gets ``years`` of monthly evaluations, roughly two feedback
+    messages and a half-hour meeting a month, plus quarterly goals, training and
+    self-evaluations. The same ``seed`` always produces the same rows.
+    Returns a dict of row counts per table.
+    """
+    rnd = random.Random(seed)
+    end = end or date.today()
+    start = end - timedelta(days=365 * years)
+    days = (end - start).days
+    months = years * 12
+
+    def day(offset=None):
+        return (start + timedelta(days=rnd.randrange(days) if offset is None else offset)).isoformat()
+
+    counts = {}
+    counts['managers'] = _insert(conn, 'INSERT INTO users (username, password, role, manager_id) VALUES (?, ?, ?, NULL)',
+                                 ((manager_name(m), PASSWORD, 'manager') for m in range(managers)))
+    manager_ids = dict(conn.execute("SELECT username, id FROM users WHERE username LIKE 'gen\\_m%' ESCAPE '\\'"))
+    if span:
+        with conn:
+            conn.executemany('UPDATE users SET manager_id = ? WHERE id = ?',
+                             [(manager_ids[manager_name((m - 1) // span)], manager_ids[manager_name(m)])
+                              for m in range(1, managers)])
+    counts['employees'] = _insert(conn, 'INSERT INTO users (username, password, role, manager_id) VALUES (?, ?, ?, ?)',
+                                  ((employee_name(m, e), PASSWORD, 'employee', manager_ids[manager_name(m)])
+                                   for m in range(managers) for e in range(employees)))
+    pairs = conn.execute("""SELECT e.id, e.manager_id FROM users e JOIN users m ON m.id = e.manager_id
+                            WHERE m.username LIKE 'gen\\_m%' ESCAPE '\\' ORDER BY e.id""").fetchall()
+
+    team_size = Counter()
+    slot = {}
+    for e, m in pairs:
+        slot[e] = team_size[m]
+        team_size[m] += 1
+
+    def meeting(e, m, i):
+        # Each manager holds a month's one-to-ones back to back on one day,
+        # so their generated meetings never overlap
+        starts_at = datetime.fromisoformat(day(i * days // months + m % 28))
+        starts_at += timedelta(hours=9, minutes=30 * slot[e])
+        return (e, m, starts_at.date().isoformat(), starts_at.strftime(TIME_FORMAT),
+                (starts_at + timedelta(minutes=30)).strftime(TIME_FORMAT), _text(rnd, 4))
+
+    def scores():
+        base = rnd.uniform(1.5, 4.5)
+        return [round(min(5.0, max(0.0, rnd.gauss(base, 0.6))), 1) for _ in range(4)]
+
+    counts['evaluations'] = _insert(conn, '''INSERT INTO evaluations
+        (employee_id, manager_id, quality, punctuality, teamwork, targets, comments, review_date, status)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+        ((e, m, *scores(), _text(rnd), day(i * days // months), rnd.choice(('Draft', 'Final', 'Final')))
+         for e, m in pairs for i in range(months)))
+    counts['feedback'] = _insert(conn, 'INSERT INTO feedback (employee_id, manager_id, message, date) VALUES (?, ?, ?, ?)',
+                                 ((e, m, _text(rnd, 14), day()) for e, m in pairs for _ in range(months * 2)))
+    counts['meetings'] = _insert(conn, '''INSERT INTO meetings
+        (employee_id, manager_id, meeting_date, starts_at, ends_at, purpose) VALUES (?, ?, ?, ?, ?, ?)''',
+        (meeting(e, m, i) for e, m in pairs for i in range(months)))
+    counts['training'] = _insert(conn, 'INSERT INTO training (employee_id, manager_id, program, date) VALUES (?, ?, ?, ?)',
+                                 ((e, m, rnd.choice(_PROGRAMS), day()) for e, m in pairs for _ in range(years * 4)))
+    counts['goals'] = _insert(conn, '''INSERT INTO goals (employee_id, manager_id, description, set_date, status)
+                                       VALUES (?, ?, ?, ?, ?)''',
+                              ((e, m, _text(rnd, 8), day(), rnd.choice(('Active', 'Completed')))
+                               for e, m in pairs for _ in range(years * 4)))
+    counts['self_evaluations'] = _insert(conn, '''INSERT INTO self_evaluations
+        (employee_id, comments, submission_date, status) VALUES (?, ?, ?, ?)''',
+        ((e, _text(rnd, 16), day(), rnd.choice(('Pending', 'Approved'))) for e, _ in pairs for _ in range(years * 4)))
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fill the configured database with a synthetic organisation")
+    parser.add_argument('--managers', type=int, default=10)
+    parser.add_argument('--employees', type=int, default=8, help="employees per manager")
+    parser.add_argument('--years', type=int, default=2, help="years of history per employee")
+    parser.add_argument('--span', type=int, default=0,
+                        help="arrange managers in a tree with this many managers under each (default: flat)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    conn = get_connection()
+    migrate(conn)
+    if conn.execute('SELECT 1 FROM users WHERE username = ?', (manager_name(0),)).fetchone():
+        parser.error(f"{DB_LOCATION} already holds generated data; use a fresh database")
+    started = time.perf_counter()
+    counts = generate(conn, args.managers, args.employees, args.years, args.seed, span=args.span)
+    print(f"{DB_LOCATION}: generated in {time.perf_counter() - started:.1f}s")
+    for table, count in counts.items():
+        print(f"  {table:<17} {count:>9}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+import argparse
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+
+
+def percentile(samples, pct):
+    # Nearest-rank percentile; samples need not be sorted
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+def measure(name, func, repeat=50, warmup=3, setup=None):
+    """Time ``func`` and record its peak Python allocation.
+
+    ``setup`` runs untimed before every call (e.g. to clear the query
+    cache). Memory is traced on one extra call after the timed runs, since
+    tracemalloc slows allocation-heavy code enough to skew the latencies.
+    """
+    for _ in range(warmup):
+        if setup:
+            setup()
+        func()
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        'name': name,
+        'runs': repeat,
+        'p50_ms': round(percentile(samples, 50), 3),
+        'p95_ms': round(percentile(samples, 95), 3),
+        'mean_ms': round(statistics.fmean(samples), 3),
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def print_report(results, out=sys.stdout):
+    width = max(len(r['name']) for r in results)
+    out.write(f"{'case':<{width}}  {'p50 ms':>9}  {'p95 ms':>9}  {'mean ms':>9}  {'peak KB':>9}\n")
+    for r in results:
+        out.write(f"{r['name']:<{width}}  {r['p50_ms']:>9.3f}  {r['p95_ms']:>9.3f}  "
+                  f"{r['mean_ms']:>9.3f}  {r['peak_kb']:>9.1f}\n")
+
+
+def regressions(results, baseline, tolerance):
+    # Cases whose p95 grew by more than ``tolerance`` (0.2 = 20%)
+    before = {r['name']: r for r in baseline}
+    slower = []
+    for r in results:
+        old = before.get(r['name'])
+        if old and r['p95_ms'] > old['p95_ms'] * (1 + tolerance):
+            slower.append((r['name'], old['p95_ms'], r['p95_ms']))
+    return slower
+
+
+def new_parser(description):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--repeat', type=int, default=50, help="timed runs per case")
+    parser.add_argument('--json', metavar='PATH', help="also write the results as JSON")
+    parser.add_argument('--baseline', metavar='PATH', help="JSON from an earlier run to compare p95 against")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed p95 slowdown vs the baseline")
+    parser.add_argument('--filter', metavar='TEXT', help="only run cases whose name contains TEXT")
+    return parser
+
+
+def finish(args, results):
+    """Print and save results; returns the process exit status."""
+    print_report(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            slower = regressions(results, json.load(f), args.tolerance)
+        for name, old, new in slower:
+            print(f"REGRESSION {name}: p95 {old:.3f} ms -> {new:.3f} ms")
+        if slower:
+            return 1
+    return 0
@@ -0,0 +1,66 @@
+import hashlib
+import os
+import tempfile
+
+from log import get_logger
+
+# Uploaded files live on disk under BLOB_DIR, named by the SHA-256 of their
+# content, so the same bytes are only ever stored once however many rows
+# point at them. Blobs are immutable: a path never changes contents.
+BLOB_DIR = os.environ.get('PERF_BLOB_DIR', 'blobs')
+MAX_UPLOAD_BYTES = int(os.environ.get('PERF_MAX_UPLOAD_MB', '20')) * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+
+log = get_logger('blobstore')
+
+
+class BlobTooLarge(ValueError):
+    pass
+
+
+def blob_path(sha256):
+    # Two-character fan-out keeps any one directory small
+    return os.path.join(BLOB_DIR, sha256[:2], sha256)
+
+
+def put_stream(fileobj, max_bytes=MAX_UPLOAD_BYTES, chunk_size=CHUNK_SIZE):
+    """Copy a binary file object into the store.
+
+    Reads ``chunk_size`` bytes at a time into a temporary file while
+    hashing, then renames it into place, so memory use does not depend on
+    the file size. Returns ``(sha256, size)``. Raises BlobTooLarge, leaving
+    nothing behind, once more than ``max_bytes`` have been read.
+    """
+    os.makedirs(BLOB_DIR, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=BLOB_DIR, prefix='.upload-')
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            while True:
+                chunk = fileobj.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise BlobTooLarge(f"File is larger than {max_bytes / (1024 * 1024):g} MB")
+                digest.update(chunk)
+                tmp.write(chunk)
+        sha256 = digest.hexdigest()
+        path = blob_path(sha256)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+            log.info('blob_stored', sha256=sha256, size=size)
+        return sha256, size
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def open_blob(sha256):
+    """Open a stored blob for streaming reads."""
+    return open(blob_path(sha256), 'rb')
@@ -0,0 +1,230 @@
+import csv
+import io
+import tempfile
+from datetime import datetime
+
+import pandas as pd
+
+from cache import query_cache
+from db import get_connection
+from log import get_logger
+from migrations import METRICS
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is optional
+    pa = pq = None
+
+# Rows per executemany call; each batch is its own short transaction so an
+# import never holds the write lock long enough to block interactive saves.
+BATCH_SIZE = 500
+EXPORT_CHUNK_SIZE = 1000
+EXPORT_FORMATS = ['csv', 'parquet'] if pa is not None else ['csv']
+# A prepared export larger than this moves from memory to a temporary file
+SPOOL_MAX_MEMORY = 1024 * 1024
+
+log = get_logger('bulk')
+
+# Columns accepted in an evaluation upload. "employee" may be a username or
+# an employee id; comments and review_date are optional.
+IMPORT_COLUMNS = ['employee'] + list(METRICS) + ['comments', 'review_date']
+
+# Export queries in insertion order, with the employee's username joined in
+_EXPORTS = {
+    'evaluations': '''SELECT e.id, e.employee_id, u.username AS employee, e.review_date,
+                             e.quality, e.punctuality, e.teamwork, e.targets, e.comments, e.status
+                      FROM evaluations e LEFT JOIN users u ON u.id = e.employee_id
+                      WHERE e.manager_id = ? ORDER BY e.id''',
+    'goals': '''SELECT g.id, g.employee_id, u.username AS employee, g.description, g.set_date, g.status
+                FROM goals g LEFT JOIN users u ON u.id = g.employee_id
+                WHERE g.manager_id = ? ORDER BY g.id''',
+    'feedback': '''SELECT f.id, f.employee_id, u.username AS employee, f.date, f.message
+                   FROM feedback f LEFT JOIN users u ON u.id = f.employee_id
+                   WHERE f.manager_id = ? ORDER BY f.id''',
+}
+EXPORT_TABLES = list(_EXPORTS)
+
+
+def read_upload(uploaded_file):
+    """Load an uploaded CSV or Excel file into a DataFrame of strings."""
+    name = getattr(uploaded_file, 'name', '').lower()
+    if name.endswith(('.xlsx', '.xls')):
+        return pd.read_excel(uploaded_file, dtype=str)
+    return pd.read_csv(uploaded_file, dtype=str)
+
+
+def validate_evaluations(df, team):
+    """Check an evaluation upload against the manager's team.
+
+    ``team`` is a list of records with ``id`` and ``username``. Returns
+    ``(rows, errors)`` where rows are ready for import_evaluations and
+    errors is a list of human readable messages keyed by spreadsheet row.
+    """
+    df = df.rename(columns=lambda c: str(c).strip().lower())
+    missing = [c for c in ['employee'] + list(METRICS) if c not in df.columns]
+    if missing:
+        return [], [f"Missing column(s): {', '.join(missing)}"]
+
+    by_name = {member.username: int(member.id) for member in team}
+    by_id = {str(i): i for i in by_name.values()}
+    employee = df['employee'].astype(str).str.strip()
+    employee_ids = employee.map(by_name).fillna(employee.map(by_id))
+
+    scores = df[list(METRICS)].apply(pd.to_numeric, errors='coerce')
+    bad_scores = scores.isna() | (scores < 0) | (scores > 5)
+
+    today = datetime.now().strftime('%Y-%m-%d')
+    if 'review_date' in df.columns:
+        dates = pd.to_datetime(df['review_date'], errors='coerce')
+        bad_dates = df['review_date'].notna() & dates.isna()
+        review_dates = dates.dt.strftime('%Y-%m-%d').fillna(today)
+    else:
+        bad_dates = pd.Series(False, index=df.index)
+        review_dates = pd.Series(today, index=df.index)
+    comments = df['comments'].fillna('') if 'comments' in df.columns else pd.Series('', index=df.index)
+
+    errors = []
+    # +2: header row plus 1-based numbering, matching what a spreadsheet shows
+    for pos in (employee_ids.isna() | bad_scores.any(axis=1) | bad_dates).to_numpy().nonzero()[0]:
+        problems = []
+        if pd.isna(employee_ids.iloc[pos]):
+            problems.append(f"unknown employee '{employee.iloc[pos]}'")
+        problems += [f"{m} must be a number from 0 to 5" for m in METRICS if bad_scores[m].iloc[pos]]
+        if bad_dates.iloc[pos]:
+            problems.append("review_date is not a date")
+        errors.append(f"Row {pos + 2}: " + '; '.join(problems))
+    if errors:
+        return [], errors
+
+    rows = list(zip(employee_ids.astype(int).tolist(),
+                    *(scores[m].astype(float).tolist() for m in METRICS),
+                    comments.astype(str).tolist(),
+                    review_dates.tolist()))
+    return rows, []
+
+
+def import_evaluations(manager_id, rows, status='Draft', batch_size=BATCH_SIZE):
+    """Insert validated evaluation rows in batched transactions.
+
+    ``rows`` are ``(employee_id, quality, punctuality, teamwork, targets,
+    comments, review_date)`` tuples as returned by validate_evaluations.
+    Returns the number of rows inserted.
+    """
+    manager_id = int(manager_id)
+    conn = get_connection()
+    inserted = 0
+    for start in range(0, len(rows), batch_size):
+        batch = [(employee_id, manager_id, *scores, comments, review_date, status)
+                 for employee_id, *scores, comments, review_date in rows[start:start + batch_size]]
+        with conn:
+            conn.executemany('''INSERT INTO evaluations
+                                (employee_id, manager_id, quality, punctuality, teamwork, targets, comments, review_date, status)
+                                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''', batch)
+        inserted += len(batch)
+    query_cache.invalidate('evaluations', manager_id=manager_id)
+    log.info('evaluations_imported', manager_id=manager_id, count=inserted)
+    return inserted
+
+
+def iter_export(table, manager_id, fmt='csv', chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield an export of ``table`` for one manager as byte chunks.
+
+    Rows are pulled from the cursor ``chunk_size`` at a time, so memory use
+    stays flat regardless of how much history the manager has.
+    """
+    if table not in _EXPORTS:
+        raise ValueError(f"Unknown export table: {table}")
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    cursor = get_connection().execute(_EXPORTS[table], (int(manager_id),))
+    columns = [d[0] for d in cursor.description]
+
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        while True:
+            chunk = cursor.fetchmany(chunk_size)
+            writer.writerows(chunk)
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+            if not chunk:
+                return
+
+    # Parquet: one row group per chunk, drained from the sink as written
+    schema = _parquet_schema(columns)
+    sink = _ByteSink()
+    with pq.ParquetWriter(sink, schema) as writer:
+        while True:
+            chunk = cursor.fetchmany(chunk_size)
+            if not chunk:
+                break
+            arrays = [pa.array(values, type=t) for values, t in zip(zip(*chunk), schema.types)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def spool_export(table, manager_id, fmt='csv', max_memory=SPOOL_MAX_MEMORY):
+    """Write an iter_export into a temporary file and return it rewound.
+
+    Exports up to ``max_memory`` bytes stay in memory and larger ones go
+    to disk, so holding a prepared export between reruns costs little. The
+    file is deleted when it is closed or garbage collected.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=max_memory)
+    try:
+        for chunk in iter_export(table, manager_id, fmt):
+            spool.write(chunk)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+
+def read_spool(spool):
+    # The whole export, for a download; read from the start on every click
+    spool.seek(0)
+    return spool.read()
+
+
+def _parquet_schema(columns):
+    types = {'id': pa.int64(), 'employee_id': pa.int64()}
+    types.update({m: pa.float64() for m in METRICS})
+    return pa.schema([(c, types.get(c, pa.string())) for c in columns])
+
+
+class _ByteSink(io.RawIOBase):
+    # Write-only file that hands back what was written since the last
+    # drain(). tell() keeps counting from the start of the file, which the
+    # Parquet footer offsets depend on.
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def export_to_file(table, manager_id, fileobj, fmt='csv'):
+    """Stream an export into an open binary file object."""
+    for chunk in iter_export(table, manager_id, fmt):
+        fileobj.write(chunk)
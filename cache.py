@@ -0,0 +1,116 @@
+import functools
+import threading
+import time
+from collections import OrderedDict
+
+# Process-wide defaults; every Streamlit session shares the same cache.
+DEFAULT_MAXSIZE = 512
+DEFAULT_TTL = 60.0
+
+
+def _norm(value):
+    # IDs arrive as int, numpy int64 or str depending on the caller
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def _matches(constraint, written):
+    # None on either side means "any": an unscoped read sees every row, and
+    # a write whose owner is unknown may touch any scoped read.
+    return constraint is None or written is None or constraint == written
+
+
+class QueryCache:
+    """Size-bounded LRU cache with a TTL for read query results.
+
+    Each entry records the table it was read from and the employee/manager
+    ids the query was restricted to, so a write can evict exactly the
+    entries whose result could include the written row.
+    """
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE, ttl=DEFAULT_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[1]
+
+    def set(self, key, value, table, employee_id=None, manager_id=None):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value, table,
+                                  _norm(employee_id), _norm(manager_id))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, table, employee_id=None, manager_id=None):
+        """Evict entries of ``table`` that could contain a row owned by
+        ``employee_id``/``manager_id``. Returns the number evicted."""
+        employee_id, manager_id = _norm(employee_id), _norm(manager_id)
+        with self._lock:
+            stale = [key for key, (_, _, t, e, m) in self._entries.items()
+                     if t == table and _matches(e, employee_id) and _matches(m, manager_id)]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+query_cache = QueryCache()
+
+
+def cached_query(table, scope=None):
+    """Cache a read function's result in ``query_cache``.
+
+    ``scope`` receives the call's arguments and returns the
+    ``(employee_id, manager_id)`` the query is restricted to, with None for
+    "not restricted". The cache key is the table, function name and
+    arguments. Values are copied on the way out so callers that modify a
+    returned DataFrame cannot corrupt the cached one.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            # Wait for this session's queued writes before the lookup too: an
+            # entry another session cached meanwhile would not include them.
+            # Imported here because the writer imports this module.
+            from writer import wait_for_writes
+            wait_for_writes()
+            key = (table, func.__name__, tuple(_norm(a) for a in args), tuple(sorted(kwargs.items())))
+            hit, value = query_cache.get(key)
+            if not hit:
+                value = func(*args, **kwargs)
+                employee_id, manager_id = scope(*args, **kwargs) if scope else (None, None)
+                query_cache.set(key, value, table, employee_id, manager_id)
+            return _copy(value)
+        return wrapper
+    return decorator
+
+
+def _copy(value):
+    if isinstance(value, tuple):
+        return tuple(_copy(v) for v in value)
+    return value.copy() if hasattr(value, 'copy') else value
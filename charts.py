@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+# Above this many points per figure the traces switch to WebGL (Scattergl),
+# which the browser draws on the GPU instead of as one SVG node per point.
+WEBGL_THRESHOLD = 1000
+# Longer series are downsampled to this many points before serializing;
+# a chart a few hundred pixels wide cannot show more.
+MAX_POINTS = 500
+# Below this, draw a marker on every point
+MARKER_THRESHOLD = 60
+
+
+def lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets downsampling.
+
+    Returns the indices of at most ``threshold`` points of ``(x, y)`` that
+    keep the visual shape of the line: the first and last points, plus from
+    each bucket the point forming the largest triangle with the point kept
+    before it and the mean of the next bucket. ``x`` must be increasing.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    keep = np.empty(threshold, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_lo, next_hi = edges[i + 1], edges[i + 2]
+            avg_x, avg_y = x[next_lo:next_hi].mean(), y[next_lo:next_hi].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+        areas = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(areas.argmax())
+        keep[i + 1] = a
+    return keep
+
+
+def _numeric_x(values):
+    # Dates plot on a time axis and downsample by real spacing; bucket labels
+    # such as '2024-W05' or '2024-Q1' are evenly spaced by position
+    dates = pd.to_datetime(values, format='%Y-%m-%d', errors='coerce')
+    if dates.notna().all():
+        return dates, dates.to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    return values, np.arange(len(values))
+
+
+def trend_figure(df, x, columns, title, x_title, y_title, max_points=MAX_POINTS):
+    """Line chart of ``columns`` against ``x`` sized for the browser.
+
+    Each series is reduced to ``max_points`` with LTTB, and WebGL traces
+    are used once the figure would exceed WEBGL_THRESHOLD points.
+    """
+    labels, positions = _numeric_x(df[x])
+    shown = min(len(df), max_points) * len(columns)
+    trace = go.Scattergl if shown > WEBGL_THRESHOLD else go.Scatter
+    mode = 'lines+markers' if min(len(df), max_points) <= MARKER_THRESHOLD else 'lines'
+    fig = go.Figure()
+    for column in columns:
+        values = df[column].to_numpy(dtype=float)
+        present = np.flatnonzero(~np.isnan(values))
+        keep = present[lttb(positions[present], values[present], max_points)]
+        fig.add_trace(trace(x=np.asarray(labels)[keep], y=values[keep], mode=mode, name=column))
+    fig.update_layout(title=title, xaxis_title=x_title, yaxis_title=y_title, legend_title="Metrics")
+    return fig
@@ -0,0 +1,72 @@
+import threading
+
+from backends import get_backend
+
+
+class ConnectionPool:
+    """Hands out one database connection per thread and recycles it.
+
+    Streamlit runs each script rerun on a fresh thread, so a plain
+    thread-local would open a new connection per rerun. Instead, connections
+    owned by threads that have finished are returned to an idle list and
+    handed to the next thread that asks, which keeps the connection count
+    bounded by the number of concurrently running scripts. ``connect``
+    comes from the configured backend.
+    """
+
+    def __init__(self, connect, max_idle=8):
+        self.connect = connect
+        self.max_idle = max_idle
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._leased = {}
+        self._idle = []
+
+    def _reclaim(self):
+        # Caller holds self._lock.
+        for thread in [t for t in self._leased if not t.is_alive()]:
+            conn = self._leased.pop(thread)
+            if conn.in_transaction:
+                conn.rollback()
+            if len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+            else:
+                conn.close()
+
+    def get(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            return conn
+        thread = threading.current_thread()
+        with self._lock:
+            self._reclaim()
+            conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                conn = self.connect()
+            self._leased[thread] = conn
+        self._local.conn = conn
+        return conn
+
+    def close_all(self):
+        with self._lock:
+            for conn in list(self._leased.values()) + self._idle:
+                conn.close()
+            self._leased.clear()
+            self._idle.clear()
+        self._local = threading.local()
+
+
+backend = get_backend()
+# Where the data lives, for messages; passwords are masked
+DB_LOCATION = backend.location
+IntegrityError = backend.IntegrityError
+
+_pool = ConnectionPool(backend.connect, backend.max_idle)
+
+
+def get_connection():
+    return _pool.get()
+
+
+def close_all():
+    _pool.close_all()
@@ -0,0 +1,68 @@
+import logging
+import os
+import sys
+
+# Debug mode is off unless PERF_APP_DEBUG is set. It lowers the log level
+# and turns on the "Debug - ..." lines in the UI.
+DEBUG_MODE = os.environ.get('PERF_APP_DEBUG', '').lower() in ('1', 'true', 'yes', 'on')
+LOG_LEVEL = os.environ.get('PERF_APP_LOG_LEVEL', 'DEBUG' if DEBUG_MODE else 'INFO').upper()
+
+_ROOT = 'perf'
+
+
+class KeyValueFormatter(logging.Formatter):
+    """Formats records as ``time level logger event key=value ...``."""
+
+    def format(self, record):
+        line = f"{self.formatTime(record)} {record.levelname} {record.name} {record.getMessage()}"
+        fields = getattr(record, 'fields', None)
+        if fields:
+            line += ' ' + ' '.join(f"{key}={value!r}" for key, value in fields.items())
+        if record.exc_info:
+            line += '\n' + self.formatException(record.exc_info)
+        return line
+
+
+class EventLogger:
+    """Thin wrapper so call sites log an event name plus fields:
+
+        log.info('feedback_saved', feedback_id=7, employee_id=3)
+    """
+
+    def __init__(self, logger):
+        self._logger = logger
+
+    def _log(self, level, event, exc_info=False, **fields):
+        if self._logger.isEnabledFor(level):
+            self._logger.log(level, event, exc_info=exc_info, extra={'fields': fields})
+
+    def debug(self, event, **fields):
+        self._log(logging.DEBUG, event, **fields)
+
+    def info(self, event, **fields):
+        self._log(logging.INFO, event, **fields)
+
+    def warning(self, event, **fields):
+        self._log(logging.WARNING, event, **fields)
+
+    def error(self, event, **fields):
+        self._log(logging.ERROR, event, **fields)
+
+    def exception(self, event, **fields):
+        self._log(logging.ERROR, event, exc_info=True, **fields)
+
+
+def _configure():
+    root = logging.getLogger(_ROOT)
+    if not root.handlers:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(KeyValueFormatter())
+        root.addHandler(handler)
+        root.setLevel(LOG_LEVEL)
+        root.propagate = False
+    return root
+
+
+def get_logger(name):
+    _configure()
+    return EventLogger(logging.getLogger(f"{_ROOT}.{name}"))
@@ -0,0 +1,71 @@
+import argparse
+
+from db import DB_LOCATION, get_connection
+from migrations import LATEST_VERSION, get_schema_version, migrate, seed_sample_data
+from repository import register_user
+from snapshot import snapshots
+
+
+def cmd_init(args):
+    conn = get_connection()
+    applied = migrate(conn)
+    print(f"{DB_LOCATION}: schema at version {get_schema_version(conn)} ({len(applied)} migration(s) applied)")
+    if not args.no_seed:
+        cmd_seed(args)
+
+
+def cmd_seed(args):
+    conn = get_connection()
+    inserted = seed_sample_data(conn)
+    print(f"{DB_LOCATION}: {inserted} sample user(s) inserted")
+
+
+def cmd_create_admin(args):
+    # Admins only see the metrics page; they cannot self-register in the app
+    migrate(get_connection())
+    if not register_user(args.username, args.password, 'admin'):
+        raise SystemExit(f"{DB_LOCATION}: could not create {args.username} (username taken?)")
+    print(f"{DB_LOCATION}: admin {args.username} created")
+
+
+def cmd_version(args):
+    version = get_schema_version(get_connection())
+    print(f"{DB_LOCATION}: schema version {version} (latest {LATEST_VERSION})")
+
+
+def cmd_snapshot(args):
+    # For refreshing from cron when the app's own interval is not wanted
+    if not snapshots.enabled:
+        raise SystemExit(f"{DB_LOCATION}: analytics snapshots are off for this backend or interval")
+    seconds = snapshots.refresh()
+    print(f"{snapshots.path}: snapshot of {DB_LOCATION} taken in {seconds:.2f}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Performance database maintenance")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('init', help="apply pending migrations and seed sample users")
+    p.add_argument('--no-seed', action='store_true', help="skip the sample users")
+    p.set_defaults(func=cmd_init)
+
+    p = sub.add_parser('seed', help="insert the sample users if missing")
+    p.set_defaults(func=cmd_seed)
+
+    p = sub.add_parser('create-admin', help="create an admin account for the metrics page")
+    p.add_argument('username')
+    p.add_argument('password')
+    p.set_defaults(func=cmd_create_admin)
+
+    p = sub.add_parser('version', help="show the schema version")
+    p.set_defaults(func=cmd_version)
+
+    p = sub.add_parser('snapshot', help="refresh the analytics snapshot now")
+    p.set_defaults(func=cmd_snapshot)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,325 @@
+import functools
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from log import get_logger
+
+# Instrumentation is on unless PERF_APP_METRICS=0. Queries slower than
+# PERF_SLOW_QUERY_MS are logged with their EXPLAIN QUERY PLAN.
+ENABLED = os.environ.get('PERF_APP_METRICS', '1').lower() not in ('0', 'false', 'no', 'off')
+SLOW_QUERY_MS = float(os.environ.get('PERF_SLOW_QUERY_MS', '100'))
+METRICS_PORT = os.environ.get('PERF_APP_METRICS_PORT')
+
+# Upper bounds, in seconds, of the latency histogram buckets
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+SLOW_LOG_SIZE = 50
+
+log = get_logger('metrics')
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_sql(sql):
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+class _Timing:
+    # Running totals for one query or tab
+    __slots__ = ('calls', 'seconds', 'max_seconds', 'rows', 'errors')
+
+    def __init__(self):
+        self.calls = self.rows = self.errors = 0
+        self.seconds = self.max_seconds = 0.0
+
+    def add(self, seconds, rows=0, error=False):
+        self.calls += 1
+        self.seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.rows += rows
+        self.errors += error
+
+
+class MetricsRegistry:
+    """Process-wide query and render timings, shared by every session."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.queries = {}
+            self.renders = {}
+            self.histogram = [0] * (len(BUCKETS) + 1)
+            self.slow_queries = deque(maxlen=SLOW_LOG_SIZE)
+            self.started = time.time()
+
+    def record_query(self, sql, seconds, rows, error=False):
+        with self._lock:
+            self.queries.setdefault(sql, _Timing()).add(seconds, rows, error)
+            self.histogram[_bucket(seconds)] += 1
+
+    def record_slow_query(self, sql, seconds, rows, plan):
+        with self._lock:
+            self.slow_queries.appendleft({'time': time.time(), 'sql': sql, 'ms': round(seconds * 1000, 2),
+                                          'rows': rows, 'plan': plan})
+
+    def record_render(self, name, seconds, error=False):
+        with self._lock:
+            self.renders.setdefault(name, _Timing()).add(seconds, error=error)
+
+    def snapshot(self):
+        """Copy of the current totals as plain dicts, safe to read unlocked."""
+        with self._lock:
+            return {
+                'queries': [dict(sql=sql, **_fields(t)) for sql, t in self.queries.items()],
+                'renders': [dict(name=name, **_fields(t)) for name, t in self.renders.items()],
+                'histogram': list(self.histogram),
+                'slow_queries': list(self.slow_queries),
+                'started': self.started,
+            }
+
+
+def _bucket(seconds):
+    for i, bound in enumerate(BUCKETS):
+        if seconds <= bound:
+            return i
+    return len(BUCKETS)
+
+
+def _fields(timing):
+    return {name: getattr(timing, name) for name in _Timing.__slots__}
+
+
+registry = MetricsRegistry()
+
+
+# --- SQL instrumentation ---
+def observe(sql, seconds, rows, error=False, explain=None):
+    """Record one statement. ``explain`` returns its query plan as a list
+    of lines and is only called when the statement was slow."""
+    sql = normalize_sql(sql)
+    registry.record_query(sql, seconds, rows, error)
+    if seconds * 1000 >= SLOW_QUERY_MS and not error:
+        plan = explain() if explain else []
+        registry.record_slow_query(sql, seconds, rows, plan)
+        log.warning('slow_query', ms=round(seconds * 1000, 2), rows=rows, sql=sql, plan=' | '.join(plan))
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that times each statement from execute until its last row.
+
+    A SELECT does most of its work while rows are fetched, so the timing
+    and row count stay open until the result is exhausted, the cursor runs
+    another statement, or it is closed.
+    """
+
+    _pending = None
+
+    def _start(self, sql, params, start, rows=0):
+        self._pending = [sql, params, time.perf_counter() - start, rows]
+
+    def _finish(self, error=False):
+        pending, self._pending = self._pending, None
+        if pending is None:
+            return
+        sql, params, seconds, rows = pending
+        observe(sql, seconds, rows, error, lambda: _explain(self.connection, sql, params))
+
+    def _timed(self, fetch, *args):
+        start = time.perf_counter()
+        result = fetch(*args)
+        if self._pending is not None:
+            self._pending[2] += time.perf_counter() - start
+        return result
+
+    def execute(self, sql, params=()):
+        self._finish()
+        start = time.perf_counter()
+        try:
+            super().execute(sql, params)
+        except sqlite3.Error:
+            self._start(sql, params, start)
+            self._finish(error=True)
+            raise
+        self._start(sql, params, start, max(self.rowcount, 0))
+        if self.description is None:
+            # Not a query: nothing left to fetch
+            self._finish()
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        self._finish()
+        start = time.perf_counter()
+        try:
+            super().executemany(sql, seq_of_params)
+        except sqlite3.Error:
+            self._start(sql, None, start)
+            self._finish(error=True)
+            raise
+        self._start(sql, None, start, max(self.rowcount, 0))
+        self._finish()
+        return self
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        if row is None:
+            self._finish()
+        elif self._pending is not None:
+            self._pending[3] += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._timed(super().fetchmany, self.arraysize if size is None else size)
+        if self._pending is not None:
+            self._pending[3] += len(rows)
+        if not rows:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        if self._pending is not None:
+            self._pending[3] += len(rows)
+        self._finish()
+        return rows
+
+    def __next__(self):
+        row = self.fetchone()
+        if row is None:
+            raise StopIteration
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        # Partially read results are still counted
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    # pandas reads go through cursor(); the execute shortcuts build a plain
+    # cursor internally, so they are routed through cursor() as well.
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+
+def _explain(conn, sql, params):
+    if params is None or not sql.lstrip().upper().startswith(('SELECT', 'WITH', 'UPDATE', 'DELETE', 'INSERT')):
+        return []
+    try:
+        # A plain cursor, so the EXPLAIN itself is not recorded
+        rows = sqlite3.Cursor(conn).execute('EXPLAIN QUERY PLAN ' + sql, params).fetchall()
+    except sqlite3.Error as e:
+        return [f"(plan unavailable: {e})"]
+    return [row[-1] for row in rows]
+
+
+def connection_factory():
+    return InstrumentedConnection if ENABLED else sqlite3.Connection
+
+
+# --- Render timing ---
+def timed_render(func):
+    """Record how long a tab function takes, on full and fragment reruns."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        error = True
+        try:
+            result = func(*args, **kwargs)
+            error = False
+            return result
+        finally:
+            registry.record_render(func.__name__, time.perf_counter() - start, error)
+    return wrapper
+
+
+# --- Prometheus text exposition ---
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+
+def prometheus_text(cache=None):
+    """Render the registry (and optionally a QueryCache) in the Prometheus
+    text format."""
+    snap = registry.snapshot()
+    lines = []
+
+    def family(name, kind, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(f"{name}{labels} {value}" for labels, value in samples)
+
+    queries = [(f'{{query="{_label(q["sql"])}"}}', q) for q in snap['queries']]
+    family('perf_query_calls_total', 'counter', "SQL statements executed.",
+           [(labels, q['calls']) for labels, q in queries])
+    family('perf_query_seconds_total', 'counter', "Time spent executing and fetching SQL statements.",
+           [(labels, round(q['seconds'], 6)) for labels, q in queries])
+    family('perf_query_rows_total', 'counter', "Rows returned or changed by SQL statements.",
+           [(labels, q['rows']) for labels, q in queries])
+    family('perf_query_errors_total', 'counter', "SQL statements that raised.",
+           [(labels, q['errors']) for labels, q in queries])
+
+    cumulative, samples = 0, []
+    for bound, count in zip(BUCKETS + ('+Inf',), snap['histogram']):
+        cumulative += count
+        samples.append((f'{{le="{bound}"}}', cumulative))
+    lines.append("# HELP perf_query_duration_seconds Latency of individual SQL statements.")
+    lines.append("# TYPE perf_query_duration_seconds histogram")
+    lines.extend(f"perf_query_duration_seconds_bucket{labels} {value}" for labels, value in samples)
+    lines.append(f"perf_query_duration_seconds_sum {round(sum(q['seconds'] for q in snap['queries']), 6)}")
+    lines.append(f"perf_query_duration_seconds_count {cumulative}")
+
+    renders = [(f'{{tab="{_label(r["name"])}"}}', r) for r in snap['renders']]
+    family('perf_render_calls_total', 'counter', "Dashboard tab renders.",
+           [(labels, r['calls']) for labels, r in renders])
+    family('perf_render_seconds_total', 'counter', "Time spent rendering dashboard tabs.",
+           [(labels, round(r['seconds'], 6)) for labels, r in renders])
+    family('perf_render_max_seconds', 'gauge', "Slowest render of each tab since the last reset.",
+           [(labels, round(r['max_seconds'], 6)) for labels, r in renders])
+
+    if cache is not None:
+        family('perf_query_cache_hits_total', 'counter', "Query cache hits.", [('', cache.hits)])
+        family('perf_query_cache_misses_total', 'counter', "Query cache misses.", [('', cache.misses)])
+        family('perf_query_cache_entries', 'gauge', "Entries in the query cache.", [('', len(cache))])
+    return '\n'.join(lines) + '\n'
+
+
+def start_http_server(port, host='127.0.0.1', cache=None):
+    """Serve GET /metrics on a daemon thread. Binds to localhost only."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = prometheus_text(cache).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            log.debug('metrics_request', client=self.client_address[0], request=format % args)
+
+    server = ThreadingHTTPServer((host, int(port)), Handler)
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    log.info('metrics_server_started', host=host, port=int(port))
+    return server
@@ -0,0 +1,537 @@
+from backends import get_backend
+from log import get_logger
+
+log = get_logger('migrations')
+
+# Ordered list of (version, description, statements) for SQLite. Append new
+# entries to change the schema; never edit one that has already shipped.
+# migrations_postgres.py holds the same versions for PostgreSQL.
+MIGRATIONS = [
+    (1, 'initial schema', [
+        # IF NOT EXISTS so databases created before versioning adopt cleanly
+        '''CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE,
+            password TEXT,
+            role TEXT,
+            manager_id INTEGER
+        )''',
+        '''CREATE TABLE IF NOT EXISTS evaluations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            employee_id INTEGER,
+            manager_id INTEGER,
+            quality REAL,
+            punctuality REAL,
+            teamwork REAL,
+            targets REAL,
+            comments TEXT,
+            review_date TEXT,
+            status TEXT
+        )''',
+        '''CREATE TABLE IF NOT EXISTS goals (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            employee_id INTEGER,
+            manager_id INTEGER,
+            description TEXT,
+            set_date TEXT,
+            status TEXT
+        )''',
+        '''CREATE TABLE IF NOT EXISTS feedback (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            employee_id INTEGER,
+            manager_id INTEGER,
+            message TEXT,
+            date TEXT
+        )''',
+        '''CREATE TABLE IF NOT EXISTS self_evaluations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            employee_id INTEGER,
+            comments TEXT,
+            submission_date TEXT,
+            status TEXT
+        )''',
+        '''CREATE TABLE IF NOT EXISTS documents (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            employee_id INTEGER,
+            filename TEXT,
+            upload_date TEXT
+        )''',
+        '''CREATE TABLE IF NOT EXISTS meetings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            employee_id INTEGER,
+            manager_id INTEGER,
+            meeting_date TEXT,
+            purpose TEXT
+        )''',
+        '''CREATE TABLE IF NOT EXISTS training (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            employee_id INTEGER,
+            manager_id INTEGER,
+            program TEXT,
+            date TEXT
+        )''',
+    ]),
+    (2, 'secondary indexes for employee/manager lookups', [
+        # Team lookups, get_managers and the self_evaluations subquery
+        'CREATE INDEX IF NOT EXISTS idx_users_manager_role ON users (manager_id, role)',
+        'CREATE INDEX IF NOT EXISTS idx_users_role ON users (role)',
+        # Manager-side listings filter on manager_id, optionally employee_id
+        'CREATE INDEX IF NOT EXISTS idx_evaluations_manager_employee_date '
+        'ON evaluations (manager_id, employee_id, review_date)',
+        'CREATE INDEX IF NOT EXISTS idx_evaluations_employee_date ON evaluations (employee_id, review_date)',
+        'CREATE INDEX IF NOT EXISTS idx_goals_manager_employee ON goals (manager_id, employee_id)',
+        'CREATE INDEX IF NOT EXISTS idx_feedback_manager_employee ON feedback (manager_id, employee_id)',
+        'CREATE INDEX IF NOT EXISTS idx_meetings_manager_employee ON meetings (manager_id, employee_id)',
+        'CREATE INDEX IF NOT EXISTS idx_training_manager_employee ON training (manager_id, employee_id)',
+        'CREATE INDEX IF NOT EXISTS idx_self_evaluations_employee ON self_evaluations (employee_id)',
+        'CREATE INDEX IF NOT EXISTS idx_documents_employee ON documents (employee_id)',
+    ]),
+    (3, 'keyset pagination index for manager evaluation history', [
+        # Serves ORDER BY review_date DESC, id DESC without a sort step
+        'CREATE INDEX IF NOT EXISTS idx_evaluations_manager_date ON evaluations (manager_id, review_date)',
+    ]),
+]
+
+METRICS = ('quality', 'punctuality', 'teamwork', 'targets')
+
+
+def _metric_list(template, sep=', '):
+    return sep.join(template.format(m=m) for m in METRICS)
+
+
+def _stats_migration():
+    # Running per-employee and per-month aggregates of the evaluation
+    # scores, kept current by triggers in the same transaction as the
+    # evaluation write. Means are derived as sum / eval_count on read.
+    # Evaluations are never deleted or re-scored, so min/max only grow.
+    columns = _metric_list('{m}_sum REAL, {m}_min REAL, {m}_max REAL', ',\n            ')
+    names = _metric_list('{m}_sum, {m}_min, {m}_max')
+    complete = _metric_list('{m} IS NOT NULL', ' AND ') + ' AND employee_id IS NOT NULL AND manager_id IS NOT NULL'
+    new_complete = _metric_list('NEW.{m} IS NOT NULL', ' AND ') + ' AND NEW.employee_id IS NOT NULL AND NEW.manager_id IS NOT NULL'
+    new_values = _metric_list('NEW.{m}, NEW.{m}, NEW.{m}')
+    merge = _metric_list('{m}_sum = {m}_sum + excluded.{m}_sum, '
+                         '{m}_min = min({m}_min, excluded.{m}_min), '
+                         '{m}_max = max({m}_max, excluded.{m}_max)', ',\n                ')
+    period = "strftime('%Y-%m', review_date)"
+    new_period = "strftime('%Y-%m', NEW.review_date)"
+    return [
+        f'''CREATE TABLE evaluation_stats_employee (
+            manager_id INTEGER NOT NULL,
+            employee_id INTEGER NOT NULL,
+            eval_count INTEGER NOT NULL,
+            final_count INTEGER NOT NULL,
+            {columns},
+            PRIMARY KEY (manager_id, employee_id)
+        ) WITHOUT ROWID''',
+        f'''CREATE TABLE evaluation_stats_period (
+            manager_id INTEGER NOT NULL,
+            employee_id INTEGER NOT NULL,
+            period TEXT NOT NULL,
+            eval_count INTEGER NOT NULL,
+            final_count INTEGER NOT NULL,
+            {columns},
+            PRIMARY KEY (manager_id, employee_id, period)
+        ) WITHOUT ROWID''',
+        # Backfill from the rows already in the database
+        f'''INSERT INTO evaluation_stats_employee (manager_id, employee_id, eval_count, final_count, {names})
+            SELECT manager_id, employee_id, COUNT(*), SUM(status IS 'Final'), {_metric_list('SUM({m}), MIN({m}), MAX({m})')}
+            FROM evaluations WHERE {complete}
+            GROUP BY manager_id, employee_id''',
+        f'''INSERT INTO evaluation_stats_period (manager_id, employee_id, period, eval_count, final_count, {names})
+            SELECT manager_id, employee_id, {period}, COUNT(*), SUM(status IS 'Final'), {_metric_list('SUM({m}), MIN({m}), MAX({m})')}
+            FROM evaluations WHERE {complete} AND {period} IS NOT NULL
+            GROUP BY manager_id, employee_id, {period}''',
+        # The WHERE clauses on the INSERT ... SELECT statements also stop
+        # ON CONFLICT from being parsed as a join constraint.
+        f'''CREATE TRIGGER trg_evaluations_stats_insert AFTER INSERT ON evaluations
+        WHEN {new_complete}
+        BEGIN
+            INSERT INTO evaluation_stats_employee (manager_id, employee_id, eval_count, final_count, {names})
+                SELECT NEW.manager_id, NEW.employee_id, 1, NEW.status IS 'Final', {new_values} WHERE 1
+                ON CONFLICT (manager_id, employee_id) DO UPDATE SET
+                eval_count = eval_count + 1,
+                final_count = final_count + excluded.final_count,
+                {merge};
+            INSERT INTO evaluation_stats_period (manager_id, employee_id, period, eval_count, final_count, {names})
+                SELECT NEW.manager_id, NEW.employee_id, {new_period}, 1, NEW.status IS 'Final', {new_values}
+                WHERE {new_period} IS NOT NULL
+                ON CONFLICT (manager_id, employee_id, period) DO UPDATE SET
+                eval_count = eval_count + 1,
+                final_count = final_count + excluded.final_count,
+                {merge};
+        END''',
+        # Finalizing (or un-finalizing) only moves final_count
+        f'''CREATE TRIGGER trg_evaluations_stats_status AFTER UPDATE OF status ON evaluations
+        WHEN OLD.status IS NOT NEW.status AND {new_complete}
+        BEGIN
+            UPDATE evaluation_stats_employee
+            SET final_count = final_count + (NEW.status IS 'Final') - (OLD.status IS 'Final')
+            WHERE manager_id = NEW.manager_id AND employee_id = NEW.employee_id;
+            UPDATE evaluation_stats_period
+            SET final_count = final_count + (NEW.status IS 'Final') - (OLD.status IS 'Final')
+            WHERE manager_id = NEW.manager_id AND employee_id = NEW.employee_id AND period = {new_period};
+        END''',
+    ]
+
+
+MIGRATIONS.append((4, 'pre-aggregated evaluation statistics', _stats_migration()))
+MIGRATIONS.append((5, 'document blob metadata', [
+    # Content lives in blobstore under its sha256. Rows from before this
+    # migration have no content and keep NULL metadata; NULLs never collide
+    # in the unique index, which is what makes re-uploads idempotent.
+    'ALTER TABLE documents ADD COLUMN size INTEGER',
+    'ALTER TABLE documents ADD COLUMN sha256 TEXT',
+    'ALTER TABLE documents ADD COLUMN mime TEXT',
+    'CREATE UNIQUE INDEX idx_documents_employee_sha256 ON documents (employee_id, sha256)',
+]))
+
+# Text columns covered by full-text search: table -> (source code, text
+# column, date column, manager id expression). The code is folded into the
+# index rowid as id * 4 + code, so each source row maps to exactly one
+# index row and triggers can find it without a lookup.
+SEARCH_SOURCES = {
+    'evaluations': (0, 'comments', 'review_date', '{row}.manager_id'),
+    'feedback': (1, 'message', 'date', '{row}.manager_id'),
+    'goals': (2, 'description', 'set_date', '{row}.manager_id'),
+    # No manager column; use the employee's manager at the time of writing
+    'self_evaluations': (3, 'comments', 'submission_date',
+                         '(SELECT manager_id FROM users WHERE id = {row}.employee_id)'),
+}
+
+
+# Extra scope token per source (migration 12). Self-evaluations carry one so
+# a manager's search can MATCH just those and then keep the ones from their
+# org_closure subtree, which the "m<manager_id>" token cannot express.
+SEARCH_TOKENS = {'self_evaluations': 'self'}
+_SEARCH_COLUMNS = 'rowid, body, scope, source, source_id, employee_id, date'
+
+
+def _search_values(table, row, tokens=None):
+    code, text, date, manager = SEARCH_SOURCES[table]
+    manager = manager.format(row=row)
+    token = (tokens or {}).get(table)
+    extra = f" || ' {token}'" if token else ''
+    # scope holds "e<employee_id> m<manager_id>" tokens so access checks are
+    # part of the MATCH and run on the index, not as a filter over every hit
+    return (f"{row}.id * 4 + {code}, {row}.{text}, "
+            f"'e' || {row}.employee_id || ' m' || COALESCE({manager}, ''){extra}, "
+            f"'{table}', {row}.id, {row}.employee_id, {row}.{date}")
+
+
+def _search_triggers(table, tokens=None):
+    code, text, _, _ = SEARCH_SOURCES[table]
+    values = _search_values(table, 'NEW', tokens)
+    return [
+        f'''CREATE TRIGGER trg_{table}_search_insert AFTER INSERT ON {table}
+        WHEN NEW.{text} <> ''
+        BEGIN
+            INSERT INTO search_index ({_SEARCH_COLUMNS}) VALUES ({values});
+        END''',
+        f'''CREATE TRIGGER trg_{table}_search_update AFTER UPDATE OF {text} ON {table}
+        BEGIN
+            DELETE FROM search_index WHERE rowid = OLD.id * 4 + {code};
+            INSERT INTO search_index ({_SEARCH_COLUMNS}) SELECT {values} WHERE NEW.{text} <> '';
+        END''',
+    ]
+
+
+def _search_migration():
+    columns = _SEARCH_COLUMNS
+    statements = [
+        # prefix indexes serve the trailing-prefix term of search-as-you-type
+        '''CREATE VIRTUAL TABLE search_index USING fts5 (
+            body, scope, source UNINDEXED, source_id UNINDEXED, employee_id UNINDEXED, date UNINDEXED,
+            tokenize = 'porter unicode61', prefix = '2 3'
+        )''',
+    ]
+    for table, (code, text, _, _) in SEARCH_SOURCES.items():
+        statements += [
+            f"INSERT INTO search_index ({columns}) "
+            f"SELECT {_search_values(table, table)} FROM {table} WHERE {text} <> ''",
+            *_search_triggers(table),
+            f'''CREATE TRIGGER trg_{table}_search_delete AFTER DELETE ON {table}
+            BEGIN
+                DELETE FROM search_index WHERE rowid = OLD.id * 4 + {code};
+            END''',
+        ]
+    return statements
+
+
+MIGRATIONS.append((6, 'full-text search index', _search_migration()))
+
+# Org hierarchy: one row per (ancestor, descendant) pair of users.manager_id
+# links, including each user paired with itself at depth 0, so "everyone
+# under X" is a primary-key range scan instead of a recursive walk.
+# Triggers keep it in step with users. The statements are written to run
+# unchanged in the PostgreSQL trigger functions too.
+_CLOSURE_BACKFILL = '''INSERT INTO org_closure (ancestor_id, descendant_id, depth)
+    WITH RECURSIVE tree (ancestor_id, descendant_id, depth) AS (
+        SELECT id, id, 0 FROM users
+        UNION ALL
+        SELECT t.ancestor_id, u.id, t.depth + 1
+        FROM tree t JOIN users u ON u.manager_id = t.descendant_id
+        WHERE t.depth < 32
+    )
+    SELECT ancestor_id, descendant_id, MIN(depth) FROM tree GROUP BY ancestor_id, descendant_id'''
+_CLOSURE_INSERT = (
+    # The new user, then its manager's ancestors above it
+    "INSERT INTO org_closure (ancestor_id, descendant_id, depth) VALUES (NEW.id, NEW.id, 0)",
+    """INSERT INTO org_closure (ancestor_id, descendant_id, depth)
+        SELECT ancestor_id, NEW.id, depth + 1 FROM org_closure WHERE descendant_id = NEW.manager_id""",
+    # Users already pointing at the new id (seeded before their manager)
+    # bring their subtrees along
+    """INSERT INTO org_closure (ancestor_id, descendant_id, depth)
+        SELECT a.ancestor_id, d.descendant_id, a.depth + d.depth + 1
+        FROM org_closure a
+        JOIN users c ON c.manager_id = NEW.id AND c.id <> NEW.id
+        JOIN org_closure d ON d.ancestor_id = c.id
+        WHERE a.descendant_id = NEW.id""",
+)
+_CLOSURE_MOVE = (
+    # Detach the subtree from its old ancestors, then hang it under the new
+    # manager's ancestors; links inside the subtree stay as they are
+    """DELETE FROM org_closure
+        WHERE descendant_id IN (SELECT descendant_id FROM org_closure WHERE ancestor_id = NEW.id)
+          AND ancestor_id NOT IN (SELECT descendant_id FROM org_closure WHERE ancestor_id = NEW.id)""",
+    """INSERT INTO org_closure (ancestor_id, descendant_id, depth)
+        SELECT a.ancestor_id, d.descendant_id, a.depth + d.depth + 1
+        FROM org_closure a JOIN org_closure d ON d.ancestor_id = NEW.id
+        WHERE a.descendant_id = NEW.manager_id""",
+)
+_CLOSURE_DELETE = "DELETE FROM org_closure WHERE descendant_id = OLD.id OR ancestor_id = OLD.id"
+# A manager may not report to someone in their own subtree
+_CLOSURE_CYCLE = "SELECT 1 FROM org_closure WHERE ancestor_id = NEW.id AND descendant_id = NEW.manager_id"
+
+
+def _closure_migration():
+    def body(statements):
+        return ''.join(f"\n            {statement};" for statement in statements)
+    return [
+        '''CREATE TABLE org_closure (
+            ancestor_id INTEGER NOT NULL,
+            descendant_id INTEGER NOT NULL,
+            depth INTEGER NOT NULL,
+            PRIMARY KEY (ancestor_id, descendant_id)
+        ) WITHOUT ROWID''',
+        'CREATE INDEX idx_org_closure_descendant ON org_closure (descendant_id, depth)',
+        _CLOSURE_BACKFILL,
+        f'''CREATE TRIGGER trg_users_closure_insert AFTER INSERT ON users
+        BEGIN{body(_CLOSURE_INSERT)}
+        END''',
+        f'''CREATE TRIGGER trg_users_closure_cycle BEFORE UPDATE OF manager_id ON users
+        WHEN EXISTS ({_CLOSURE_CYCLE})
+        BEGIN
+            SELECT RAISE(ABORT, 'manager_id would create a reporting cycle');
+        END''',
+        f'''CREATE TRIGGER trg_users_closure_move AFTER UPDATE OF manager_id ON users
+        WHEN OLD.manager_id IS NOT NEW.manager_id
+        BEGIN{body(_CLOSURE_MOVE)}
+        END''',
+        f'''CREATE TRIGGER trg_users_closure_delete AFTER DELETE ON users
+        BEGIN{body([_CLOSURE_DELETE])}
+        END''',
+    ]
+
+
+MIGRATIONS.append((7, 'org hierarchy closure table', _closure_migration()))
+
+# Meeting times as [starts_at, ends_at) in 'YYYY-MM-DD HH:MM' text, which
+# sorts chronologically. A participant's meetings never overlap, so the one
+# starting last before a new meeting ends is the only one that can clash
+# with it: conflict checks and calendar windows are seeks on these indexes.
+# Older rows only have a date; they become zero-length intervals at the
+# start of that day, shown on the calendar but never in conflict.
+_MEETING_INTERVALS = [
+    'ALTER TABLE meetings ADD COLUMN starts_at TEXT',
+    'ALTER TABLE meetings ADD COLUMN ends_at TEXT',
+]
+_MEETING_INDEXES = [
+    'CREATE INDEX idx_meetings_manager_start ON meetings (manager_id, starts_at, ends_at)',
+    'CREATE INDEX idx_meetings_employee_start ON meetings (employee_id, starts_at, ends_at)',
+]
+_MEETING_BACKFILL = ("UPDATE meetings SET starts_at = substr(meeting_date, 1, 10), ends_at = substr(meeting_date, 1, 10) "
+                     "WHERE meeting_date {dated}")
+
+MIGRATIONS.append((8, 'meeting start and end times', [
+    *_MEETING_INTERVALS,
+    _MEETING_BACKFILL.format(dated="GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*'"),
+    *_MEETING_INDEXES,
+]))
+
+# Change feed: a change_log row for each insert, and each status change,
+# that someone other than its author should hear about. user_id is that
+# person, so their unread items are a range scan of (user_id, id) above
+# the high-water mark kept in change_marks. Ids only ever grow, so a mark
+# never skips a row committed after it was set.
+# table -> (who hears about inserts, their summary, whether status changes
+# are sent back to the employee)
+FEED_SOURCES = {
+    'evaluations': ('{row}.employee_id', "COALESCE(NULLIF({row}.comments, ''), 'New evaluation')", True),
+    # Goals an employee sets themselves (migration 11) go to their manager
+    'goals': ('CASE WHEN {row}.author_id = {row}.employee_id THEN {row}.manager_id ELSE {row}.employee_id END',
+              '{row}.description', True),
+    'feedback': ('{row}.employee_id', '{row}.message', False),
+    'meetings': ('{row}.employee_id', "COALESCE({row}.starts_at || ' · ', '') || {row}.purpose", False),
+    'training': ('{row}.employee_id', '{row}.program', False),
+    # Written by the employee, so their manager hears; decisions go back
+    'self_evaluations': ('(SELECT manager_id FROM users WHERE id = {row}.employee_id)', '{row}.comments', True),
+}
+
+
+# Recipients as migration 9 created them, before goals had an author
+_FEED_V9_RECIPIENTS = {'goals': '{row}.employee_id'}
+
+
+def _feed_insert(table, recipient=None):
+    default, summary, _ = FEED_SOURCES[table]
+    recipient, summary = (recipient or default).format(row='NEW'), summary.format(row='NEW')
+    return (f"INSERT INTO change_log (user_id, source, source_id, op, summary) "
+            f"SELECT {recipient}, '{table}', NEW.id, 'insert', {summary} WHERE {recipient} IS NOT NULL")
+
+
+def _feed_status(table):
+    return (f"INSERT INTO change_log (user_id, source, source_id, op, summary) "
+            f"VALUES (NEW.employee_id, '{table}', NEW.id, 'update', 'Status: ' || NEW.status)")
+
+
+_CHANGE_LOG_INDEX = 'CREATE INDEX idx_change_log_user ON change_log (user_id, id)'
+_CHANGE_MARKS = '''CREATE TABLE change_marks (
+            user_id INTEGER PRIMARY KEY,
+            last_seen_id INTEGER NOT NULL
+        )'''
+
+
+def _feed_migration():
+    statements = [
+        # AUTOINCREMENT so the ids of deleted rows are never handed out again
+        '''CREATE TABLE change_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            source TEXT NOT NULL,
+            source_id INTEGER NOT NULL,
+            op TEXT NOT NULL,
+            summary TEXT,
+            changed_at TEXT NOT NULL DEFAULT (datetime('now'))
+        )''',
+        _CHANGE_LOG_INDEX,
+        _CHANGE_MARKS,
+    ]
+    for table, (_, _, status) in FEED_SOURCES.items():
+        statements.append(f'''CREATE TRIGGER trg_{table}_feed_insert AFTER INSERT ON {table}
+        BEGIN
+            {_feed_insert(table, _FEED_V9_RECIPIENTS.get(table))};
+        END''')
+        if status:
+            statements.append(f'''CREATE TRIGGER trg_{table}_feed_status AFTER UPDATE OF status ON {table}
+        WHEN OLD.status IS NOT NEW.status
+        BEGIN
+            {_feed_status(table)};
+        END''')
+    return statements
+
+
+MIGRATIONS.append((9, 'change feed', _feed_migration()))
+
+# A per-user high-water id assumed change_log ids commit in order. They do
+# not once rows come from more than one connection (bulk imports, the API
+# process), so a row committing below someone's mark was never shown.
+# Seen state now lives on each row, which is addressed to one user.
+FEED_SEEN = [
+    'ALTER TABLE change_log ADD COLUMN seen INTEGER NOT NULL DEFAULT 0',
+    '''UPDATE change_log SET seen = 1
+       WHERE id <= COALESCE((SELECT last_seen_id FROM change_marks WHERE change_marks.user_id = change_log.user_id), 0)''',
+    # Unread lookups only ever touch the (small) unseen part of the log
+    'CREATE INDEX idx_change_log_unread ON change_log (user_id, id) WHERE seen = 0',
+    'DROP TABLE change_marks',
+]
+MIGRATIONS.append((10, 'per-row change feed read state', FEED_SEEN))
+
+# Who wrote a goal: the employee for goals they set themselves, otherwise
+# their manager. Rows from before this migration are the manager's.
+GOAL_AUTHOR = 'ALTER TABLE goals ADD COLUMN author_id INTEGER'
+MIGRATIONS.append((11, 'goal authors', [
+    GOAL_AUTHOR,
+    'DROP TRIGGER trg_goals_feed_insert',
+    f'''CREATE TRIGGER trg_goals_feed_insert AFTER INSERT ON goals
+        BEGIN
+            {_feed_insert('goals')};
+        END''',
+]))
+
+
+def _search_token_migration():
+    statements = []
+    for table, token in SEARCH_TOKENS.items():
+        statements += [
+            f"UPDATE search_index SET scope = scope || ' {token}' WHERE source = '{table}'",
+            f'DROP TRIGGER trg_{table}_search_insert',
+            f'DROP TRIGGER trg_{table}_search_update',
+            *_search_triggers(table, SEARCH_TOKENS),
+        ]
+    return statements
+
+
+MIGRATIONS.append((12, 'search scope tokens per source', _search_token_migration()))
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def _migrations_for(backend):
+    if backend.name == 'postgres':
+        from migrations_postgres import POSTGRES_MIGRATIONS
+        return POSTGRES_MIGRATIONS
+    return MIGRATIONS
+
+
+def get_schema_version(conn):
+    return get_backend().get_schema_version(conn)
+
+
+def migrate(conn, target=LATEST_VERSION):
+    """Apply every pending migration up to ``target``, one transaction each.
+
+    Returns the list of versions that were applied by this call.
+    """
+    backend = get_backend()
+    applied = []
+    if backend.get_schema_version(conn) >= target:
+        return applied
+    for version, description, statements in _migrations_for(backend):
+        if version > target:
+            break
+        with backend.migration_lock(conn):
+            # Re-read under the lock: another process may have migrated
+            # while we were waiting for it.
+            if backend.get_schema_version(conn) >= version:
+                continue
+            for statement in statements:
+                conn.execute(statement)
+            backend.set_schema_version(conn, version)
+        log.info('migration_applied', version=version, description=description)
+        applied.append(version)
+    return applied
+
+
+# Demo accounts created on first start. emp1 reports to mgr1 (id 2).
+SAMPLE_USERS = [
+    ('emp1', 'pass123', 'employee', 2),
+    ('mgr1', 'pass123', 'manager', None),
+]
+
+
+def seed_sample_data(conn):
+    """Insert the sample users if they are missing.
+
+    Checks with a read first so an already-seeded database never takes the
+    write lock.
+    """
+    usernames = [user[0] for user in SAMPLE_USERS]
+    placeholders = ', '.join('?' * len(usernames))
+    existing = conn.execute(f'SELECT COUNT(*) FROM users WHERE username IN ({placeholders})',
+                            usernames).fetchone()[0]
+    if existing == len(SAMPLE_USERS):
+        return 0
+    with conn:
+        cursor = conn.executemany('''INSERT INTO users (username, password, role, manager_id) VALUES (?, ?, ?, ?)
+                                     ON CONFLICT (username) DO NOTHING''', SAMPLE_USERS)
+    return cursor.rowcount
@@ -0,0 +1,305 @@
+from migrations import (_CHANGE_LOG_INDEX, _CHANGE_MARKS, _CLOSURE_BACKFILL, _CLOSURE_CYCLE, _CLOSURE_DELETE,
+                        _CLOSURE_INSERT, _CLOSURE_MOVE, _FEED_V9_RECIPIENTS, _MEETING_BACKFILL, _MEETING_INDEXES,
+                        _MEETING_INTERVALS, FEED_SEEN, FEED_SOURCES, GOAL_AUTHOR, MIGRATIONS, SEARCH_SOURCES,
+                        _feed_insert, _feed_status, _metric_list)
+
+# PostgreSQL versions of the SQLite migrations in migrations.py. Version
+# numbers and the resulting tables, columns and indexes match, so the
+# repository queries run unchanged; triggers become PL/pgSQL functions and
+# the FTS5 index becomes a tsvector column with a GIN index.
+POSTGRES_MIGRATIONS = [
+    (1, 'initial schema', [
+        '''CREATE TABLE IF NOT EXISTS users (
+            id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+            username TEXT UNIQUE,
+            password TEXT,
+            role TEXT,
+            manager_id INTEGER
+        )''',
+        '''CREATE TABLE IF NOT EXISTS evaluations (
+            id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+            employee_id INTEGER,
+            manager_id INTEGER,
+            quality DOUBLE PRECISION,
+            punctuality DOUBLE PRECISION,
+            teamwork DOUBLE PRECISION,
+            targets DOUBLE PRECISION,
+            comments TEXT,
+            review_date TEXT,
+            status TEXT
+        )''',
+        '''CREATE TABLE IF NOT EXISTS goals (
+            id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+            employee_id INTEGER,
+            manager_id INTEGER,
+            description TEXT,
+            set_date TEXT,
+            status TEXT
+        )''',
+        '''CREATE TABLE IF NOT EXISTS feedback (
+            id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+            employee_id INTEGER,
+            manager_id INTEGER,
+            message TEXT,
+            date TEXT
+        )''',
+        '''CREATE TABLE IF NOT EXISTS self_evaluations (
+            id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+            employee_id INTEGER,
+            comments TEXT,
+            submission_date TEXT,
+            status TEXT
+        )''',
+        '''CREATE TABLE IF NOT EXISTS documents (
+            id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+            employee_id INTEGER,
+            filename TEXT,
+            upload_date TEXT
+        )''',
+        '''CREATE TABLE IF NOT EXISTS meetings (
+            id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+            employee_id INTEGER,
+            manager_id INTEGER,
+            meeting_date TEXT,
+            purpose TEXT
+        )''',
+        '''CREATE TABLE IF NOT EXISTS training (
+            id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+            employee_id INTEGER,
+            manager_id INTEGER,
+            program TEXT,
+            date TEXT
+        )''',
+    ]),
+    # Plain CREATE INDEX statements are the same in both dialects
+    MIGRATIONS[1],
+    MIGRATIONS[2],
+]
+
+
+def _stats_migration():
+    columns = _metric_list('{m}_sum DOUBLE PRECISION, {m}_min DOUBLE PRECISION, {m}_max DOUBLE PRECISION',
+                           ',\n            ')
+    names = _metric_list('{m}_sum, {m}_min, {m}_max')
+    complete = _metric_list('{m} IS NOT NULL', ' AND ') + ' AND employee_id IS NOT NULL AND manager_id IS NOT NULL'
+    new_incomplete = _metric_list('NEW.{m} IS NULL', ' OR ') + ' OR NEW.employee_id IS NULL OR NEW.manager_id IS NULL'
+    new_values = _metric_list('NEW.{m}, NEW.{m}, NEW.{m}')
+    merge = _metric_list('{m}_sum = s.{m}_sum + excluded.{m}_sum, '
+                         '{m}_min = LEAST(s.{m}_min, excluded.{m}_min), '
+                         '{m}_max = GREATEST(s.{m}_max, excluded.{m}_max)', ',\n                ')
+    aggregates = _metric_list('SUM({m}), MIN({m}), MAX({m})')
+    is_final = "(NEW.status IS NOT DISTINCT FROM 'Final')::int"
+    was_final = "(OLD.status IS NOT DISTINCT FROM 'Final')::int"
+    return [
+        f'''CREATE TABLE evaluation_stats_employee (
+            manager_id INTEGER NOT NULL,
+            employee_id INTEGER NOT NULL,
+            eval_count INTEGER NOT NULL,
+            final_count INTEGER NOT NULL,
+            {columns},
+            PRIMARY KEY (manager_id, employee_id)
+        )''',
+        f'''CREATE TABLE evaluation_stats_period (
+            manager_id INTEGER NOT NULL,
+            employee_id INTEGER NOT NULL,
+            period TEXT NOT NULL,
+            eval_count INTEGER NOT NULL,
+            final_count INTEGER NOT NULL,
+            {columns},
+            PRIMARY KEY (manager_id, employee_id, period)
+        )''',
+        f'''INSERT INTO evaluation_stats_employee (manager_id, employee_id, eval_count, final_count, {names})
+            SELECT manager_id, employee_id, COUNT(*), COUNT(*) FILTER (WHERE status = 'Final'), {aggregates}
+            FROM evaluations WHERE {complete}
+            GROUP BY manager_id, employee_id''',
+        f'''INSERT INTO evaluation_stats_period (manager_id, employee_id, period, eval_count, final_count, {names})
+            SELECT manager_id, employee_id, substr(review_date, 1, 7), COUNT(*),
+                   COUNT(*) FILTER (WHERE status = 'Final'), {aggregates}
+            FROM evaluations WHERE {complete} AND review_date IS NOT NULL
+            GROUP BY manager_id, employee_id, substr(review_date, 1, 7)''',
+        f'''CREATE FUNCTION evaluation_stats_insert() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF {new_incomplete} THEN
+                RETURN NULL;
+            END IF;
+            INSERT INTO evaluation_stats_employee AS s (manager_id, employee_id, eval_count, final_count, {names})
+                VALUES (NEW.manager_id, NEW.employee_id, 1, {is_final}, {new_values})
+                ON CONFLICT (manager_id, employee_id) DO UPDATE SET
+                eval_count = s.eval_count + 1,
+                final_count = s.final_count + excluded.final_count,
+                {merge};
+            IF NEW.review_date IS NOT NULL THEN
+                INSERT INTO evaluation_stats_period AS s (manager_id, employee_id, period, eval_count, final_count, {names})
+                    VALUES (NEW.manager_id, NEW.employee_id, substr(NEW.review_date, 1, 7), 1, {is_final}, {new_values})
+                    ON CONFLICT (manager_id, employee_id, period) DO UPDATE SET
+                    eval_count = s.eval_count + 1,
+                    final_count = s.final_count + excluded.final_count,
+                    {merge};
+            END IF;
+            RETURN NULL;
+        END $$''',
+        '''CREATE TRIGGER trg_evaluations_stats_insert AFTER INSERT ON evaluations
+            FOR EACH ROW EXECUTE FUNCTION evaluation_stats_insert()''',
+        f'''CREATE FUNCTION evaluation_stats_status() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF {new_incomplete} THEN
+                RETURN NULL;
+            END IF;
+            UPDATE evaluation_stats_employee
+            SET final_count = final_count + {is_final} - {was_final}
+            WHERE manager_id = NEW.manager_id AND employee_id = NEW.employee_id;
+            UPDATE evaluation_stats_period
+            SET final_count = final_count + {is_final} - {was_final}
+            WHERE manager_id = NEW.manager_id AND employee_id = NEW.employee_id
+              AND period = substr(NEW.review_date, 1, 7);
+            RETURN NULL;
+        END $$''',
+        '''CREATE TRIGGER trg_evaluations_stats_status AFTER UPDATE OF status ON evaluations
+            FOR EACH ROW WHEN (OLD.status IS DISTINCT FROM NEW.status)
+            EXECUTE FUNCTION evaluation_stats_status()''',
+    ]
+
+
+POSTGRES_MIGRATIONS.append((4, 'pre-aggregated evaluation statistics', _stats_migration()))
+POSTGRES_MIGRATIONS.append((5, 'document blob metadata', [
+    'ALTER TABLE documents ADD COLUMN size BIGINT',
+    'ALTER TABLE documents ADD COLUMN sha256 TEXT',
+    'ALTER TABLE documents ADD COLUMN mime TEXT',
+    'CREATE UNIQUE INDEX idx_documents_employee_sha256 ON documents (employee_id, sha256)',
+]))
+
+
+def _search_values(table, row):
+    code, text, date, manager = SEARCH_SOURCES[table]
+    return (f"{row}.id * 4 + {code}, {row}.{text}, '{table}', {row}.id, {row}.employee_id, "
+            f"{manager.format(row=row)}, {row}.{date}")
+
+
+def _search_migration():
+    # Same rows and ids as the SQLite FTS5 table. Access scope is a pair of
+    # plain columns here; the planner combines their btree indexes with the
+    # GIN index on the tsvector.
+    columns = 'id, body, source, source_id, employee_id, manager_id, date'
+    statements = [
+        '''CREATE TABLE search_index (
+            id BIGINT PRIMARY KEY,
+            body TEXT NOT NULL,
+            source TEXT NOT NULL,
+            source_id INTEGER NOT NULL,
+            employee_id INTEGER,
+            manager_id INTEGER,
+            date TEXT,
+            tsv tsvector GENERATED ALWAYS AS (to_tsvector('english', body)) STORED
+        )''',
+        'CREATE INDEX idx_search_index_tsv ON search_index USING GIN (tsv)',
+        'CREATE INDEX idx_search_index_manager ON search_index (manager_id)',
+        'CREATE INDEX idx_search_index_employee ON search_index (employee_id)',
+    ]
+    for table, (code, text, _, _) in SEARCH_SOURCES.items():
+        statements += [
+            f"INSERT INTO search_index ({columns}) "
+            f"SELECT {_search_values(table, table)} FROM {table} WHERE {text} <> ''",
+            f'''CREATE FUNCTION {table}_search_sync() RETURNS trigger LANGUAGE plpgsql AS $$
+            BEGIN
+                IF TG_OP <> 'INSERT' THEN
+                    DELETE FROM search_index WHERE id = OLD.id * 4 + {code};
+                END IF;
+                IF TG_OP <> 'DELETE' AND NEW.{text} <> '' THEN
+                    INSERT INTO search_index ({columns}) VALUES ({_search_values(table, 'NEW')});
+                END IF;
+                RETURN NULL;
+            END $$''',
+            f'''CREATE TRIGGER trg_{table}_search AFTER INSERT OR DELETE OR UPDATE OF {text} ON {table}
+                FOR EACH ROW EXECUTE FUNCTION {table}_search_sync()''',
+        ]
+    return statements
+
+
+POSTGRES_MIGRATIONS.append((6, 'full-text search index', _search_migration()))
+
+
+def _closure_migration():
+    def body(statements):
+        return ''.join(f"\n                {statement};" for statement in statements)
+    return [
+        '''CREATE TABLE org_closure (
+            ancestor_id INTEGER NOT NULL,
+            descendant_id INTEGER NOT NULL,
+            depth INTEGER NOT NULL,
+            PRIMARY KEY (ancestor_id, descendant_id)
+        )''',
+        'CREATE INDEX idx_org_closure_descendant ON org_closure (descendant_id, depth)',
+        _CLOSURE_BACKFILL,
+        f'''CREATE FUNCTION users_closure_sync() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN{body(_CLOSURE_INSERT)}
+            ELSIF TG_OP = 'DELETE' THEN{body([_CLOSURE_DELETE])}
+            ELSIF OLD.manager_id IS DISTINCT FROM NEW.manager_id THEN
+                IF EXISTS ({_CLOSURE_CYCLE}) THEN
+                    RAISE EXCEPTION 'manager_id would create a reporting cycle' USING ERRCODE = 'integrity_constraint_violation';
+                END IF;{body(_CLOSURE_MOVE)}
+            END IF;
+            RETURN NULL;
+        END $$''',
+        '''CREATE TRIGGER trg_users_closure AFTER INSERT OR DELETE OR UPDATE OF manager_id ON users
+            FOR EACH ROW EXECUTE FUNCTION users_closure_sync()''',
+    ]
+
+
+POSTGRES_MIGRATIONS.append((7, 'org hierarchy closure table', _closure_migration()))
+
+POSTGRES_MIGRATIONS.append((8, 'meeting start and end times', [
+    *_MEETING_INTERVALS,
+    _MEETING_BACKFILL.format(dated="~ '^[0-9]{4}-[0-9]{2}-[0-9]{2}'"),
+    *_MEETING_INDEXES,
+]))
+
+
+def _feed_function(table, recipient=None, replace=False):
+    return f'''CREATE {'OR REPLACE ' if replace else ''}FUNCTION {table}_feed() RETURNS trigger LANGUAGE plpgsql AS $$
+            BEGIN
+                IF TG_OP = 'INSERT' THEN
+                    {_feed_insert(table, recipient)};
+                ELSIF OLD.status IS DISTINCT FROM NEW.status THEN
+                    {_feed_status(table)};
+                END IF;
+                RETURN NULL;
+            END $$'''
+
+
+def _feed_migration():
+    statements = [
+        '''CREATE TABLE change_log (
+            id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            source TEXT NOT NULL,
+            source_id INTEGER NOT NULL,
+            op TEXT NOT NULL,
+            summary TEXT,
+            changed_at TEXT NOT NULL DEFAULT to_char(now() AT TIME ZONE 'UTC', 'YYYY-MM-DD HH24:MI:SS')
+        )''',
+        _CHANGE_LOG_INDEX,
+        _CHANGE_MARKS,
+    ]
+    for table, (_, _, status) in FEED_SOURCES.items():
+        events = 'INSERT OR UPDATE OF status' if status else 'INSERT'
+        statements += [
+            _feed_function(table, _FEED_V9_RECIPIENTS.get(table)),
+            f'''CREATE TRIGGER trg_{table}_feed AFTER {events} ON {table}
+                FOR EACH ROW EXECUTE FUNCTION {table}_feed()''',
+        ]
+    return statements
+
+
+POSTGRES_MIGRATIONS.append((9, 'change feed', _feed_migration()))
+POSTGRES_MIGRATIONS.append((10, 'per-row change feed read state', FEED_SEEN))
+POSTGRES_MIGRATIONS.append((11, 'goal authors', [
+    GOAL_AUTHOR,
+    _feed_function('goals', replace=True),
+]))
+
+# search_index filters on its source and employee_id columns directly, so
+# the SQLite scope tokens have no counterpart here
+POSTGRES_MIGRATIONS.append((12, 'search scope tokens per source', []))
+
+assert [m[0] for m in POSTGRES_MIGRATIONS] == [m[0] for m in MIGRATIONS], "PostgreSQL migrations out of step"
@@ -1,417 +1,54 @@
+import functools
+import uuid
+from datetime import date, datetime, time, timedelta
+
 import streamlit as st
-import sqlite3
 import pandas as pd
 import plotly.express as px
-from datetime import datetime
-import os
+from cache import query_cache
+from db import get_connection
+from migrations import METRICS, migrate, seed_sample_data
+from analytics import (BUCKETS, get_evaluation_dates, get_org_rollup, get_org_summary, get_score_summary,
+                       get_score_trend, get_team_averages)
+from charts import trend_figure
+from trends import SLOPE_THRESHOLD, TREND_PERIODS, Z_THRESHOLD, get_team_trends
+from log import DEBUG_MODE, get_logger
+from writer import take_failed_writes, write_queue, write_session
+from snapshot import snapshots
+from api import API_PORT, start_api_server
+from metrics import METRICS_PORT, registry as metrics_registry, start_http_server, timed_render
+from blobstore import BlobTooLarge
+from bulk import (EXPORT_FORMATS, EXPORT_TABLES, IMPORT_COLUMNS, import_evaluations, read_spool, read_upload,
+                  spool_export, validate_evaluations)
+from repository import (SOURCE_LABELS, authenticate_user, find_meeting_conflict, get_all_reports, get_calendar,
+                        get_change_history, get_document, get_documents, get_draft_evaluations, get_evaluations_page,
+                        get_feedback_page, get_goals, get_managers, get_meetings_page, get_new_changes,
+                        get_self_evaluations, get_team_employees, get_training_page, get_unread_counts,
+                        mark_changes_seen, read_document, register_user, save_document, save_evaluation,
+                        save_feedback, save_goal, save_self_evaluation, save_training, schedule_meeting, search_page,
+                        update_evaluation_status, update_evaluation_statuses, update_self_evaluation_statuses)
+
+log = get_logger('app')
 
 # --- Database Operations ---
+@st.cache_resource(show_spinner=False)
 def init_db():
-    conn = sqlite3.connect('performance.db')
-    c = conn.cursor()
-    # Users table
-    c.execute('''CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        username TEXT UNIQUE,
-        password TEXT,
-        role TEXT,
-        manager_id INTEGER
-    )''')
-    # Evaluations table
-    c.execute('''CREATE TABLE IF NOT EXISTS evaluations (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        employee_id INTEGER,
-        manager_id INTEGER,
-        quality REAL,
-        punctuality REAL,
-        teamwork REAL,
-        targets REAL,
-        comments TEXT,
-        review_date TEXT,
-        status TEXT
-    )''')
-    # Goals table
-    c.execute('''CREATE TABLE IF NOT EXISTS goals (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        employee_id INTEGER,
-        manager_id INTEGER,
-        description TEXT,
-        set_date TEXT,
-        status TEXT
-    )''')
-    # Feedback table
-    c.execute('''CREATE TABLE IF NOT EXISTS feedback (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        employee_id INTEGER,
-        manager_id INTEGER,
-        message TEXT,
-        date TEXT
-    )''')
-    # Self-evaluations table
-    c.execute('''CREATE TABLE IF NOT EXISTS self_evaluations (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        employee_id INTEGER,
-        comments TEXT,
-        submission_date TEXT,
-        status TEXT
-    )''')
-    # Documents table
-    c.execute('''CREATE TABLE IF NOT EXISTS documents (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        employee_id INTEGER,
-        filename TEXT,
-        upload_date TEXT
-    )''')
-    # Meetings table
-    c.execute('''CREATE TABLE IF NOT EXISTS meetings (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        employee_id INTEGER,
-        manager_id INTEGER,
-        meeting_date TEXT,
-        purpose TEXT
-    )''')
-    # Training recommendations
-    c.execute('''CREATE TABLE IF NOT EXISTS training (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        employee_id INTEGER,
-        manager_id INTEGER,
-        program TEXT,
-        date TEXT
-    )''')
-    # Sample data (optional, can be removed after initial testing)
-    c.execute("INSERT OR IGNORE INTO users (username, password, role, manager_id) VALUES (?, ?, ?, ?)",
-              ('emp1', 'pass123', 'employee', 2))
-    c.execute("INSERT OR IGNORE INTO users (username, password, role, manager_id) VALUES (?, ?, ?, ?)",
-              ('mgr1', 'pass123', 'manager', None))
-    conn.commit()
-    conn.close()
-
-def register_user(username, password, role, manager_id=None):
-    conn = sqlite3.connect('performance.db')
-    c = conn.cursor()
-    try:
-        # For employees, manager_id is required
-        if role == 'employee' and manager_id is None:
-            print("Manager ID is required for employee registration")
-            return False
-
-        c.execute('INSERT INTO users (username, password, role, manager_id) VALUES (?, ?, ?, ?)',
-                  (username, password, role, manager_id))
-        conn.commit()
-        print(f"User registered: {username}, role: {role}, manager_id: {manager_id}")
-        return True
-    except sqlite3.IntegrityError as e:
-        print(f"Registration failed: {str(e)}")
-        return False
-    finally:
-        conn.close()
-
-def authenticate_user(username, password):
-    conn = sqlite3.connect('performance.db')
-    c = conn.cursor()
-    c.execute("SELECT id, role, manager_id FROM users WHERE username = ? AND password = ?", (username, password))
-    user = c.fetchone()
-    conn.close()
-    return user
-
-def evaluate_employee(employee_id, manager_id, quality, punctuality, teamwork, targets, comments):
-    try:
-        print(f"Saving evaluation - Employee ID: {employee_id}, Manager ID: {manager_id}")
-        conn = sqlite3.connect('performance.db')
-        c = conn.cursor()
-        review_date = datetime.now().strftime('%Y-%m-%d')
-        
-        # Convert IDs to integers
-        employee_id = int(employee_id)
-        manager_id = int(manager_id)
-        
-        # Convert scores to floats
-        quality = float(quality)
-        punctuality = float(punctuality)
-        teamwork = float(teamwork)
-        targets = float(targets)
-        
-        c.execute('''
-            INSERT INTO evaluations 
-            (employee_id, manager_id, quality, punctuality, teamwork, targets, comments, review_date, status) 
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (employee_id, manager_id, quality, punctuality, teamwork, targets, comments, review_date, 'Draft'))
-        
-        conn.commit()
-        print(f"Evaluation saved successfully for employee {employee_id}")
-        
-        # Verify the saved evaluation
-        c.execute('SELECT * FROM evaluations WHERE employee_id = ? ORDER BY review_date DESC LIMIT 1', (employee_id,))
-        saved = c.fetchone()
-        print(f"Latest evaluation for employee {employee_id}: {saved}")
-        
-        conn.close()
-        return True
-    except Exception as e:
-        print(f"Error in evaluate_employee: {e}")
-        return False
-
-def save_evaluation(employee_id, manager_id, quality, punctuality, teamwork, targets, comments):
-    try:
-        print(f"Saving evaluation - Employee ID: {employee_id}, Manager ID: {manager_id}")
-        conn = sqlite3.connect('performance.db')
-        c = conn.cursor()
-        
-        # Convert IDs to integers
-        employee_id = int(employee_id)
-        manager_id = int(manager_id)
-        
-        # Convert scores to floats
-        quality = float(quality)
-        punctuality = float(punctuality)
-        teamwork = float(teamwork)
-        targets = float(targets)
-        
-        review_date = datetime.now().strftime('%Y-%m-%d')
-        
-        c.execute('''
-            INSERT INTO evaluations 
-            (employee_id, manager_id, quality, punctuality, teamwork, targets, comments, review_date, status)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (employee_id, manager_id, quality, punctuality, teamwork, targets, comments, review_date, 'Draft'))
-        
-        conn.commit()
-        print(f"Evaluation saved successfully for employee {employee_id}")
-        
-        # Verify the saved evaluation
-        c.execute('SELECT * FROM evaluations WHERE employee_id = ? ORDER BY review_date DESC LIMIT 1', (employee_id,))
-        saved = c.fetchone()
-        print(f"Latest evaluation for employee {employee_id}: {saved}")
-        
-        conn.close()
-        return True
-    except Exception as e:
-        print(f"Error in save_evaluation: {e}")
-        return False
-
-def get_evaluations(employee_id, role, user_id):
-    conn = sqlite3.connect('performance.db')
-    query = "SELECT * FROM evaluations WHERE employee_id = ?" if role == 'employee' else "SELECT * FROM evaluations WHERE manager_id = ?"
-    df = pd.read_sql_query(query, conn, params=(employee_id if role == 'employee' else user_id,))
-    conn.close()
-    return df
-
-def save_goal(employee_id, manager_id, description):
-    conn = sqlite3.connect('performance.db')
-    c = conn.cursor()
-    c.execute('''INSERT INTO goals (employee_id, manager_id, description, set_date, status)
-                 VALUES (?, ?, ?, ?, ?)''',
-              (employee_id, manager_id, description, datetime.now().strftime('%Y-%m-%d'), 'Active'))
-    conn.commit()
-    conn.close()
-
-def get_goals(employee_id, role, manager_id):
-    conn = sqlite3.connect('performance.db')
-    # For employees, show goals assigned by their manager
-    # For managers, show goals they've assigned
-    query = "SELECT * FROM goals WHERE employee_id = ? AND manager_id = ?" if role == 'employee' else "SELECT * FROM goals WHERE manager_id = ?"
-    params = (employee_id, manager_id) if role == 'employee' else (manager_id,)
-    df = pd.read_sql_query(query, conn, params=params)
-    conn.close()
-    return df
-
-def save_feedback(employee_id, manager_id, message):
-    try:
-        print(f"Saving feedback - employee_id: {employee_id}, manager_id: {manager_id}, message: {message}")
-        conn = sqlite3.connect('performance.db')
-        c = conn.cursor()
-        c.execute('''INSERT INTO feedback (employee_id, manager_id, message, date)
-                     VALUES (?, ?, ?, ?)''',
-                  (employee_id, manager_id, message, datetime.now().strftime('%Y-%m-%d')))
-        conn.commit()
-        print("Feedback committed to database")
-        # Verify the save
-        c.execute('SELECT * FROM feedback WHERE employee_id=? AND manager_id=? ORDER BY id DESC LIMIT 1', 
-                  (employee_id, manager_id))
-        result = c.fetchone()
-        print(f"Verification - Last feedback entry: {result}")
-        conn.close()
-        return True
-    except Exception as e:
-        print(f"Error saving feedback: {str(e)}")
-        return False
+    # Runs once per server process rather than on every rerun; deployments
+    # can also run `python manage.py init` ahead of time.
+    conn = get_connection()
+    migrate(conn)
+    seed_sample_data(conn)
+    return True
 
-def get_feedback(employee_id, role, manager_id):
-    conn = sqlite3.connect('performance.db')
-    # For employees, show feedback given by their manager
-    # For managers, show feedback they've given to selected employee
-    if role == 'employee':
-        query = "SELECT * FROM feedback WHERE employee_id = ? AND manager_id = ?"
-        params = (employee_id, manager_id)
-    else:
-        # If employee_id is provided, show feedback for that employee
-        if employee_id:
-            query = "SELECT * FROM feedback WHERE employee_id = ? AND manager_id = ?"
-            params = (employee_id, manager_id)
-        else:
-            # Show all feedback given by the manager
-            query = "SELECT * FROM feedback WHERE manager_id = ?"
-            params = (manager_id,)
-    df = pd.read_sql_query(query, conn, params=params)
-    conn.close()
-    return df
-
-def save_self_evaluation(employee_id, comments):
-    conn = sqlite3.connect('performance.db')
-    c = conn.cursor()
-    c.execute('''INSERT INTO self_evaluations (employee_id, comments, submission_date, status)
-                 VALUES (?, ?, ?, ?)''',
-              (employee_id, comments, datetime.now().strftime('%Y-%m-%d'), 'Pending'))
-    conn.commit()
-    conn.close()
-
-def get_self_evaluations(employee_id, role, user_id):
-    conn = sqlite3.connect('performance.db')
-    query = "SELECT * FROM self_evaluations WHERE employee_id = ?" if role == 'employee' else "SELECT * FROM self_evaluations WHERE employee_id IN (SELECT id FROM users WHERE manager_id = ?)"
-    df = pd.read_sql_query(query, conn, params=(employee_id if role == 'employee' else user_id,))
-    conn.close()
-    return df
-
-def save_document(employee_id, filename):
-    conn = sqlite3.connect('performance.db')
-    c = conn.cursor()
-    c.execute('''INSERT INTO documents (employee_id, filename, upload_date)
-                 VALUES (?, ?, ?)''',
-              (employee_id, filename, datetime.now().strftime('%Y-%m-%d')))
-    conn.commit()
-    conn.close()
-
-def get_documents(employee_id):
-    conn = sqlite3.connect('performance.db')
-    df = pd.read_sql_query("SELECT * FROM documents WHERE employee_id = ?", conn, params=(employee_id,))
-    conn.close()
-    return df
-
-def get_team_employees(manager_id):
-    print(f"Getting team employees for manager_id: {manager_id}")
-    conn = sqlite3.connect('performance.db')
-    try:
-        # Get all employees assigned to this manager
-        query = '''
-        SELECT id, username, role 
-        FROM users 
-        WHERE manager_id = ? AND role = "employee"
-        ORDER BY username
-        '''
-        df = pd.read_sql_query(query, conn, params=(manager_id,))
-        print(f"Found {len(df)} team members: {df['username'].tolist() if not df.empty else []}")
-        return df
-    finally:
-        conn.close()
-
-def schedule_meeting(employee_id, manager_id, meeting_date, purpose):
-    try:
-        print(f"Scheduling meeting - employee_id: {employee_id}, manager_id: {manager_id}, date: {meeting_date}, purpose: {purpose}")
-        conn = sqlite3.connect('performance.db')
-        c = conn.cursor()
-        c.execute('''INSERT INTO meetings (employee_id, manager_id, meeting_date, purpose)
-                     VALUES (?, ?, ?, ?)''',
-                  (employee_id, manager_id, meeting_date, purpose))
-        conn.commit()
-        print("Meeting committed to database")
-        # Verify the save
-        c.execute('SELECT * FROM meetings WHERE employee_id=? AND manager_id=? ORDER BY id DESC LIMIT 1', 
-                  (employee_id, manager_id))
-        result = c.fetchone()
-        print(f"Verification - Last meeting entry: {result}")
-        conn.close()
-        return True
-    except Exception as e:
-        print(f"Error scheduling meeting: {str(e)}")
-        return False
-
-def get_meetings(employee_id, role, manager_id):
-    conn = sqlite3.connect('performance.db')
-    # For employees, show meetings where they are the employee
-    # For managers, show meetings they've scheduled with selected employee
-    if role == 'employee':
-        query = "SELECT * FROM meetings WHERE employee_id = ? AND manager_id = ?"
-        params = (employee_id, manager_id)
-    else:
-        # If employee_id is provided, show meetings for that employee
-        if employee_id:
-            query = "SELECT * FROM meetings WHERE employee_id = ? AND manager_id = ?"
-            params = (employee_id, manager_id)
-        else:
-            # Show all meetings scheduled by the manager
-            query = "SELECT * FROM meetings WHERE manager_id = ?"
-            params = (manager_id,)
-    df = pd.read_sql_query(query, conn, params=params)
-    conn.close()
-    return df
-
-def save_training(employee_id, manager_id, program):
-    try:
-        print(f"Saving training - employee_id: {employee_id}, manager_id: {manager_id}, program: {program}")
-        conn = sqlite3.connect('performance.db')
-        c = conn.cursor()
-        c.execute('''INSERT INTO training (employee_id, manager_id, program, date)
-                     VALUES (?, ?, ?, ?)''',
-                  (employee_id, manager_id, program, datetime.now().strftime('%Y-%m-%d')))
-        conn.commit()
-        print("Training committed to database")
-        # Verify the save
-        c.execute('SELECT * FROM training WHERE employee_id=? AND manager_id=? ORDER BY id DESC LIMIT 1', 
-                  (employee_id, manager_id))
-        result = c.fetchone()
-        print(f"Verification - Last training entry: {result}")
-        conn.close()
-        return True
-    except Exception as e:
-        print(f"Error saving training: {str(e)}")
-        return False
+@st.cache_resource(show_spinner=False)
+def start_metrics_server():
+    # One Prometheus endpoint per server process, only when a port is set
+    return start_http_server(METRICS_PORT, cache=query_cache) if METRICS_PORT else None
 
-def get_training(employee_id, role, manager_id):
-    conn = sqlite3.connect('performance.db')
-    # For employees, show training assigned to them by their manager
-    # For managers, show training they've assigned to selected employee
-    if role == 'employee':
-        query = "SELECT * FROM training WHERE employee_id = ? AND manager_id = ?"
-        params = (employee_id, manager_id)
-    else:
-        # If employee_id is provided, show training for that employee
-        if employee_id:
-            query = "SELECT * FROM training WHERE employee_id = ? AND manager_id = ?"
-            params = (employee_id, manager_id)
-        else:
-            # Show all training assigned by the manager
-            query = "SELECT * FROM training WHERE manager_id = ?"
-            params = (manager_id,)
-    df = pd.read_sql_query(query, conn, params=params)
-    conn.close()
-    return df
-
-def get_team_employees(manager_id):
-    conn = sqlite3.connect('performance.db')
-    # manager_id here is the actual ID of the manager, not their username
-    df = pd.read_sql_query("SELECT id, username FROM users WHERE manager_id = ? AND role = 'employee'", conn, params=(manager_id,))
-    conn.close()
-    return df
-
-def get_managers():
-    conn = sqlite3.connect('performance.db')
-    df = pd.read_sql_query("SELECT id, username FROM users WHERE role = 'manager'", conn)
-    conn.close()
-    return df
-
-def update_evaluation_status(evaluation_id, status):
-    conn = sqlite3.connect('performance.db')
-    c = conn.cursor()
-    c.execute("UPDATE evaluations SET status = ? WHERE id = ?", (status, evaluation_id))
-    conn.commit()
-    conn.close()
-
-def update_self_evaluation_status(evaluation_id, status):
-    conn = sqlite3.connect('performance.db')
-    c = conn.cursor()
-    c.execute("UPDATE self_evaluations SET status = ? WHERE id = ?", (status, evaluation_id))
-    conn.commit()
-    conn.close()
+@st.cache_resource(show_spinner=False)
+def start_api():
+    # The JSON API for integrations, only when PERF_API_PORT is set
+    return start_api_server(API_PORT) if API_PORT else None
 
 # --- Custom CSS ---
 css = """
@@ -437,14 +74,14 @@ h1, h2, h3 {
     border-radius: 5px;
     padding: 10px;
 }
-.stTabs [role="tab"] {
+.stRadio [role="radiogroup"] label {
     background-color: #ffffff;
     border-radius: 5px 5px 0 0;
     padding: 10px 20px;
     margin-right: 5px;
     color: #1f2a44;
 }
-.stTabs [role="tab"][aria-selected="true"] {
+.stRadio [role="radiogroup"] label:has(input:checked) {
     background-color: #007bff;
     color: white;
 }
@@ -463,6 +100,8 @@ h1, h2, h3 {
 # --- Streamlit Application ---
 # Initialize database
 init_db()
+start_metrics_server()
+start_api()
 
 # Set page configuration
 st.set_page_config(page_title="Employee Performance Evaluation System", layout="wide")
@@ -475,6 +114,229 @@ if 'user_id' not in st.session_state:
     st.session_state.user_id = None
     st.session_state.role = None
     st.session_state.manager_id = None
+if 'write_session' not in st.session_state:
+    st.session_state.write_session = uuid.uuid4().hex
+
+# Writes made while a tab renders are tagged with this browser session, so
+# its reads wait for them in the writer queue. Saves are acknowledged as
+# soon as they are queued; a write that later fails is reported here on
+# the next render.
+def session_writes(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with write_session(st.session_state.write_session):
+            for error in take_failed_writes():
+                st.error(f"A change could not be saved: {error}")
+            return func(*args, **kwargs)
+    return wrapper
+
+# Diagnostic output, shown only when PERF_APP_DEBUG is set
+def debug_write(message):
+    if DEBUG_MODE:
+        st.caption(f"Debug - {message}")
+
+# Employee picker for the manager tabs; returns (username, id)
+def select_team_member(label, team, key=None):
+    member = st.selectbox(label, team, format_func=lambda m: m.username, key=key)
+    return member.username, member.id
+
+# Paged history lists: session state remembers how many pages each list has
+# expanded to, and every page is re-read through the query cache so writes
+# still show up on the next rerun.
+def load_pages(state_key, fetch_page):
+    frames, cursor = [], None
+    for _ in range(st.session_state.get(state_key, 1)):
+        df, cursor = fetch_page(cursor)
+        frames.append(df)
+        if cursor is None:
+            break
+    return pd.concat(frames, ignore_index=True), cursor
+
+def _expand_pages(state_key):
+    st.session_state[state_key] = st.session_state.get(state_key, 1) + 1
+
+# The page count moves in the click callback, so the tab fragment's own
+# rerun already reads the extra page without a second rerun.
+def load_more_button(state_key, cursor):
+    if cursor is not None:
+        st.button("Load more", key=f"{state_key}_more", on_click=_expand_pages, args=(state_key,))
+
+def show_paged_dataframe(state_key, fetch_page, columns):
+    df, cursor = load_pages(state_key, fetch_page)
+    if df.empty:
+        return False
+    st.dataframe(df[columns])
+    load_more_button(state_key, cursor)
+    return True
+
+# Multi-row selection with bulk actions. ``actions`` maps a button label to
+# (past tense, function) where the function takes the selected ids, makes
+# one batch write and returns the ids it changed. The page then reloads,
+# with a new table key so no stale selection survives the update, and
+# bulk_summary reports what changed.
+def bulk_summary(key):
+    summary = st.session_state.pop(f"{key}_summary", None)
+    if summary:
+        st.success(summary)
+
+def bulk_select(key, ids, table, actions, noun):
+    version = st.session_state.get(f"{key}_version", 0)
+    event = st.dataframe(table, hide_index=True, on_select='rerun', selection_mode='multi-row',
+                         key=f"{key}_table_{version}")
+    if st.checkbox(f"Select all {len(ids)}", key=f"{key}_all_{version}"):
+        selected = list(ids)
+    else:
+        selected = [ids[i] for i in event.selection.rows]
+    for col, (label, (done, action)) in zip(st.columns(len(actions)), actions.items()):
+        if col.button(f"{label} selected ({len(selected)})", disabled=not selected, key=f"{key}_{label}"):
+            updated = action(selected)
+            summary = f"{done} {len(updated)} {noun}."
+            if len(updated) < len(selected):
+                summary += f" {len(selected) - len(updated)} had already changed and were left as they were."
+            st.session_state[f"{key}_summary"] = summary
+            st.session_state[f"{key}_version"] = version + 1
+            st.rerun()
+
+# Score trend with bucket and date-range pickers. Only the chosen window is
+# read, aggregated in SQL and downsampled before it reaches the browser.
+def trend_chart(manager_id, employee_id, title, key):
+    first, last = get_evaluation_dates(manager_id, employee_id)
+    first, last = pd.Timestamp(first).date(), pd.Timestamp(last).date()
+    col1, col2 = st.columns(2)
+    bucket = col1.selectbox("Group by", BUCKETS, index=BUCKETS.index('month'),
+                            format_func=str.title, key=f"{key}_bucket")
+    window = col2.date_input("Date range", value=(first, last), min_value=first, max_value=last,
+                             key=f"{key}_range_{employee_id}")
+    # While the user is picking, the range has only its start
+    start, end = (window[0], window[-1]) if len(window) else (first, last)
+    trend = get_score_trend(manager_id, employee_id, bucket, start.isoformat(), end.isoformat())
+    st.plotly_chart(trend_figure(trend, 'bucket', list(METRICS), title, bucket.title(), "Average Score"))
+    return trend, bucket
+
+# How old the analytics snapshot is; with a key, also a button that takes
+# a fresh one. Nothing is shown when analytics read live data.
+def snapshot_status(key=None):
+    if not snapshots.enabled:
+        return
+    col1, col2 = st.columns([4, 1])
+    if key and col2.button("Refresh now", key=key):
+        with st.spinner("Taking a fresh snapshot..."):
+            snapshots.refresh()
+    age = snapshots.age()
+    if age is None:
+        col1.caption("Charts are reading live data while the first analytics snapshot is taken.")
+        return
+    taken = pd.Timestamp(snapshots.taken_at, unit='s').strftime('%H:%M:%S')
+    ago = f"{age:.0f} s" if age < 120 else f"{age / 60:.0f} min"
+    col1.caption(f"Charts show data as of {taken} UTC ({ago} ago); "
+                 f"refreshed every {snapshots.interval / 60:g} min.")
+
+# Week or month of someone's meetings. Only the visible window is read,
+# so the view costs the same however many years of meetings exist.
+CALENDAR_VIEWS = ("Week", "Month")
+MEETING_MINUTES = (15, 30, 45, 60, 90)
+
+
+def calendar_window(view, anchor):
+    if view == "Week":
+        start = anchor - timedelta(days=anchor.weekday())
+        return start, start + timedelta(days=7)
+    start = anchor.replace(day=1)
+    return start, (start + timedelta(days=32)).replace(day=1)
+
+
+def meeting_calendar(user_id, key):
+    col1, col2 = st.columns(2)
+    view = col1.radio("View", CALENDAR_VIEWS, horizontal=True, key=f"{key}_view")
+    anchor = col2.date_input("Showing", value=date.today(), key=f"{key}_anchor")
+    start, end = calendar_window(view, anchor)
+    meetings = get_calendar(user_id, start, end)
+    st.caption(f"{len(meetings)} meeting(s) from {start:%d %b} to {end - timedelta(days=1):%d %b %Y}")
+    if meetings.empty:
+        return
+    # Meetings from before times were recorded only have a date
+    timed = meetings['starts_at'].str.len() > 10
+    st.dataframe(pd.DataFrame({
+        'Date': pd.to_datetime(meetings['starts_at'].str[:10]).dt.strftime('%a %d %b'),
+        'Time': (meetings['starts_at'].str[11:] + '–' + meetings['ends_at'].str[11:]).where(timed, ''),
+        'With': meetings['with_name'],
+        'Purpose': meetings['purpose'],
+    }), hide_index=True)
+
+# Lazy tab router: only the selected tab's function runs on a rerun, and
+# each tab is an st.fragment so its own widgets rerun just that tab.
+# ``badges`` puts an unread count after a tab's name.
+def render_tab_router(key, tabs, badges=None):
+    badges = badges or {}
+    # A stale or hand-set value (say a badge label) falls back to the first tab
+    if st.session_state.get(key) not in tabs:
+        st.session_state[key] = next(iter(tabs))
+    active = st.radio("Section", list(tabs), horizontal=True, key=key, label_visibility="collapsed",
+                      format_func=lambda name: f"{name} ({badges[name]})" if badges.get(name) else name)
+    tabs[active]()
+
+def _reset_search_pages():
+    st.session_state.search_pages = 1
+
+# Full-text search over comments, feedback, goals and self-evaluations the
+# current user can see, best match first
+@st.fragment
+@session_writes
+def search_panel():
+    with st.expander("🔎 Search"):
+        text = st.text_input("Search comments, feedback and goals", key="search_text", on_change=_reset_search_pages)
+        if not text.strip():
+            return
+        hits, cursor = load_pages('search_pages', lambda cursor: search_page(
+            text, st.session_state.role, st.session_state.user_id, cursor))
+        if hits.empty:
+            st.info("No matches.")
+            return
+        for hit in hits.itertuples():
+            who = f" · {hit.employee}" if st.session_state.role == 'manager' and hit.employee else ""
+            st.markdown(f"**{SOURCE_LABELS[hit.source]}** · {hit.date}{who}  \n{hit.snippet}")
+        load_more_button('search_pages', cursor)
+
+# What's new: change feed rows the user has not marked as seen yet (each
+# row carries its own seen flag). Only unread items are read on each
+# rerun; what was already seen is paged in only when asked for.
+FEED_LABELS = {
+    'evaluations': "Evaluation", 'goals': "Goal", 'feedback': "Feedback",
+    'meetings': "Meeting", 'training': "Training", 'self_evaluations': "Self-evaluation",
+}
+
+def show_changes(changes):
+    for change in changes.itertuples():
+        st.markdown(f"**{FEED_LABELS[change.source]}** · {change.changed_at} UTC  \n{change.summary}")
+
+def unread_badges(tab_sources):
+    # Unread counts keyed by tab name, for render_tab_router
+    unread = get_unread_counts(st.session_state.user_id)
+    return {tab: unread[source] for source, tab in tab_sources.items() if source in unread}
+
+@st.fragment
+@session_writes
+def whats_new_panel():
+    user_id = st.session_state.user_id
+    unread = sum(get_unread_counts(user_id).values())
+    with st.expander(f"🔔 What's new ({unread})" if unread else "🔔 What's new"):
+        changes, cursor = load_pages('feed_pages', lambda cursor: get_new_changes(user_id, cursor))
+        if changes.empty:
+            st.caption("Nothing new since you last marked your updates as read.")
+        else:
+            show_changes(changes)
+            load_more_button('feed_pages', cursor)
+            if st.button("Mark all as read", key='feed_mark_read'):
+                mark_changes_seen(user_id, changes['id'].max())
+                st.session_state.feed_pages = 1
+                # Full rerun so the tab badges drop as well
+                st.rerun()
+        if st.toggle("Show earlier updates", key='feed_history'):
+            history, cursor = load_pages('feed_history_pages', lambda cursor: get_change_history(user_id, cursor))
+            if history.empty:
+                st.caption("No earlier updates.")
+            show_changes(history)
+            load_more_button('feed_history_pages', cursor)
 
 # Login and Registration page
 def auth_page():
@@ -495,7 +357,7 @@ def auth_page():
                 user = authenticate_user(username, password)
                 if user:
                     st.session_state.user_id, st.session_state.role, st.session_state.manager_id = user
-                    st.write(f"Debug - Login successful: user_id={st.session_state.user_id}, role={st.session_state.role}, manager_id={st.session_state.manager_id}")
+                    debug_write(f"Login successful: user_id={st.session_state.user_id}, role={st.session_state.role}, manager_id={st.session_state.manager_id}")
                     st.success("Logged in successfully!")
                     st.rerun()
                 else:
@@ -514,21 +376,32 @@ def auth_page():
             manager_username = None
             if role == "employee":
                 # Get list of managers
-                conn = sqlite3.connect('performance.db')
-                managers = pd.read_sql_query('SELECT id, username FROM users WHERE role = "manager"', conn)
-                conn.close()
+                managers = get_managers()
                 
-                if not managers.empty:
+                if managers:
                     st.write("Available Managers:")
-                    manager_username = st.selectbox(
+                    manager = st.selectbox(
                         "Select Manager",
-                        managers['username'],
+                        managers,
+                        format_func=lambda m: m.username,
                         key="register_manager"
                     )
-                    manager_id = int(managers[managers['username'] == manager_username]['id'].iloc[0])
-                    st.write(f"Debug - Selected manager: {manager_username} (ID: {manager_id})")
+                    manager_id, manager_username = manager
+                    debug_write(f"Selected manager: {manager_username} (ID: {manager_id})")
                 else:
                     st.warning("No managers available. Please register a manager first.")
+            else:
+                # Managers may report to another manager, building a deeper org
+                managers = get_managers()
+                if managers:
+                    manager = st.selectbox(
+                        "Reports to (optional)",
+                        [None] + managers,
+                        format_func=lambda m: "Nobody" if m is None else m.username,
+                        key="register_parent_manager"
+                    )
+                    if manager is not None:
+                        manager_id, manager_username = manager
             
             submitted = st.form_submit_button("Register")
             if submitted:
@@ -536,9 +409,9 @@ def auth_page():
                     if role == "employee" and manager_id is None:
                         st.error("Please select a manager for the employee.")
                     else:
-                        st.write(f"Debug - Registering {role} with manager_id: {manager_id}")
+                        debug_write(f"Registering {role} with manager_id: {manager_id}")
                         if register_user(new_username, new_password, role, manager_id):
-                            if role == "employee":
+                            if manager_username:
                                 st.success(f"Registration successful! {new_username} has been registered as {role} and assigned to {manager_username}")
                             else:
                                 st.success(f"Registration successful! {new_username} has been registered as {role}")
@@ -547,374 +420,622 @@ def auth_page():
                 else:
                     st.error("Username already exists. Please choose a different username.")
 
+# Employee tab 1: View Evaluations
+@st.fragment
+@timed_render
+@session_writes
+def employee_evaluations_tab():
+    st.subheader("📊 My Performance Evaluations")
+    if show_paged_dataframe(
+            'emp_evaluations_pages',
+            lambda cursor: get_evaluations_page(st.session_state.user_id, st.session_state.role, st.session_state.user_id, cursor),
+            ['review_date', 'quality', 'punctuality', 'teamwork', 'targets', 'comments', 'status']):
+        # Graphical report, across every manager the employee has had
+        snapshot_status()
+        trend_chart(None, st.session_state.user_id, "Performance Trends", 'emp_trend')
+    else:
+        st.info("No evaluations available.")
+
+# Employee tab 2: View Goals
+@st.fragment
+@timed_render
+@session_writes
+def employee_goals_tab():
+    st.subheader("🎯 My Goals")
+    with st.form("goal_form"):
+        goal_description = st.text_area("Set a New Goal")
+        if st.form_submit_button("Submit Goal"):
+            save_goal(st.session_state.user_id, st.session_state.manager_id, goal_description,
+                      author_id=st.session_state.user_id)
+            st.success("Goal saved!")
+    goals = get_goals(st.session_state.user_id, st.session_state.role, st.session_state.manager_id)
+    if not goals.empty:
+        st.dataframe(goals[['description', 'set_date', 'status']])
+    else:
+        st.info("No goals set.")
+
+# Employee tab 3: View Feedback
+@st.fragment
+@timed_render
+@session_writes
+def employee_feedback_tab():
+    st.subheader("💬 Feedback")
+    debug_write(f"Getting feedback for employee {st.session_state.user_id} from manager {st.session_state.manager_id}")
+    if not show_paged_dataframe(
+            'emp_feedback_pages',
+            lambda cursor: get_feedback_page(st.session_state.user_id, st.session_state.role, st.session_state.manager_id, cursor),
+            ['date', 'message']):
+        st.info("No feedback received yet.")
+
+# Employee tab 4: Self Evaluations
+@st.fragment
+@timed_render
+@session_writes
+def employee_self_evaluations_tab():
+    st.subheader("✍️ Self Evaluations")
+    with st.form("self_evaluation_form"):
+        comments = st.text_area("Your Self-Evaluation Comments")
+        if st.form_submit_button("Submit Self-Evaluation"):
+            save_self_evaluation(st.session_state.user_id, comments)
+            st.success("Self-evaluation submitted!")
+    self_evals = get_self_evaluations(st.session_state.user_id, st.session_state.role, st.session_state.user_id)
+    if not self_evals.empty:
+        st.dataframe(self_evals[['submission_date', 'comments', 'status']])
+    else:
+        st.info("No self-evaluations submitted.")
+
+# Employee tab 5: Upload Documents
+@st.fragment
+@timed_render
+@session_writes
+def employee_documents_tab():
+    st.subheader("📂 Upload Achievements")
+    uploaded_file = st.file_uploader("Upload a document", type=['pdf', 'docx', 'txt'])
+    # The uploader keeps returning the same file on every rerun; only store
+    # it the first time this particular upload is seen.
+    if uploaded_file and st.session_state.get('document_upload_id') != uploaded_file.file_id:
+        st.session_state.document_upload_id = uploaded_file.file_id
+        try:
+            if save_document(st.session_state.user_id, uploaded_file):
+                st.success(f"Uploaded {uploaded_file.name}")
+            else:
+                st.info(f"{uploaded_file.name} has already been uploaded.")
+        except BlobTooLarge as e:
+            st.error(str(e))
+    documents = get_documents(st.session_state.user_id)
+    if not documents.empty:
+        st.dataframe(documents[['filename', 'upload_date', 'size']])
+        stored = documents[documents['sha256'].notna()]
+        if not stored.empty:
+            document_id = st.selectbox("Download a document", stored['id'].tolist(),
+                                       format_func=dict(zip(stored['id'], stored['filename'])).get)
+            document = get_document(st.session_state.user_id, document_id)
+            # Read only when the button is clicked, so rendering the tab
+            # never reads file content
+            st.download_button("Download", data=lambda: read_document(document),
+                               file_name=document.filename, mime=document.mime or 'application/octet-stream')
+    else:
+        st.info("No documents uploaded.")
+
+# Employee tab 6: Meetings
+@st.fragment
+@timed_render
+@session_writes
+def employee_meetings_tab():
+    st.subheader("📅 Meetings")
+    meeting_calendar(st.session_state.user_id, 'emp_calendar')
+    st.write("All meetings:")
+    debug_write(f"Getting meetings for employee {st.session_state.user_id} from manager {st.session_state.manager_id}")
+    if not show_paged_dataframe(
+            'emp_meetings_pages',
+            lambda cursor: get_meetings_page(st.session_state.user_id, st.session_state.role, st.session_state.manager_id, cursor),
+            ['scheduled', 'ends_at', 'purpose']):
+        st.info("No meetings scheduled yet.")
+
+# Employee tab 7: View Training
+@st.fragment
+@timed_render
+@session_writes
+def employee_training_tab():
+    st.subheader("🎓 Recommended Training")
+    if not show_paged_dataframe(
+            'emp_training_pages',
+            lambda cursor: get_training_page(st.session_state.user_id, st.session_state.role, st.session_state.manager_id, cursor),
+            ['program', 'date']):
+        st.info("No training recommended.")
+
+EMPLOYEE_TABS = {
+    "Evaluations": employee_evaluations_tab,
+    "Goals": employee_goals_tab,
+    "Feedback": employee_feedback_tab,
+    "Self Evaluations": employee_self_evaluations_tab,
+    "Documents": employee_documents_tab,
+    "Meetings": employee_meetings_tab,
+    "Training": employee_training_tab,
+}
+# Which tab lists the rows of each change feed source
+EMPLOYEE_FEED_TABS = {
+    'evaluations': "Evaluations", 'goals': "Goals", 'feedback': "Feedback",
+    'self_evaluations': "Self Evaluations", 'meetings': "Meetings", 'training': "Training",
+}
+
 # Employee Dashboard
 def employee_dashboard():
     st.title("👤 Employee Dashboard")
-    st.write(f"Debug - Employee ID: {st.session_state.user_id}, Manager ID: {st.session_state.manager_id}")
-    tabs = st.tabs(["Evaluations", "Goals", "Feedback", "Self Evaluations", "Documents", "Meetings", "Training"])
+    debug_write(f"Employee ID: {st.session_state.user_id}, Manager ID: {st.session_state.manager_id}")
+    search_panel()
+    whats_new_panel()
+    render_tab_router('employee_tab', EMPLOYEE_TABS, unread_badges(EMPLOYEE_FEED_TABS))
 
-    # Tab 1: View Evaluations
-    with tabs[0]:
-        st.subheader("📊 My Performance Evaluations")
-        evaluations = get_evaluations(st.session_state.user_id, st.session_state.role, st.session_state.user_id)
+# Manager tab 1: Evaluate Employees
+@st.fragment
+@timed_render
+@session_writes
+def manager_evaluate_tab():
+    st.subheader("📈 Evaluate Team Members")
+    team = get_team_employees(st.session_state.user_id)
+    if team:
+        employee, employee_id = select_team_member("Select Employee", team)
+        with st.form(f"eval_form_{employee_id}"):
+            quality = st.slider("Work Quality", 0.0, 5.0, 2.5)
+            punctuality = st.slider("Punctuality", 0.0, 5.0, 2.5)
+            teamwork = st.slider("Teamwork", 0.0, 5.0, 2.5)
+            targets = st.slider("Meeting Targets", 0.0, 5.0, 2.5)
+            comments = st.text_area("Comments")
+            if st.form_submit_button("Submit Evaluation"):
+                save_evaluation(employee_id, st.session_state.user_id, quality, punctuality, teamwork, targets, comments)
+                st.success("Evaluation saved as draft!")
+        evaluations, cursor = load_pages(
+            'mgr_evaluations_pages',
+            lambda cursor: get_evaluations_page(employee_id, st.session_state.role, st.session_state.user_id, cursor))
         if not evaluations.empty:
-            st.dataframe(evaluations[['review_date', 'quality', 'punctuality', 'teamwork', 'targets', 'comments', 'status']])
-            # Graphical report
-            df_melt = evaluations.melt(id_vars=['review_date'], value_vars=['quality', 'punctuality', 'teamwork', 'targets'],
-                                       var_name='Metric', value_name='Score')
-            fig = px.line(df_melt, x='review_date', y='Score', color='Metric', title="Performance Trends")
-            st.plotly_chart(fig)
-        else:
-            st.info("No evaluations available.")
-
-    # Tab 2: View Goals
-    with tabs[1]:
-        st.subheader("🎯 My Goals")
-        with st.form("goal_form"):
-            goal_description = st.text_area("Set a New Goal")
-            if st.form_submit_button("Submit Goal"):
-                save_goal(st.session_state.user_id, goal_description)
-                st.success("Goal saved!")
-        goals = get_goals(st.session_state.user_id, st.session_state.role, st.session_state.manager_id)
-        if not goals.empty:
-            st.dataframe(goals[['description', 'set_date', 'status']])
-        else:
-            st.info("No goals set.")
-
-    # Tab 3: View Feedback
-    with tabs[2]:
-        st.subheader("💬 Feedback")
-        st.write(f"Debug - Getting feedback for employee {st.session_state.user_id} from manager {st.session_state.manager_id}")
-        feedback = get_feedback(st.session_state.user_id, st.session_state.role, st.session_state.manager_id)
-        st.write(f"Debug - Found {len(feedback)} feedback entries")
-        if not feedback.empty:
-            st.dataframe(feedback[['date', 'message']])
-        else:
-            st.info("No feedback received yet.")
-
-    # Tab 4: Self Evaluations
-    with tabs[3]:
-        st.subheader("✍️ Self Evaluations")
-        with st.form("self_evaluation_form"):
-            comments = st.text_area("Your Self-Evaluation Comments")
-            if st.form_submit_button("Submit Self-Evaluation"):
-                save_self_evaluation(st.session_state.user_id, comments)
-                st.success("Self-evaluation submitted!")
-        self_evals = get_self_evaluations(st.session_state.user_id, st.session_state.role, st.session_state.user_id)
-        if not self_evals.empty:
-            st.dataframe(self_evals[['submission_date', 'comments', 'status']])
-        else:
-            st.info("No self-evaluations submitted.")
-
-    # Tab 5: Upload Documents
-    with tabs[4]:
-        st.subheader("📂 Upload Achievements")
-        uploaded_file = st.file_uploader("Upload a document", type=['pdf', 'docx', 'txt'])
-        if uploaded_file:
-            filename = uploaded_file.name
-            save_document(st.session_state.user_id, filename)
-            st.success(f"Uploaded {filename}")
-        documents = get_documents(st.session_state.user_id)
-        if not documents.empty:
-            st.dataframe(documents[['filename', 'upload_date']])
-        else:
-            st.info("No documents uploaded.")
-
-    # Tab 6: Meetings
-    with tabs[5]:
-        st.subheader("📅 Meetings")
-        st.write(f"Debug - Getting meetings for employee {st.session_state.user_id} from manager {st.session_state.manager_id}")
-        meetings = get_meetings(st.session_state.user_id, st.session_state.role, st.session_state.manager_id)
-        st.write(f"Debug - Found {len(meetings)} meeting entries")
-        if not meetings.empty:
-            st.dataframe(meetings[['meeting_date', 'purpose']])
-        else:
+            st.subheader("Past Evaluations")
+            for row in evaluations.itertuples(index=False):
+                row = row._asdict()
+                st.markdown(f"**{row['review_date']}** (Status: {row['status']})  \n"
+                            f"Quality: {row['quality']}, Punctuality: {row['punctuality']}, Teamwork: {row['teamwork']}, Targets: {row['targets']}  \n"
+                            f"Comments: {row['comments']}")
+                if row['status'] == 'Draft':
+                    if st.button(f"Finalize Evaluation {row['id']}", key=f"finalize_{row['id']}"):
+                        update_evaluation_status(row['id'], 'Final')
+                        st.success("Evaluation finalized!")
+            load_more_button('mgr_evaluations_pages', cursor)
+
+        # Closing a review cycle: finalize any number of drafts at once
+        bulk_summary('finalize_drafts')
+        drafts = get_draft_evaluations(st.session_state.user_id)
+        if not drafts.empty:
+            with st.expander(f"✅ Finalize drafts ({len(drafts)})"):
+                names = {member.id: member.username for member in team}
+                table = pd.DataFrame({
+                    'Employee': drafts['employee_id'].map(names).fillna(drafts['employee_id'].astype(str)),
+                    'Date': drafts['review_date'], **{metric.title(): drafts[metric] for metric in METRICS},
+                    'Comments': drafts['comments'],
+                })
+                manager_id = st.session_state.user_id
+                bulk_select('finalize_drafts', drafts['id'].tolist(), table, {
+                    "Finalize": ("Finalized", lambda ids: update_evaluation_statuses(ids, 'Final', manager_id).result()),
+                }, "evaluation(s)")
+
+        # Bulk import / export for review cycles
+        with st.expander("📥 Bulk Import / Export"):
+            st.write(f"Upload a CSV or Excel file with columns: {', '.join(IMPORT_COLUMNS)}. "
+                     "Employees may be given by username or ID; review_date defaults to today.")
+            bulk_summary('bulk_eval_import')
+            # A new key after each import clears the uploader, so the same
+            # file cannot be imported twice by clicking again
+            upload_version = st.session_state.get('bulk_eval_upload_version', 0)
+            upload = st.file_uploader("Evaluations file", type=['csv', 'xlsx'],
+                                      key=f'bulk_eval_upload_{upload_version}')
+            if upload:
+                try:
+                    rows, errors = validate_evaluations(read_upload(upload), team)
+                except (ValueError, ImportError) as e:
+                    rows, errors = [], [f"Could not read {upload.name}: {e}"]
+                for error in errors:
+                    st.error(error)
+                if rows and st.button(f"Import {len(rows)} evaluations as drafts", key='bulk_eval_import'):
+                    imported = import_evaluations(st.session_state.user_id, rows)
+                    st.session_state.bulk_eval_import_summary = f"Imported {imported} evaluations as drafts."
+                    st.session_state.bulk_eval_upload_version = upload_version + 1
+                    st.rerun()
+
+            col1, col2 = st.columns(2)
+            with col1:
+                export_table = st.selectbox("Export", EXPORT_TABLES, key='bulk_export_table')
+            with col2:
+                export_format = st.selectbox("Format", EXPORT_FORMATS, key='bulk_export_format')
+            # Only build the file when asked, not on every rerun. It is spooled
+            # to a temporary file and read only when the download is clicked.
+            if st.button("Prepare export", key='bulk_export_prepare'):
+                previous = st.session_state.pop('bulk_export', None)
+                if previous:
+                    previous[2].close()
+                st.session_state.bulk_export = (export_table, export_format, spool_export(
+                    export_table, st.session_state.user_id, export_format))
+            prepared = st.session_state.get('bulk_export')
+            if prepared and prepared[:2] == (export_table, export_format):
+                spool = prepared[2]
+                st.download_button(f"Download {export_table}.{export_format}", lambda: read_spool(spool),
+                                   file_name=f"{export_table}.{export_format}", key='bulk_export_download')
+    else:
+        st.info("No team members assigned.")
+
+# Manager tab 2: Set Goals
+@st.fragment
+@timed_render
+@session_writes
+def manager_goals_tab():
+    st.subheader("🎯 Set Goals for Team")
+    team = get_team_employees(st.session_state.user_id)
+    new_team_goals(team)
+    if team:
+        employee, employee_id = select_team_member("Select Employee for Goal", team, key='goal_employee')
+        debug_write(f"Selected employee ID: {employee_id}, Manager ID: {st.session_state.user_id}")
+        with st.form(f"goal_form_{employee_id}"):
+            goal_description = st.text_area("Goal Description")
+            if st.form_submit_button("Set Goal"):
+                debug_write(f"Saving goal for employee {employee_id} from manager {st.session_state.user_id}")
+                save_goal(employee_id, st.session_state.user_id, goal_description)
+                st.success("Goal set!")
+    else:
+        st.info("No team members assigned.")
+
+# Goals employees set themselves reach the manager through the change feed
+# and badge this tab, so it lists the unread ones and can clear them
+def new_team_goals(team):
+    user_id = st.session_state.user_id
+    changes, cursor = load_pages('new_goal_pages', lambda cursor: get_new_changes(user_id, cursor, source='goals'))
+    if changes.empty:
+        return
+    goals = get_goals(None, 'manager', user_id).set_index('id')
+    names = {member.id: member.username for member in team}
+    st.write("New goals from your team:")
+    st.dataframe(pd.DataFrame({
+        'employee': [names.get(goals['employee_id'].get(goal_id)) for goal_id in changes['source_id']],
+        'set': changes['changed_at'],
+        'goal': changes['summary'],
+    }), hide_index=True)
+    load_more_button('new_goal_pages', cursor)
+    if st.button("Mark these as read", key='new_goals_mark_read'):
+        mark_changes_seen(user_id, changes['id'].max(), source='goals')
+        st.session_state.new_goal_pages = 1
+        # Full rerun so the tab badge drops as well
+        st.rerun()
+
+# Manager tab 3: Provide Feedback
+@st.fragment
+@timed_render
+@session_writes
+def manager_feedback_tab():
+    st.subheader("💬 Provide Feedback")
+    team = get_team_employees(st.session_state.user_id)
+    if team:
+        debug_write(f"Team members: {[m._asdict() for m in team]}")
+        employee, employee_id = select_team_member("Select Employee for Feedback", team, key='feedback_employee')
+        debug_write(f"Selected employee: {employee} (ID: {employee_id}), Manager ID: {st.session_state.user_id}")
+        with st.form(f"feedback_form_{employee_id}"):
+            message = st.text_area("Feedback Message")
+            if st.form_submit_button("Send Feedback"):
+                debug_write(f"Saving feedback for employee {employee_id} from manager {st.session_state.user_id}")
+                save_feedback(employee_id, st.session_state.user_id, message)
+                st.success(f"Feedback sent to {employee}!")
+                # Show the saved feedback
+                feedback, _ = get_feedback_page(employee_id, 'manager', st.session_state.user_id)
+                if not feedback.empty:
+                    st.write("Latest feedback:")
+                    st.dataframe(feedback[['date', 'message']])
+        # Show existing feedback for this employee
+        st.write("Existing feedback:")
+        if not show_paged_dataframe(
+                f'mgr_feedback_pages_{employee_id}',
+                lambda cursor: get_feedback_page(employee_id, 'manager', st.session_state.user_id, cursor),
+                ['date', 'message']):
+            st.info("No feedback given yet.")
+    else:
+        st.info("No team members assigned.")
+
+# Manager tab 4: Review Self-Evaluations
+SELF_EVALUATION_FILTERS = ("Pending", "Approved", "Rejected", "All")
+@st.fragment
+@timed_render
+@session_writes
+def manager_self_evaluations_tab():
+    st.subheader("✍️ Review Self-Evaluations")
+    bulk_summary('self_eval_review')
+    self_evals = get_self_evaluations(None, st.session_state.role, st.session_state.user_id)
+    if self_evals.empty:
+        st.info("No self-evaluations to review.")
+        return
+    # One table for the whole subtree, however large, instead of a pair of
+    # buttons per row; decisions are applied in bulk
+    names = {report.id: report.username for report in get_all_reports(st.session_state.user_id)}
+    status = st.radio("Status", SELF_EVALUATION_FILTERS, horizontal=True, key='self_eval_filter')
+    shown = self_evals if status == "All" else self_evals[self_evals['status'] == status]
+    table = pd.DataFrame({
+        'Employee': shown['employee_id'].map(names).fillna(shown['employee_id'].astype(str)),
+        'Date': shown['submission_date'], 'Status': shown['status'], 'Comments': shown['comments'],
+    })
+    if status != 'Pending':
+        st.dataframe(table, hide_index=True)
+        return
+    if shown.empty:
+        st.info("No self-evaluations are waiting for review.")
+        return
+    manager_id = st.session_state.user_id
+    bulk_select('self_eval_review', shown['id'].tolist(), table, {
+        "Approve": ("Approved", lambda ids: update_self_evaluation_statuses(ids, 'Approved', manager_id).result()),
+        "Reject": ("Rejected", lambda ids: update_self_evaluation_statuses(ids, 'Rejected', manager_id).result()),
+    }, "self-evaluation(s)")
+
+# Manager tab 5: Schedule Meetings
+@st.fragment
+@timed_render
+@session_writes
+def manager_meetings_tab():
+    st.subheader("📅 Schedule Meetings")
+    team = get_team_employees(st.session_state.user_id)
+    if team:
+        debug_write(f"Team members: {[m._asdict() for m in team]}")
+        employee, employee_id = select_team_member("Select Employee for Meeting", team, key='meeting_employee')
+        debug_write(f"Selected employee: {employee} (ID: {employee_id}), Manager ID: {st.session_state.user_id}")
+        with st.form(f"meeting_form_{employee_id}"):
+            col1, col2, col3 = st.columns(3)
+            meeting_date = col1.date_input("Meeting Date")
+            start_time = col2.time_input("Start", value=time(9, 0), step=timedelta(minutes=15))
+            minutes = col3.selectbox("Minutes", MEETING_MINUTES, index=MEETING_MINUTES.index(30))
+            purpose = st.text_input("Purpose of Meeting")
+            if st.form_submit_button("Schedule Meeting"):
+                starts_at = datetime.combine(meeting_date, start_time)
+                ends_at = starts_at + timedelta(minutes=minutes)
+                # Checked here for a friendly message; the writer checks again
+                conflict = find_meeting_conflict(employee_id, st.session_state.user_id, starts_at, ends_at)
+                if conflict is not None:
+                    who = employee if employee_id in (conflict.employee_id, conflict.manager_id) else "You"
+                    st.error(f"{who} already has a meeting from {conflict.starts_at} to {conflict.ends_at[11:]}.")
+                else:
+                    debug_write(f"Scheduling meeting for employee {employee_id} with manager {st.session_state.user_id}")
+                    schedule_meeting(employee_id, st.session_state.user_id, starts_at, ends_at, purpose)
+                    st.success(f"Meeting scheduled with {employee}!")
+                    # Show the saved meeting
+                    meetings, _ = get_meetings_page(employee_id, 'manager', st.session_state.user_id)
+                    if not meetings.empty:
+                        st.write("Latest meetings:")
+                        st.dataframe(meetings[['scheduled', 'ends_at', 'purpose']])
+        # Show existing meetings for this employee
+        st.write("Existing meetings:")
+        if not show_paged_dataframe(
+                f'mgr_meetings_pages_{employee_id}',
+                lambda cursor: get_meetings_page(employee_id, 'manager', st.session_state.user_id, cursor),
+                ['scheduled', 'ends_at', 'purpose']):
             st.info("No meetings scheduled yet.")
+    st.subheader("🗓️ My Calendar")
+    meeting_calendar(st.session_state.user_id, 'mgr_calendar')
 
-    # Tab 7: View Training
-    with tabs[6]:
-        st.subheader("🎓 Recommended Training")
-        training = get_training(st.session_state.user_id, st.session_state.role, st.session_state.manager_id)
-        if not training.empty:
-            st.dataframe(training[['program', 'date']])
-        else:
-            st.info("No training recommended.")
+# Manager tab 6: Recommend Training
+@st.fragment
+@timed_render
+@session_writes
+def manager_training_tab():
+    st.subheader("🎓 Recommend Training")
+    team = get_team_employees(st.session_state.user_id)
+    if team:
+        employee, employee_id = select_team_member("Select Employee for Training", team, key='training_employee')
+        debug_write(f"Selected employee ID: {employee_id}, Manager ID: {st.session_state.user_id}")
+        with st.form(f"training_form_{employee_id}"):
+            program = st.text_input("Training Program")
+            if st.form_submit_button("Recommend Training"):
+                debug_write(f"Saving training for employee {employee_id} from manager {st.session_state.user_id}")
+                save_training(employee_id, st.session_state.user_id, program)
+                st.success("Training recommended!")
+        # Show existing training for this employee
+        st.write("Existing training:")
+        if not show_paged_dataframe(
+                f'mgr_training_pages_{employee_id}',
+                lambda cursor: get_training_page(employee_id, 'manager', st.session_state.user_id, cursor),
+                ['date', 'program']):
+            st.info("No training recommended yet.")
 
-# Manager Dashboard
-def manager_dashboard():
-    st.title("🛠️ Manager Dashboard")
-    tabs = st.tabs(["Evaluate Employees", "Set Goals", "Provide Feedback", "Review Self-Evaluations", "Schedule Meetings", "Recommend Training", "Analytics"])
-
-    # Tab 1: Evaluate Employees
-    with tabs[0]:
-        st.subheader("📈 Evaluate Team Members")
-        team = get_team_employees(st.session_state.user_id)
-        if not team.empty:
-            employee = st.selectbox("Select Employee", team['username'])
-            employee_id = team[team['username'] == employee]['id'].iloc[0]
-            with st.form(f"eval_form_{employee_id}"):
-                quality = st.slider("Work Quality", 0.0, 5.0, 2.5)
-                punctuality = st.slider("Punctuality", 0.0, 5.0, 2.5)
-                teamwork = st.slider("Teamwork", 0.0, 5.0, 2.5)
-                targets = st.slider("Meeting Targets", 0.0, 5.0, 2.5)
-                comments = st.text_area("Comments")
-                if st.form_submit_button("Submit Evaluation"):
-                    save_evaluation(employee_id, st.session_state.user_id, quality, punctuality, teamwork, targets, comments)
-                    st.success("Evaluation saved as draft!")
-            evaluations = get_evaluations(employee_id, st.session_state.role, st.session_state.user_id)
-            if not evaluations.empty:
-                st.subheader("Past Evaluations")
-                for _, row in evaluations.iterrows():
-                    st.write(f"**{row['review_date']}** (Status: {row['status']})")
-                    st.write(f"Quality: {row['quality']}, Punctuality: {row['punctuality']}, Teamwork: {row['teamwork']}, Targets: {row['targets']}")
-                    st.write(f"Comments: {row['comments']}")
-                    if row['status'] == 'Draft':
-                        if st.button(f"Finalize Evaluation {row['id']}", key=f"finalize_{row['id']}"):
-                            update_evaluation_status(row['id'], 'Final')
-                            st.success("Evaluation finalized!")
-        else:
-            st.info("No team members assigned.")
-
-    # Tab 2: Set Goals
-    with tabs[1]:
-        st.subheader("🎯 Set Goals for Team")
-        team = get_team_employees(st.session_state.user_id)
-        if not team.empty:
-            employee = st.selectbox("Select Employee for Goal", team['username'], key='goal_employee')
-            employee_id = team[team['username'] == employee]['id'].iloc[0]
-            st.write(f"Debug: Selected employee ID: {employee_id}, Manager ID: {st.session_state.user_id}")
-            with st.form(f"goal_form_{employee_id}"):
-                goal_description = st.text_area("Goal Description")
-                if st.form_submit_button("Set Goal"):
-                    st.write(f"Debug: Saving goal for employee {employee_id} from manager {st.session_state.user_id}")
-                    save_goal(int(employee_id), int(st.session_state.user_id), goal_description)
-                    st.success("Goal set!")
-        else:
-            st.info("No team members assigned.")
-
-    # Tab 3: Provide Feedback
-    with tabs[2]:
-        st.subheader("💬 Provide Feedback")
-        team = get_team_employees(st.session_state.user_id)
-        if not team.empty:
-            st.write(f"Debug - Team members: {team.to_dict('records')}")
-            employee = st.selectbox("Select Employee for Feedback", team['username'], key='feedback_employee')
-            employee_id = int(team[team['username'] == employee]['id'].iloc[0])
-            st.write(f"Debug - Selected employee: {employee} (ID: {employee_id}), Manager ID: {st.session_state.user_id}")
-            with st.form(f"feedback_form_{employee_id}"):
-                message = st.text_area("Feedback Message")
-                if st.form_submit_button("Send Feedback"):
-                    st.write(f"Debug - Saving feedback for employee {employee_id} from manager {st.session_state.user_id}")
-                    if save_feedback(employee_id, int(st.session_state.user_id), message):
-                        st.success(f"Feedback sent to {employee}!")
-                        # Show the saved feedback
-                        feedback = get_feedback(employee_id, 'manager', st.session_state.user_id)
-                        if not feedback.empty:
-                            st.write("Latest feedback:")
-                            st.dataframe(feedback[['date', 'message']])
-                    else:
-                        st.error("Failed to save feedback!")
-            # Show existing feedback for this employee
-            feedback = get_feedback(employee_id, 'manager', st.session_state.user_id)
-            st.write(f"Debug: Found {len(feedback)} feedback entries")
-            if not feedback.empty:
-                st.write("Existing feedback:")
-                st.dataframe(feedback[['date', 'message']])
-            else:
-                st.info("No feedback given yet.")
-        else:
-            st.info("No team members assigned.")
-
-    # Tab 4: Review Self-Evaluations
-    with tabs[3]:
-        st.subheader("✍️ Review Self-Evaluations")
-        self_evals = get_self_evaluations(None, st.session_state.role, st.session_state.user_id)
-        if not self_evals.empty:
-            for _, row in self_evals.iterrows():
-                st.write(f"**Employee ID: {row['employee_id']}, Date: {row['submission_date']}** (Status: {row['status']})")
-                st.write(f"Comments: {row['comments']}")
-                if row['status'] == 'Pending':
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        if st.button(f"Approve {row['id']}", key=f"approve_{row['id']}"):
-                            update_self_evaluation_status(row['id'], 'Approved')
-                            st.success("Self-evaluation approved!")
-                    with col2:
-                        if st.button(f"Reject {row['id']}", key=f"reject_{row['id']}"):
-                            update_self_evaluation_status(row['id'], 'Rejected')
-                            st.success("Self-evaluation rejected!")
-        else:
-            st.info("No self-evaluations to review.")
-
-    # Tab 5: Schedule Meetings
-    with tabs[4]:
-        st.subheader("📅 Schedule Meetings")
-        team = get_team_employees(st.session_state.user_id)
-        if not team.empty:
-            st.write(f"Debug - Team members: {team.to_dict('records')}")
-            employee = st.selectbox("Select Employee for Meeting", team['username'], key='meeting_employee')
-            employee_id = int(team[team['username'] == employee]['id'].iloc[0])
-            st.write(f"Debug - Selected employee: {employee} (ID: {employee_id}), Manager ID: {st.session_state.user_id}")
-            with st.form(f"meeting_form_{employee_id}"):
-                meeting_date = st.date_input("Meeting Date")
-                purpose = st.text_input("Purpose of Meeting")
-                if st.form_submit_button("Schedule Meeting"):
-                    st.write(f"Debug - Scheduling meeting for employee {employee_id} with manager {st.session_state.user_id}")
-                    if schedule_meeting(employee_id, int(st.session_state.user_id), str(meeting_date), purpose):
-                        st.success(f"Meeting scheduled with {employee}!")
-                        # Show the saved meeting
-                        meetings = get_meetings(employee_id, 'manager', st.session_state.user_id)
-                        if not meetings.empty:
-                            st.write("Latest meetings:")
-                            st.dataframe(meetings[['meeting_date', 'purpose']])
-                    else:
-                        st.error("Failed to schedule meeting!")
-            # Show existing meetings for this employee
-            meetings = get_meetings(employee_id, 'manager', st.session_state.user_id)
-            st.write(f"Debug: Found {len(meetings)} meeting entries")
-            if not meetings.empty:
-                st.write("Existing meetings:")
-                st.dataframe(meetings[['meeting_date', 'purpose']])
-            else:
-                st.info("No meetings scheduled yet.")
-
-
-    # Tab 6: Recommend Training
-    with tabs[5]:
-        st.subheader("🎓 Recommend Training")
-        team = get_team_employees(st.session_state.user_id)
-        if not team.empty:
-            employee = st.selectbox("Select Employee for Training", team['username'], key='training_employee')
-            employee_id = team[team['username'] == employee]['id'].iloc[0]
-            st.write(f"Debug: Selected employee ID: {employee_id}, Manager ID: {st.session_state.user_id}")
-            with st.form(f"training_form_{employee_id}"):
-                program = st.text_input("Training Program")
-                if st.form_submit_button("Recommend Training"):
-                    st.write(f"Debug: Saving training for employee {employee_id} from manager {st.session_state.user_id}")
-                    save_training(int(employee_id), int(st.session_state.user_id), program)
-                    st.success("Training recommended!")
-            # Show existing training for this employee
-            training = get_training(employee_id, 'manager', st.session_state.user_id)
-            st.write(f"Debug: Found {len(training)} training entries")
-            if not training.empty:
-                st.write("Existing training:")
-                st.dataframe(training[['date', 'program']])
-            else:
-                st.info("No training recommended yet.")
+# Manager tab 7: Analytics
+# Organisation roll-up for managers with managers below them: every team
+# in the subtree aggregated in one query over the org closure table.
+# Returns False when the manager has no teams below their own.
+def org_rollup_panel(manager_id):
+    rollup = get_org_rollup(manager_id)
+    if not (rollup['depth'] > 0).any():
+        return False
+    summary = get_org_summary(manager_id)
+    st.write(f"**Organisation roll-up:** {summary['teams']} teams, {summary['employees']} employees, "
+             f"{summary['eval_count']} evaluations")
+    for col, metric in zip(st.columns(len(METRICS)), METRICS):
+        col.metric(metric.title(), f"{summary[metric]:.2f}")
+    fig = px.bar(rollup, x='manager_name', y=list(METRICS), barmode='group',
+                 title="Average Performance Scores by Team")
+    fig.update_layout(xaxis_title="Manager", yaxis_title="Score", legend_title="Metrics")
+    st.plotly_chart(fig)
+    st.dataframe(rollup.set_index('manager_name')[['depth', 'employees', 'eval_count', *METRICS]].round(2))
+    return True
 
+# Who is improving or declining across the manager's whole subtree, from
+# the vectorized trend engine; names come from the cached report list.
+# Years are left out: a slope needs three of them.
+TREND_BUCKETS = ('month', 'quarter')
+TREND_COLUMNS = ['employee_name', 'score', 'slope', 'delta', 'latest', 'outliers']
+TREND_TOP = 10
 
-    # Tab 7: Analytics
-    with tabs[6]:
-        st.subheader("📈 Team Performance Analytics")
+def trend_panel(manager_id):
+    bucket = st.selectbox("Trend period", TREND_BUCKETS, key='trend_bucket')
+    trends = get_team_trends(manager_id, bucket)
+    if trends.empty:
+        st.info(f"No evaluations in the last {TREND_PERIODS} {bucket}s.")
+        return
+    names = {report.id: report.username for report in get_all_reports(manager_id)}
+    trends = trends.assign(employee_name=trends['employee_id'].map(names)
+                           .fillna("Employee " + trends['employee_id'].astype(str)))
+    counts = trends['direction'].value_counts()
+    outliers = trends[trends['outliers'] != '']
+    for col, (label, value) in zip(st.columns(4), (("Improving", counts.get('improving', 0)),
+                                                   ("Declining", counts.get('declining', 0)),
+                                                   ("Steady", counts.get('steady', 0)),
+                                                   ("Outliers", len(outliers)))):
+        col.metric(label, int(value))
+    st.caption(f"Slopes are score points per {bucket} over the last {TREND_PERIODS} {bucket}s; "
+               f"improving or declining means at least {SLOPE_THRESHOLD} either way.")
+    improving, declining = st.columns(2)
+    improving.write("**Most improved**")
+    improving.dataframe(trends[trends['direction'] == 'improving'].nlargest(TREND_TOP, 'slope')[TREND_COLUMNS]
+                        .set_index('employee_name').round(2))
+    declining.write("**Most declined**")
+    declining.dataframe(trends[trends['direction'] == 'declining'].nsmallest(TREND_TOP, 'slope')[TREND_COLUMNS]
+                        .set_index('employee_name').round(2))
+    if len(outliers):
+        st.write(f"**Outliers** (a metric {Z_THRESHOLD} or more standard deviations from the rest): "
+                 f"{len(outliers)}")
+        st.dataframe(outliers.sort_values('score')[TREND_COLUMNS].set_index('employee_name').round(2))
+    if st.toggle(f"Show all {len(trends)} employees", key='trend_all'):
+        st.dataframe(trends.set_index('employee_name').drop(columns='employee_id').round(2))
+
+@st.fragment
+@timed_render
+@session_writes
+def manager_analytics_tab():
+    st.subheader("📈 Team Performance Analytics")
+    snapshot_status('analytics_refresh')
+    has_org = org_rollup_panel(st.session_state.user_id)
+    with st.expander("📊 Who is improving / declining", expanded=True):
+        trend_panel(st.session_state.user_id)
+
+    # Get team members
+    team = get_team_employees(st.session_state.user_id)
+    if team:
+        # Employee selection, with an 'All Employees' option
+        names = ['All Employees'] + [member.username for member in team]
+        selected_employee = st.selectbox(
+            "Select Employee",
+            names,
+            key='analytics_employee'
+        )
+
+        # Get selected employee ID
+        if selected_employee != 'All Employees':
+            selected_id = team[names.index(selected_employee) - 1].id
+        else:
+            selected_id = None
         
-        # Get team members
-        team = get_team_employees(st.session_state.user_id)
-        if not team.empty:
-            # Add 'All Employees' option
-            all_option = pd.DataFrame({'id': [-1], 'username': ['All Employees']})
-            team_with_all = pd.concat([all_option, team])
-            
-            # Employee selection
-            selected_employee = st.selectbox(
-                "Select Employee",
-                team_with_all['username'],
-                key='analytics_employee'
-            )
-            
-            # Get selected employee ID
+        # All numbers below are aggregated in SQL from the stats tables
+        summary = get_score_summary(st.session_state.user_id, selected_id)
+
+        if summary['eval_count']:
+            metrics = ['quality', 'punctuality', 'teamwork', 'targets']
+            st.write(f"Showing data for: {selected_employee}")
+            st.write(f"Number of evaluations: {summary['eval_count']}")
+
             if selected_employee != 'All Employees':
-                selected_id = str(team[team['username'] == selected_employee]['id'].iloc[0])
-            else:
-                selected_id = None
-            
-            # Get evaluations
-            evaluations = get_evaluations(selected_id, st.session_state.role, st.session_state.user_id)
-            
-            if not evaluations.empty:
-                # Clean and convert data types
-                evaluations['quality'] = pd.to_numeric(evaluations['quality'], errors='coerce')
-                evaluations['punctuality'] = pd.to_numeric(evaluations['punctuality'], errors='coerce')
-                evaluations['teamwork'] = pd.to_numeric(evaluations['teamwork'], errors='coerce')
-                evaluations['targets'] = pd.to_numeric(evaluations['targets'], errors='coerce')
-                evaluations['employee_id'] = evaluations['employee_id'].fillna('24')  # Default to nagendra's ID
-                
-                # Create ID to name mapping
-                id_to_name = dict(zip(team['id'].astype(str), team['username']))
-                
-                # Map employee IDs to names
-                evaluations['employee_name'] = evaluations['employee_id'].map(id_to_name).fillna('Nagendra')
-                
-                # Drop any rows with missing values in scores
-                evaluations = evaluations.dropna(subset=['quality', 'punctuality', 'teamwork', 'targets'])
-                
-                if not evaluations.empty:
-                    # Show evaluation details
-                    st.write(f"Showing data for: {selected_employee}")
-                    st.write(f"Number of evaluations: {len(evaluations)}")
-                    
-                    # Calculate average scores
-                    if selected_employee != 'All Employees':
-                        # For single employee, show scores over time
-                        evaluations['review_date'] = pd.to_datetime(evaluations['review_date'])
-                        
-                        # Line chart showing progress
-                        fig = px.line(evaluations, 
-                                     x='review_date', 
-                                     y=['quality', 'punctuality', 'teamwork', 'targets'],
-                                     title=f"Performance Trends for {selected_employee}")
-                        fig.update_layout(
-                            xaxis_title="Date",
-                            yaxis_title="Score",
-                            legend_title="Metrics"
-                        )
-                        st.plotly_chart(fig)
-                        
-                        # Show individual scores
-                        st.write("Individual Evaluation Scores:")
-                        display_df = evaluations[['review_date', 'quality', 'punctuality', 'teamwork', 'targets']].copy()
-                        display_df['review_date'] = display_df['review_date'].dt.strftime('%Y-%m-%d')
-                        st.dataframe(display_df.set_index('review_date').round(2))
-                        
-                        # Calculate and show averages
-                        avg_scores = evaluations[['quality', 'punctuality', 'teamwork', 'targets']].mean().round(2)
-                        st.write("Average Scores:")
-                        st.write({
-                            "Quality": avg_scores['quality'],
-                            "Punctuality": avg_scores['punctuality'],
-                            "Teamwork": avg_scores['teamwork'],
-                            "Targets": avg_scores['targets']
-                        })
-                    else:
-                        # For all employees, show comparison
-                        avg_scores = evaluations.groupby('employee_name').agg({
-                            'quality': 'mean',
-                            'punctuality': 'mean',
-                            'teamwork': 'mean',
-                            'targets': 'mean'
-                        }).reset_index()
-                        
-                        # Bar chart comparing employees
-                        fig = px.bar(avg_scores, 
-                                    x='employee_name', 
-                                    y=['quality', 'punctuality', 'teamwork', 'targets'],
-                                    barmode='group', 
-                                    title="Average Performance Scores by Employee")
-                        fig.update_layout(
-                            xaxis_title="Employee",
-                            yaxis_title="Score",
-                            legend_title="Metrics"
-                        )
-                        st.plotly_chart(fig)
-                        
-                        # Show average scores table
-                        st.write("Team Average Scores:")
-                        st.dataframe(avg_scores.set_index('employee_name').round(2))
-                else:
-                    st.info("No valid evaluation data for the selected employee.")
+                # For single employee, show average scores per period
+                trend, bucket = trend_chart(st.session_state.user_id, selected_id,
+                                            f"Performance Trends for {selected_employee}", 'analytics')
+
+                # Show per-period scores
+                st.write(f"Evaluation Scores by {bucket.title()}:")
+                st.dataframe(trend.set_index('bucket').round(2))
+
+                # Show overall averages
+                st.write("Average Scores:")
+                st.write({
+                    "Quality": round(summary['quality'], 2),
+                    "Punctuality": round(summary['punctuality'], 2),
+                    "Teamwork": round(summary['teamwork'], 2),
+                    "Targets": round(summary['targets'], 2)
+                })
             else:
-                st.info("No evaluations available for the selected employee.")
+                # For all employees, show comparison
+                avg_scores = get_team_averages(st.session_state.user_id)
+
+                # Bar chart comparing employees
+                fig = px.bar(avg_scores,
+                            x='employee_name',
+                            y=metrics,
+                            barmode='group',
+                            title="Average Performance Scores by Employee")
+                fig.update_layout(
+                    xaxis_title="Employee",
+                    yaxis_title="Score",
+                    legend_title="Metrics"
+                )
+                st.plotly_chart(fig)
+
+                # Show average scores table
+                st.write("Team Average Scores:")
+                st.dataframe(avg_scores.set_index('employee_name')[['eval_count'] + metrics].round(2))
         else:
-            st.info("No team members found.")
+            st.info("No evaluations available for the selected employee.")
+    elif not has_org:
+        st.info("No team members found.")
+
+MANAGER_TABS = {
+    "Evaluate Employees": manager_evaluate_tab,
+    "Set Goals": manager_goals_tab,
+    "Provide Feedback": manager_feedback_tab,
+    "Review Self-Evaluations": manager_self_evaluations_tab,
+    "Schedule Meetings": manager_meetings_tab,
+    "Recommend Training": manager_training_tab,
+    "Analytics": manager_analytics_tab,
+}
+# Managers hear about self-evaluations and goals their employees set
+MANAGER_FEED_TABS = {'goals': "Set Goals", 'self_evaluations': "Review Self-Evaluations"}
+
+# Manager Dashboard
+def manager_dashboard():
+    st.title("🛠️ Manager Dashboard")
+    search_panel()
+    whats_new_panel()
+    render_tab_router('manager_tab', MANAGER_TABS, unread_badges(MANAGER_FEED_TABS))
+
+# Admin Dashboard: query and render timings for the whole server process
+def admin_dashboard():
+    st.title("📊 System Metrics")
+    snap = metrics_registry.snapshot()
+    started = pd.Timestamp(snap['started'], unit='s').strftime('%Y-%m-%d %H:%M:%S')
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("SQL statements", sum(q['calls'] for q in snap['queries']))
+    col2.metric("Query cache hit rate", f"{query_cache.hits / max(1, query_cache.hits + query_cache.misses):.0%}")
+    col3.metric("Cached results", len(query_cache))
+    col4.metric("Queued writes per commit", f"{write_queue.writes / max(1, write_queue.batches):.1f}")
+    st.caption(f"Collecting since {started} UTC")
+    snapshot_status('admin_snapshot_refresh')
+
+    st.subheader("Queries by total time")
+    queries = pd.DataFrame(snap['queries'], columns=['sql', 'calls', 'seconds', 'max_seconds', 'rows', 'errors'])
+    if not queries.empty:
+        queries['total_ms'] = queries['seconds'] * 1000
+        queries['mean_ms'] = queries['total_ms'] / queries['calls']
+        queries['max_ms'] = queries['max_seconds'] * 1000
+        st.dataframe(queries.sort_values('total_ms', ascending=False)[
+            ['sql', 'calls', 'total_ms', 'mean_ms', 'max_ms', 'rows', 'errors']].round(3))
+    else:
+        st.info("No queries recorded yet.")
+
+    st.subheader("Tab renders")
+    renders = pd.DataFrame(snap['renders'], columns=['name', 'calls', 'seconds', 'max_seconds', 'errors'])
+    if not renders.empty:
+        renders['mean_ms'] = renders['seconds'] * 1000 / renders['calls']
+        renders['max_ms'] = renders['max_seconds'] * 1000
+        st.dataframe(renders.sort_values('mean_ms', ascending=False)[
+            ['name', 'calls', 'mean_ms', 'max_ms', 'errors']].round(3))
+    else:
+        st.info("No tab renders recorded yet.")
+
+    st.subheader("Slow queries")
+    for slow in snap['slow_queries']:
+        with st.expander(f"{slow['ms']} ms · {slow['rows']} rows · {slow['sql'][:80]}"):
+            st.code(slow['sql'], language='sql')
+            st.text('\n'.join(slow['plan']) or "No plan captured.")
+    if not snap['slow_queries']:
+        st.info("No slow queries recorded.")
+
+    if st.button("Reset metrics"):
+        metrics_registry.reset()
+        st.rerun()
 
 # Main app logic
 if st.session_state.user_id is None:
@@ -922,6 +1043,8 @@ if st.session_state.user_id is None:
 else:
     if st.session_state.role == 'employee':
         employee_dashboard()
+    elif st.session_state.role == 'admin':
+        admin_dashboard()
     else:
         manager_dashboard()
     if st.button("Logout"):
@@ -0,0 +1,22 @@
+"""Data access for the performance database, one module per entity.
+
+Reads go through the pooled connection in db.py and the query cache in
+cache.py. Saves and status updates are queued on the single writer thread
+in writer.py and return a Future; registration, uploads and bulk imports
+still write directly because their callers need the outcome at once.
+"""
+from repository.base import PAGE_SIZE, Record
+from repository.changes import get_change_history, get_new_changes, get_unread_counts, mark_changes_seen
+from repository.documents import Document, get_document, get_documents, read_document, save_document
+from repository.evaluations import (evaluate_employee, get_draft_evaluations, get_evaluations, get_evaluations_page,
+                                    save_evaluation, update_evaluation_status, update_evaluation_statuses)
+from repository.feedback import get_feedback, get_feedback_page, save_feedback
+from repository.goals import get_goals, get_goals_page, save_goal
+from repository.meetings import (Meeting, MeetingConflict, find_meeting_conflict, get_calendar, get_meetings,
+                                 get_meetings_page, schedule_meeting)
+from repository.search import SOURCE_LABELS, search_page
+from repository.self_evaluations import (get_self_evaluations, save_self_evaluation, update_self_evaluation_status,
+                                         update_self_evaluation_statuses)
+from repository.training import get_training, get_training_page, save_training
+from repository.users import (Report, User, UserRef, authenticate_user, get_all_reports, get_managers,
+                              get_team_employees, register_user)
@@ -0,0 +1,122 @@
+from datetime import datetime
+
+import pandas as pd
+
+from db import get_connection
+from writer import wait_for_writes
+
+# Rows per page for the paged history views
+PAGE_SIZE = 20
+# Ids bound per ``id IN (...)`` list, well under the smallest bind-parameter
+# limit either backend has shipped with (SQLite's old default of 999)
+IN_CHUNK_SIZE = 500
+
+
+class Record:
+    """Base for small result rows.
+
+    Subclasses list their columns in ``__slots__``; instances cost a few
+    dozen bytes, unpack like tuples and avoid building a DataFrame when the
+    caller only needs a handful of fields.
+    """
+    __slots__ = ()
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+
+    def __iter__(self):
+        return (getattr(self, name) for name in self.__slots__)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and tuple(self) == tuple(other)
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __repr__(self):
+        fields = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+    def _asdict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def today():
+    return datetime.now().strftime('%Y-%m-%d')
+
+
+def read_connection():
+    # Reads first wait for writes this session still has queued in the
+    # writer, so users always see what they just saved
+    wait_for_writes()
+    return get_connection()
+
+
+# SQL text is kept in module constants so repeated calls hit the
+# connection's prepared statement cache instead of re-parsing.
+def fetch_records(record_type, query, params=()):
+    return [record_type(*row) for row in read_connection().execute(query, params)]
+
+
+def fetch_record(record_type, query, params=()):
+    row = read_connection().execute(query, params).fetchone()
+    return record_type(*row) if row else None
+
+
+def cursor_frame(cursor):
+    # Built from the cursor directly so any backend connection works, not
+    # only the ones pandas recognises
+    columns = [d[0] for d in cursor.description]
+    return pd.DataFrame.from_records(cursor.fetchall(), columns=columns, coerce_float=True)
+
+
+def id_chunks(ids, size=IN_CHUNK_SIZE):
+    """Split ``ids`` into ``(chunk, placeholders)`` pairs for queries with an
+    ``id IN ({ids})`` list, each under the bind-parameter limit."""
+    for start in range(0, len(ids), size):
+        chunk = ids[start:start + size]
+        yield chunk, ', '.join('?' * len(chunk))
+
+
+def read_frame(query, params=()):
+    return cursor_frame(read_connection().execute(query, params))
+
+
+def read_page(query, params, key_columns, limit):
+    # Fetch one extra row to learn whether another page exists. The cursor
+    # is the sort key of the last row shown, so the next page is an index
+    # seek rather than an OFFSET scan.
+    df = read_frame(query + " LIMIT ?", params + (limit + 1,))
+    if len(df) <= limit:
+        return df, None
+    df = df.iloc[:limit]
+    cursor = tuple(getattr(v, 'item', lambda: v)() for v in df.iloc[-1][list(key_columns)])
+    return df, cursor
+
+
+# Cache scopes: which (employee_id, manager_id) a read is restricted to
+def employee_or_manager_scope(employee_id, role, user_id, *_, **__):
+    return (employee_id, None) if role == 'employee' else (None, user_id)
+
+
+def pair_scope(employee_id, role, manager_id, *_, **__):
+    # Employees see rows from their manager; managers may narrow to one employee
+    return (employee_id, manager_id) if role == 'employee' or employee_id else (None, manager_id)
+
+
+def pair_filter(employee_id, role, manager_id):
+    # WHERE clause matching pair_scope for the (employee_id, manager_id) tables
+    if role == 'employee' or employee_id:
+        return "employee_id = ? AND manager_id = ?", (int(employee_id), int(manager_id))
+    return "manager_id = ?", (int(manager_id),)
+
+
+def id_page(table, columns, employee_id, role, manager_id, cursor, limit):
+    # Newest-first page of a (employee_id, manager_id) keyed table
+    where, params = pair_filter(employee_id, role, manager_id)
+    if cursor:
+        where += " AND id < ?"
+        params += (cursor[0],)
+    query = f"SELECT {columns} FROM {table} WHERE {where} ORDER BY id DESC"
+    return read_page(query, params, ('id',), limit)
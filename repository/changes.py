@@ -0,0 +1,58 @@
+from repository.base import PAGE_SIZE, read_connection, read_page
+from writer import submit
+
+# change_log rows are written by triggers (migration 9), one per insert or
+# status change, addressed to the user who should hear about it. Each row
+# carries its own seen flag (migration 10): rows commit from more than one
+# connection, so ids are not a commit order and a high-water mark would
+# skip a row that commits below it.
+_COLUMNS = 'id, source, source_id, op, summary, changed_at'
+_UNREAD = "SELECT source, COUNT(*) FROM change_log WHERE user_id = ? AND seen = 0 GROUP BY source"
+_NEW = f"SELECT {_COLUMNS} FROM change_log WHERE user_id = ? AND seen = 0"
+_SEEN = f"SELECT {_COLUMNS} FROM change_log WHERE user_id = ? AND seen = 1"
+# Only rows already committed when this runs are marked; one committing
+# later with a lower id stays unread
+_MARK_SEEN = "UPDATE change_log SET seen = 1 WHERE user_id = ? AND seen = 0 AND id <= ?"
+# Narrows the unread queries to one source table, for a tab showing its own
+_FROM_SOURCE = " AND source = ?"
+
+# Not cached: the rows come from triggers on other tables, whose writes do
+# not invalidate a 'change_log' entry, and every query here is a short
+# range scan of idx_change_log_unread or idx_change_log_user.
+
+
+def get_unread_counts(user_id):
+    # {source table: unread count}; empty when there is nothing new
+    return dict(read_connection().execute(_UNREAD, (int(user_id),)).fetchall())
+
+
+def _changes_page(query, user_id, cursor, limit, source=None):
+    # Newest first, keyed on id like the other history pages
+    params = (int(user_id),)
+    if source is not None:
+        query += _FROM_SOURCE
+        params += (source,)
+    if cursor:
+        query += " AND id < ?"
+        params += (cursor[0],)
+    return read_page(query + " ORDER BY id DESC", params, ('id',), limit)
+
+
+def get_new_changes(user_id, cursor=None, limit=PAGE_SIZE, source=None):
+    """Unread changes for ``user_id``, newest first, and the next cursor;
+    only those from the ``source`` table when one is given."""
+    return _changes_page(_NEW, user_id, cursor, limit, source)
+
+
+def get_change_history(user_id, cursor=None, limit=PAGE_SIZE):
+    """Changes already marked seen, newest first, for paging back on demand."""
+    return _changes_page(_SEEN, user_id, cursor, limit)
+
+
+def mark_changes_seen(user_id, change_id, source=None):
+    """Mark the user's unread changes up to ``change_id``, or just those
+    from ``source``, as seen; the Future resolves to the number marked."""
+    query, params = _MARK_SEEN, (int(user_id), int(change_id))
+    if source is not None:
+        query, params = query + _FROM_SOURCE, params + (source,)
+    return submit(lambda conn: conn.execute(query, params).rowcount)
@@ -0,0 +1,66 @@
+import mimetypes
+
+from blobstore import MAX_UPLOAD_BYTES, open_blob, put_stream
+from cache import cached_query, query_cache
+from db import get_connection
+from log import get_logger
+from repository.base import Record, fetch_record, read_frame, today
+
+log = get_logger('repository.documents')
+
+
+class Document(Record):
+    __slots__ = ('id', 'filename', 'size', 'sha256', 'mime')
+
+
+# ON CONFLICT against idx_documents_employee_sha256: uploading the same
+# content again (or a rerun while the uploader still holds the file) is a
+# no-op rather than a duplicate row.
+_INSERT = '''INSERT INTO documents (employee_id, filename, upload_date, size, sha256, mime)
+             VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (employee_id, sha256) DO NOTHING'''
+_BY_EMPLOYEE = '''SELECT id, filename, upload_date, size, sha256, mime FROM documents
+                  WHERE employee_id = ? ORDER BY id DESC'''
+_ONE = "SELECT id, filename, size, sha256, mime FROM documents WHERE id = ? AND employee_id = ?"
+
+
+def save_document(employee_id, uploaded_file, max_bytes=MAX_UPLOAD_BYTES):
+    """Store an uploaded file's content and record it for ``employee_id``.
+
+    Returns True when a new row was added and False when the employee had
+    already uploaded the same content. Raises blobstore.BlobTooLarge if the
+    file exceeds ``max_bytes``.
+    """
+    employee_id = int(employee_id)
+    filename = uploaded_file.name
+    mime = getattr(uploaded_file, 'type', None) or mimetypes.guess_type(filename)[0]
+    uploaded_file.seek(0)
+    sha256, size = put_stream(uploaded_file, max_bytes)
+    conn = get_connection()
+    with conn:
+        cursor = conn.execute(_INSERT, (employee_id, filename, today(), size, sha256, mime))
+    if cursor.rowcount == 0:
+        log.debug('document_duplicate', employee_id=employee_id, sha256=sha256)
+        return False
+    query_cache.invalidate('documents', employee_id)
+    log.info('document_saved', document_id=cursor.lastrowid, employee_id=employee_id, size=size, sha256=sha256)
+    return True
+
+
+@cached_query('documents', lambda employee_id: (employee_id, None))
+def get_documents(employee_id):
+    return read_frame(_BY_EMPLOYEE, (int(employee_id),))
+
+
+def get_document(employee_id, document_id):
+    # Scoped to the owner so one employee cannot fetch another's file by id
+    return fetch_record(Document, _ONE, (int(document_id), int(employee_id)))
+
+
+def read_document(document):
+    """A stored document's content, or None for rows saved before content
+    was kept. Uploads are capped at MAX_UPLOAD_BYTES, so reading one whole
+    is bounded; the file is closed before this returns."""
+    if not document.sha256:
+        return None
+    with open_blob(document.sha256) as f:
+        return f.read()
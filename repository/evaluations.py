@@ -0,0 +1,89 @@
+from cache import cached_query
+from log import get_logger
+from repository.base import (PAGE_SIZE, employee_or_manager_scope, id_chunks, read_connection, read_frame, read_page,
+                             today)
+from writer import submit
+
+log = get_logger('repository.evaluations')
+
+_INSERT = '''INSERT INTO evaluations
+             (employee_id, manager_id, quality, punctuality, teamwork, targets, comments, review_date, status)
+             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)'''
+_BY_EMPLOYEE = "SELECT * FROM evaluations WHERE employee_id = ?"
+_BY_MANAGER = "SELECT * FROM evaluations WHERE manager_id = ?"
+_PAGE_COLUMNS = "id, employee_id, review_date, quality, punctuality, teamwork, targets, comments, status"
+_UPDATE_STATUS = "UPDATE evaluations SET status = ? WHERE id = ?"
+_OWNER = "SELECT employee_id, manager_id FROM evaluations WHERE id = ?"
+_DRAFTS = f"SELECT {_PAGE_COLUMNS} FROM evaluations WHERE manager_id = ? AND status = 'Draft' ORDER BY review_date, id"
+# Only moves rows this manager owns that are still in the expected status,
+# and hands back the ids it moved
+_UPDATE_OWNED = '''UPDATE evaluations SET status = ?
+                   WHERE id IN ({ids}) AND manager_id = ? AND status = ? RETURNING id'''
+
+
+def save_evaluation(employee_id, manager_id, quality, punctuality, teamwork, targets, comments):
+    # Queued on the writer; the Future resolves to the new evaluation id
+    employee_id, manager_id = int(employee_id), int(manager_id)
+    params = (employee_id, manager_id, float(quality), float(punctuality), float(teamwork), float(targets),
+              comments, today(), 'Draft')
+    return submit(lambda conn: conn.execute(_INSERT, params).lastrowid, ('evaluations', employee_id, manager_id),
+                  lambda evaluation_id: log.info('evaluation_saved', evaluation_id=evaluation_id,
+                                                 employee_id=employee_id, manager_id=manager_id))
+
+
+# Older name for save_evaluation, kept for existing callers
+evaluate_employee = save_evaluation
+
+
+@cached_query('evaluations', employee_or_manager_scope)
+def get_evaluations(employee_id, role, user_id):
+    if role == 'employee':
+        return read_frame(_BY_EMPLOYEE, (int(employee_id),))
+    return read_frame(_BY_MANAGER, (int(user_id),))
+
+
+@cached_query('evaluations', employee_or_manager_scope)
+def get_evaluations_page(employee_id, role, user_id, cursor=None, limit=PAGE_SIZE):
+    # Newest first; returns (DataFrame, cursor for the next page or None)
+    where, params = ("employee_id = ?", (int(employee_id),)) if role == 'employee' else ("manager_id = ?", (int(user_id),))
+    if cursor:
+        where += " AND (review_date, id) < (?, ?)"
+        params += tuple(cursor)
+    query = f"SELECT {_PAGE_COLUMNS} FROM evaluations WHERE {where} ORDER BY review_date DESC, id DESC"
+    return read_page(query, params, ('review_date', 'id'), limit)
+
+
+def update_evaluation_status(evaluation_id, status):
+    # The owner is looked up first so the queued update evicts only the
+    # cache entries that can contain this row
+    evaluation_id = int(evaluation_id)
+    owner = read_connection().execute(_OWNER, (evaluation_id,)).fetchone()
+    return submit(lambda conn: conn.execute(_UPDATE_STATUS, (status, evaluation_id)).rowcount,
+                  ('evaluations', *owner) if owner else None)
+
+
+@cached_query('evaluations', lambda manager_id: (None, manager_id))
+def get_draft_evaluations(manager_id):
+    # Every draft a manager still has to finalize, oldest first
+    return read_frame(_DRAFTS, (int(manager_id),))
+
+
+def update_evaluation_statuses(evaluation_ids, status, manager_id, from_status='Draft'):
+    """Move many of ``manager_id``'s evaluations from ``from_status`` to
+    ``status`` as one queued write, so a whole review cycle closes in a
+    single transaction and commit.
+
+    The Future resolves to the ids that changed. Rows owned by another
+    manager, or no longer in ``from_status``, are left alone.
+    """
+    evaluation_ids, manager_id = [int(i) for i in evaluation_ids], int(manager_id)
+
+    def work(conn):
+        updated = []
+        for chunk, placeholders in id_chunks(evaluation_ids):
+            cursor = conn.execute(_UPDATE_OWNED.format(ids=placeholders), (status, *chunk, manager_id, from_status))
+            updated += [row[0] for row in cursor.fetchall()]
+        return updated
+    return submit(work, ('evaluations', None, manager_id),
+                  lambda updated: log.info('evaluation_statuses_updated', status=status, manager_id=manager_id,
+                                           requested=len(evaluation_ids), updated=len(updated)))
@@ -0,0 +1,30 @@
+from cache import cached_query
+from log import get_logger
+from repository.base import PAGE_SIZE, id_page, pair_filter, pair_scope, read_frame, today
+from writer import submit
+
+log = get_logger('repository.feedback')
+
+_INSERT = "INSERT INTO feedback (employee_id, manager_id, message, date) VALUES (?, ?, ?, ?)"
+
+
+def save_feedback(employee_id, manager_id, message):
+    # Queued on the writer; the Future resolves to the new feedback id
+    employee_id, manager_id = int(employee_id), int(manager_id)
+    params = (employee_id, manager_id, message, today())
+    return submit(lambda conn: conn.execute(_INSERT, params).lastrowid, ('feedback', employee_id, manager_id),
+                  lambda feedback_id: log.info('feedback_saved', feedback_id=feedback_id,
+                                               employee_id=employee_id, manager_id=manager_id))
+
+
+@cached_query('feedback', pair_scope)
+def get_feedback(employee_id, role, manager_id):
+    # Employees see feedback from their manager; managers see what they gave
+    # one employee, or everything they gave when no employee is selected
+    where, params = pair_filter(employee_id, role, manager_id)
+    return read_frame(f"SELECT * FROM feedback WHERE {where}", params)
+
+
+@cached_query('feedback', pair_scope)
+def get_feedback_page(employee_id, role, manager_id, cursor=None, limit=PAGE_SIZE):
+    return id_page('feedback', 'id, date, message', employee_id, role, manager_id, cursor, limit)
@@ -0,0 +1,36 @@
+from cache import cached_query
+from repository.base import PAGE_SIZE, id_page, pair_scope, read_frame, today
+from writer import submit
+
+_INSERT = '''INSERT INTO goals (employee_id, manager_id, description, set_date, status, author_id)
+             VALUES (?, ?, ?, ?, ?, ?)'''
+_BY_PAIR = "SELECT * FROM goals WHERE employee_id = ? AND manager_id = ?"
+_BY_MANAGER = "SELECT * FROM goals WHERE manager_id = ?"
+
+
+def save_goal(employee_id, manager_id, description, author_id=None):
+    # Queued on the writer; the Future resolves to the new goal id. The
+    # author defaults to the manager; employees setting their own goals
+    # pass their id, so the change feed tells the manager instead.
+    employee_id, manager_id = int(employee_id), int(manager_id)
+    author_id = manager_id if author_id is None else int(author_id)
+    params = (employee_id, manager_id, description, today(), 'Active', author_id)
+    return submit(lambda conn: conn.execute(_INSERT, params).lastrowid, ('goals', employee_id, manager_id))
+
+
+def _goal_scope(employee_id, role, manager_id):
+    return (employee_id, manager_id) if role == 'employee' else (None, manager_id)
+
+
+@cached_query('goals', _goal_scope)
+def get_goals(employee_id, role, manager_id):
+    # For employees, show goals assigned by their manager
+    # For managers, show goals they've assigned
+    if role == 'employee':
+        return read_frame(_BY_PAIR, (int(employee_id), int(manager_id)))
+    return read_frame(_BY_MANAGER, (int(manager_id),))
+
+
+@cached_query('goals', pair_scope)
+def get_goals_page(employee_id, role, manager_id, cursor=None, limit=PAGE_SIZE):
+    return id_page('goals', 'id, set_date, description, status', employee_id, role, manager_id, cursor, limit)
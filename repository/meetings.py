@@ -0,0 +1,113 @@
+from datetime import datetime
+
+from cache import cached_query
+from log import get_logger
+from repository.base import PAGE_SIZE, Record, id_page, pair_filter, pair_scope, read_connection, read_frame
+from writer import submit
+
+log = get_logger('repository.meetings')
+
+# starts_at/ends_at are stored as minute-resolution ISO text (migration 8)
+TIME_FORMAT = '%Y-%m-%d %H:%M'
+
+
+class Meeting(Record):
+    __slots__ = ('id', 'employee_id', 'manager_id', 'starts_at', 'ends_at', 'purpose')
+
+
+class MeetingConflict(ValueError):
+    """The new meeting overlaps one a participant already has."""
+
+    def __init__(self, meeting):
+        super().__init__(f"Overlaps the meeting from {meeting.starts_at} to {meeting.ends_at[11:]}")
+        self.meeting = meeting
+
+
+_INSERT = '''INSERT INTO meetings (employee_id, manager_id, meeting_date, starts_at, ends_at, purpose)
+             VALUES (?, ?, ?, ?, ?, ?)'''
+# A participant's last meeting, in one role, starting before the new one
+# ends. Their meetings never overlap, so only this one can clash; it is a
+# single seek on the (employee_id|manager_id, starts_at, ends_at) index.
+_PREVIOUS = tuple(f'''SELECT id, employee_id, manager_id, starts_at, ends_at, purpose FROM meetings
+                      WHERE {column} = ? AND starts_at < ? ORDER BY starts_at DESC LIMIT 1'''
+                  for column in ('employee_id', 'manager_id'))
+# Someone's meetings starting in [start, end), on either side of the table,
+# with the other participant's name; each half is an index range scan
+_CALENDAR = '''SELECT m.id, m.starts_at, m.ends_at, m.purpose, m.employee_id AS with_id, u.username AS with_name
+               FROM meetings m LEFT JOIN users u ON u.id = m.employee_id
+               WHERE m.manager_id = ? AND m.starts_at >= ? AND m.starts_at < ?
+               UNION ALL
+               SELECT m.id, m.starts_at, m.ends_at, m.purpose, m.manager_id AS with_id, u.username AS with_name
+               FROM meetings m LEFT JOIN users u ON u.id = m.manager_id
+               WHERE m.employee_id = ? AND m.starts_at >= ? AND m.starts_at < ?
+               ORDER BY starts_at'''
+
+
+def _timestamp(value):
+    return value.strftime(TIME_FORMAT) if isinstance(value, datetime) else str(value)
+
+
+def _find_conflict(conn, employee_id, manager_id, starts_at, ends_at):
+    for user_id in (employee_id, manager_id):
+        for query in _PREVIOUS:
+            row = conn.execute(query, (user_id, ends_at)).fetchone()
+            if row is not None and row[4] > starts_at:
+                return Meeting(*row)
+    return None
+
+
+def find_meeting_conflict(employee_id, manager_id, starts_at, ends_at):
+    """The meeting either participant already has overlapping
+    [starts_at, ends_at), or None."""
+    return _find_conflict(read_connection(), int(employee_id), int(manager_id),
+                          _timestamp(starts_at), _timestamp(ends_at))
+
+
+def schedule_meeting(employee_id, manager_id, starts_at, ends_at, purpose):
+    """Queue a meeting on the writer; the Future resolves to the new id.
+
+    The overlap check runs again on the writer thread, where writes are
+    serialized, so the Future fails with MeetingConflict if someone else
+    booked the slot since the form was shown.
+    """
+    employee_id, manager_id = int(employee_id), int(manager_id)
+    starts_at, ends_at = _timestamp(starts_at), _timestamp(ends_at)
+    if ends_at <= starts_at:
+        raise ValueError("A meeting must end after it starts")
+    params = (employee_id, manager_id, starts_at[:10], starts_at, ends_at, purpose)
+
+    def work(conn):
+        conflict = _find_conflict(conn, employee_id, manager_id, starts_at, ends_at)
+        if conflict is not None:
+            raise MeetingConflict(conflict)
+        return conn.execute(_INSERT, params).lastrowid
+    return submit(work, ('meetings', employee_id, manager_id),
+                  lambda meeting_id: log.info('meeting_scheduled', meeting_id=meeting_id,
+                                              employee_id=employee_id, manager_id=manager_id))
+
+
+@cached_query('meetings', pair_scope)
+def get_meetings(employee_id, role, manager_id):
+    # Employees see meetings with their manager; managers see meetings with
+    # one employee, or all of theirs when no employee is selected
+    where, params = pair_filter(employee_id, role, manager_id)
+    return read_frame(f"SELECT * FROM meetings WHERE {where}", params)
+
+
+# Legacy rows whose free-text meeting_date could not be parsed have no
+# starts_at; ``scheduled`` falls back to the text they were entered with
+_PAGE_COLUMNS = 'id, meeting_date, starts_at, ends_at, COALESCE(starts_at, meeting_date) AS scheduled, purpose'
+
+
+@cached_query('meetings', pair_scope)
+def get_meetings_page(employee_id, role, manager_id, cursor=None, limit=PAGE_SIZE):
+    return id_page('meetings', _PAGE_COLUMNS, employee_id, role, manager_id, cursor, limit)
+
+
+# Unscoped: the user may be either participant of a written meeting
+@cached_query('meetings')
+def get_calendar(user_id, start, end):
+    """Meetings of ``user_id`` starting on or after ``start`` and before
+    ``end`` (dates or timestamps), as either participant, in time order."""
+    user_id, start, end = int(user_id), _timestamp(start), _timestamp(end)
+    return read_frame(_CALENDAR, (user_id, start, end) * 2)
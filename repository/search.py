@@ -0,0 +1,110 @@
+import re
+
+import pandas as pd
+
+from backends import get_backend
+from migrations import SEARCH_TOKENS
+from repository.base import PAGE_SIZE, read_frame
+
+# Display names for the search_index.source values
+SOURCE_LABELS = {
+    'evaluations': 'Evaluation',
+    'feedback': 'Feedback',
+    'goals': 'Goal',
+    'self_evaluations': 'Self-evaluation',
+}
+
+# bm25 weights: body counts, scope tokens (present in every row a user can
+# see) do not. The UNINDEXED columns take a weight too but never match.
+_HITS = '''SELECT source, source_id, employee_id, date, rowid AS rank_id,
+                 snippet(search_index, 0, '**', '**', ' … ', 16) AS snippet,
+                 bm25(search_index, 1.0, 0.0) AS score
+          FROM search_index WHERE search_index MATCH ?'''
+_PAGE = '''SELECT h.source, h.source_id, h.employee_id, u.username AS employee, h.date, h.snippet
+           FROM ({hits} ORDER BY score, rank_id LIMIT ? OFFSET ?) h
+           LEFT JOIN users u ON u.id = h.employee_id
+           ORDER BY h.score, h.source, h.source_id'''
+# Managers review self-evaluations from their whole subtree, as on the
+# review tab, so those come from org_closure rather than the "m" token
+# (which names only the manager at the time of writing): the second MATCH
+# takes the rows with the self-evaluation token and keeps the subtree's.
+_SUBTREE = "SELECT descendant_id FROM org_closure WHERE ancestor_id = ? AND depth > 0"
+_SEARCH_BY = {
+    'employee': _PAGE.format(hits=_HITS),
+    'manager': _PAGE.format(hits=f'''{_HITS}
+                                     UNION ALL
+                                     {_HITS} AND employee_id IN ({_SUBTREE})'''),
+}
+_SELF = SEARCH_TOKENS['self_evaluations']
+# PostgreSQL: the same page over the tsvector column. Scope is a plain
+# column filter, with the same subtree rule for self-evaluations.
+_PG_SEARCH = '''SELECT h.source, h.source_id, h.employee_id, u.username AS employee, h.date,
+                    ts_headline('english', h.body, h.query,
+                                'StartSel=**, StopSel=**, MaxWords=16, MinWords=8') AS snippet
+             FROM (SELECT source, source_id, employee_id, date, body, query,
+                          ts_rank_cd(tsv, query) AS score
+                   FROM search_index, to_tsquery('english', ?) query
+                   WHERE tsv @@ query AND {scope}
+                   ORDER BY score DESC, id LIMIT ? OFFSET ?) h
+             LEFT JOIN users u ON u.id = h.employee_id
+             ORDER BY h.score DESC, h.source, h.source_id'''
+_PG_SEARCH_BY = {
+    'employee': _PG_SEARCH.format(scope='employee_id = ?'),
+    'manager': _PG_SEARCH.format(scope=f'''(manager_id = ? AND source <> 'self_evaluations'
+                                           OR source = 'self_evaluations' AND employee_id IN ({_SUBTREE}))'''),
+}
+_COLUMNS = ['source', 'source_id', 'employee_id', 'employee', 'date', 'snippet']
+
+
+def build_match(text, scope):
+    """Turn free text into an FTS5 query limited to rows whose scope tokens
+    match ``scope``, an FTS5 expression such as ``'"e1"'``.
+
+    Words are quoted so punctuation in the input can never be read as query
+    syntax; the last word is a prefix match. Returns None for empty input.
+    """
+    words = re.findall(r'\w+', text or '')
+    if not words:
+        return None
+    terms = ' '.join(f'"{w}"' for w in words) + '*'
+    return f'body : ({terms}) AND scope : ({scope})'
+
+
+def build_tsquery(text):
+    # PostgreSQL counterpart of build_match: every word, last one as prefix
+    words = re.findall(r'\w+', text or '')
+    if not words:
+        return None
+    return ' & '.join(words) + ':*'
+
+
+def search_page(text, role, user_id, cursor=None, limit=PAGE_SIZE):
+    """Ranked hits for ``text``, best first, as ``(DataFrame, cursor)``.
+
+    Employees find their own rows. Managers find the evaluations, feedback
+    and goals they wrote and the self-evaluations of everyone below them.
+
+    Ranking is by relevance, which has no stable key to seek on, so the
+    cursor is the row offset. Users rarely page deep into search results.
+    """
+    offset, user_id = (cursor[0] if cursor else 0), int(user_id)
+    if get_backend().name == 'postgres':
+        query = build_tsquery(text)
+        if role == 'employee':
+            sql, params = _PG_SEARCH_BY['employee'], (query, user_id)
+        else:
+            sql, params = _PG_SEARCH_BY['manager'], (query, user_id, user_id)
+    else:
+        if role == 'employee':
+            query = build_match(text, f'"e{user_id}"')
+            sql, params = _SEARCH_BY['employee'], (query,)
+        else:
+            query = build_match(text, f'"m{user_id}" NOT "{_SELF}"')
+            sql, params = _SEARCH_BY['manager'], (query, build_match(text, f'"{_SELF}"'), user_id)
+    params += (limit + 1, offset)
+    if query is None:
+        return pd.DataFrame(columns=_COLUMNS), None
+    df = read_frame(sql, params)
+    if len(df) <= limit:
+        return df, None
+    return df.iloc[:limit], (offset + limit,)
@@ -0,0 +1,62 @@
+from cache import cached_query
+from log import get_logger
+from repository.base import employee_or_manager_scope, id_chunks, read_connection, read_frame, today
+from writer import submit
+
+log = get_logger('repository.self_evaluations')
+
+_INSERT = '''INSERT INTO self_evaluations (employee_id, comments, submission_date, status)
+             VALUES (?, ?, ?, ?)'''
+_BY_EMPLOYEE = "SELECT * FROM self_evaluations WHERE employee_id = ?"
+# Managers review self-evaluations from their whole subtree, so a director
+# sees the ones under their managers too
+_BY_MANAGER = '''SELECT * FROM self_evaluations
+                 WHERE employee_id IN (SELECT descendant_id FROM org_closure WHERE ancestor_id = ? AND depth > 0)'''
+_UPDATE_STATUS = "UPDATE self_evaluations SET status = ? WHERE id = ?"
+_OWNER = "SELECT employee_id FROM self_evaluations WHERE id = ?"
+# Only moves rows from the manager's subtree that are still in the expected
+# status, and hands back the ids it moved; the subtree check is a
+# primary-key probe of org_closure
+_UPDATE_IN_SUBTREE = '''UPDATE self_evaluations SET status = ? WHERE id IN ({ids}) AND status = ?
+                        AND EXISTS (SELECT 1 FROM org_closure WHERE ancestor_id = ? AND depth > 0
+                                    AND descendant_id = self_evaluations.employee_id)
+                        RETURNING id'''
+
+
+def save_self_evaluation(employee_id, comments):
+    employee_id = int(employee_id)
+    params = (employee_id, comments, today(), 'Pending')
+    return submit(lambda conn: conn.execute(_INSERT, params).lastrowid, ('self_evaluations', employee_id, None))
+
+
+@cached_query('self_evaluations', employee_or_manager_scope)
+def get_self_evaluations(employee_id, role, user_id):
+    if role == 'employee':
+        return read_frame(_BY_EMPLOYEE, (int(employee_id),))
+    return read_frame(_BY_MANAGER, (int(user_id),))
+
+
+def update_self_evaluation_status(evaluation_id, status):
+    evaluation_id = int(evaluation_id)
+    owner = read_connection().execute(_OWNER, (evaluation_id,)).fetchone()
+    return submit(lambda conn: conn.execute(_UPDATE_STATUS, (status, evaluation_id)).rowcount,
+                  ('self_evaluations', owner[0], None) if owner else None)
+
+
+def update_self_evaluation_statuses(evaluation_ids, status, manager_id, from_status='Pending'):
+    """Move many self-evaluations under ``manager_id`` from ``from_status``
+    to ``status`` in one queued transaction. The Future resolves to the ids
+    that changed; like update_evaluation_statuses, others are left alone."""
+    evaluation_ids, manager_id = [int(i) for i in evaluation_ids], int(manager_id)
+
+    def work(conn):
+        updated = []
+        for chunk, placeholders in id_chunks(evaluation_ids):
+            cursor = conn.execute(_UPDATE_IN_SUBTREE.format(ids=placeholders),
+                                  (status, *chunk, from_status, manager_id))
+            updated += [row[0] for row in cursor.fetchall()]
+        return updated
+    # Rows from many employees: evict every cached self-evaluation read
+    return submit(work, ('self_evaluations', None, None),
+                  lambda updated: log.info('self_evaluation_statuses_updated', status=status, manager_id=manager_id,
+                                           requested=len(evaluation_ids), updated=len(updated)))
@@ -0,0 +1,30 @@
+from cache import cached_query
+from log import get_logger
+from repository.base import PAGE_SIZE, id_page, pair_filter, pair_scope, read_frame, today
+from writer import submit
+
+log = get_logger('repository.training')
+
+_INSERT = "INSERT INTO training (employee_id, manager_id, program, date) VALUES (?, ?, ?, ?)"
+
+
+def save_training(employee_id, manager_id, program):
+    # Queued on the writer; the Future resolves to the new training id
+    employee_id, manager_id = int(employee_id), int(manager_id)
+    params = (employee_id, manager_id, program, today())
+    return submit(lambda conn: conn.execute(_INSERT, params).lastrowid, ('training', employee_id, manager_id),
+                  lambda training_id: log.info('training_saved', training_id=training_id,
+                                               employee_id=employee_id, manager_id=manager_id))
+
+
+@cached_query('training', pair_scope)
+def get_training(employee_id, role, manager_id):
+    # Employees see training from their manager; managers see what they
+    # recommended to one employee, or everything when none is selected
+    where, params = pair_filter(employee_id, role, manager_id)
+    return read_frame(f"SELECT * FROM training WHERE {where}", params)
+
+
+@cached_query('training', pair_scope)
+def get_training_page(employee_id, role, manager_id, cursor=None, limit=PAGE_SIZE):
+    return id_page('training', 'id, date, program', employee_id, role, manager_id, cursor, limit)
@@ -0,0 +1,70 @@
+from cache import cached_query, query_cache
+from db import IntegrityError, get_connection
+from log import get_logger
+from repository.base import Record, fetch_record, fetch_records
+
+log = get_logger('repository.users')
+
+
+class User(Record):
+    # Unpacks as (id, role, manager_id), the shape the session state expects
+    __slots__ = ('id', 'role', 'manager_id')
+
+
+class UserRef(Record):
+    __slots__ = ('id', 'username')
+
+
+class Report(Record):
+    # Someone in a manager's subtree; depth 1 is a direct report
+    __slots__ = ('id', 'username', 'role', 'manager_id', 'depth')
+
+
+_INSERT = 'INSERT INTO users (username, password, role, manager_id) VALUES (?, ?, ?, ?)'
+_AUTHENTICATE = "SELECT id, role, manager_id FROM users WHERE username = ? AND password = ?"
+_TEAM = "SELECT id, username FROM users WHERE manager_id = ? AND role = 'employee' ORDER BY username"
+_MANAGERS = "SELECT id, username FROM users WHERE role = 'manager' ORDER BY username"
+# Range scan of the org_closure primary key, whatever the depth
+_ALL_REPORTS = '''SELECT u.id, u.username, u.role, u.manager_id, c.depth
+                  FROM org_closure c JOIN users u ON u.id = c.descendant_id
+                  WHERE c.ancestor_id = ? AND c.depth > 0
+                  ORDER BY c.depth, u.username'''
+
+
+def register_user(username, password, role, manager_id=None):
+    # For employees, manager_id is required
+    if role == 'employee' and manager_id is None:
+        log.warning('registration_rejected', username=username, reason='missing manager_id')
+        return False
+    conn = get_connection()
+    try:
+        with conn:
+            conn.execute(_INSERT, (username, password, role, manager_id))
+    except IntegrityError as e:
+        log.warning('registration_failed', username=username, error=str(e))
+        return False
+    query_cache.invalidate('users', manager_id=manager_id)
+    log.info('user_registered', username=username, role=role, manager_id=manager_id)
+    return True
+
+
+def authenticate_user(username, password):
+    return fetch_record(User, _AUTHENTICATE, (username, password))
+
+
+@cached_query('users', lambda manager_id: (None, manager_id))
+def get_team_employees(manager_id):
+    # manager_id here is the actual ID of the manager, not their username
+    return fetch_records(UserRef, _TEAM, (int(manager_id),))
+
+
+@cached_query('users')
+def get_managers():
+    return fetch_records(UserRef, _MANAGERS)
+
+
+@cached_query('users')
+def get_all_reports(manager_id):
+    # Everyone under manager_id, nearest first; get_team_employees is the
+    # direct employees only
+    return fetch_records(Report, _ALL_REPORTS, (int(manager_id),))
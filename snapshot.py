@@ -0,0 +1,160 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from cache import query_cache
+from db import ConnectionPool, backend
+from log import get_logger
+from metrics import connection_factory
+
+# Reporting queries read a copy of the database taken with SQLite's online
+# backup API instead of the live file. A long roll-up on the live file
+# pins its WAL snapshot, so checkpoints cannot finish and the WAL grows
+# under the writer for as long as the report runs; on the copy it touches
+# nothing the writer uses. The copy is replaced every SNAPSHOT_INTERVAL
+# seconds, and 0 turns snapshots off. Other backends have no file to copy
+# and always read live.
+SNAPSHOT_INTERVAL = float(os.environ.get('PERF_SNAPSHOT_INTERVAL', '300'))
+SNAPSHOT_PATH = os.environ.get('PERF_SNAPSHOT_PATH')
+# Wait before trying again after a failed refresh
+RETRY_SECONDS = 30.0
+
+# The copy is never written once in place, so readers skip locking
+# entirely; temp tables and sorts stay in memory.
+READ_PRAGMAS = (
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA mmap_size = 134217728",
+)
+
+log = get_logger('snapshot')
+
+
+class SnapshotStore:
+    """A read-only copy of the SQLite database for analytics.
+
+    ``refresh`` backs the live database up into a temporary file, renames
+    it over the snapshot and points new reads at it. Connections to the
+    previous copy are closed at the following refresh, once no render can
+    still be using them. A background thread refreshes whenever the copy
+    is older than ``interval``; until the first copy exists ``connection``
+    returns None and callers read the live database.
+    """
+
+    def __init__(self, backend, path=None, interval=SNAPSHOT_INTERVAL):
+        self.backend = backend
+        self.interval = interval
+        self.enabled = backend.name == 'sqlite' and interval > 0
+        self.path = path or (f'{backend.path}.analytics' if self.enabled else None)
+        self.taken_at = None
+        self.refreshes = 0
+        self._pool = None
+        self._retired = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._thread = None
+
+    def _connect(self):
+        uri = Path(self.path).resolve().as_uri() + '?mode=ro&immutable=1'
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False, cached_statements=256,
+                               factory=connection_factory())
+        for pragma in READ_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _publish(self, taken_at):
+        pool = ConnectionPool(self._connect, self.backend.max_idle)
+        with self._lock:
+            retired, self._retired = self._retired, self._pool
+            self._pool, self.taken_at = pool, taken_at
+        if retired is not None:
+            retired.close_all()
+        # Cached analytics were read from the previous copy
+        query_cache.invalidate('evaluations')
+
+    def refresh(self):
+        """Copy the live database into a new snapshot and switch reads to it.
+        Returns the seconds the copy took."""
+        with self._refresh_lock:
+            started = time.perf_counter()
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp = tempfile.mkstemp(dir=directory, prefix='.snapshot-', suffix='.tmp')
+            os.close(fd)
+            try:
+                source = self.backend.connect()
+                target = sqlite3.connect(tmp)
+                try:
+                    # One step, so the copy is a single consistent read; under
+                    # WAL it does not block the writer
+                    source.backup(target)
+                    # Readers open the copy immutable, which needs a rollback
+                    # journal header rather than WAL
+                    target.execute('PRAGMA journal_mode = DELETE')
+                finally:
+                    target.close()
+                    source.close()
+                os.replace(tmp, self.path)
+            except BaseException:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                raise
+            self._publish(time.time())
+            self.refreshes += 1
+            seconds = time.perf_counter() - started
+            log.info('snapshot_refreshed', path=self.path, ms=round(seconds * 1000, 1),
+                     bytes=os.path.getsize(self.path))
+            return seconds
+
+    def _adopt(self):
+        # A copy left by an earlier process (or the API server) is reused
+        # while it is still fresh, so a restart does not copy again
+        try:
+            taken_at = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if time.time() - taken_at < self.interval:
+            self._publish(taken_at)
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._loop, name='perf-snapshot', daemon=True)
+        self._adopt()
+        self._thread.start()
+
+    def _loop(self):
+        while True:
+            age = self.age()
+            if age is not None and age < self.interval:
+                time.sleep(self.interval - age)
+                continue
+            try:
+                self.refresh()
+            except Exception:
+                log.exception('snapshot_refresh_failed', path=self.path)
+                time.sleep(min(self.interval, RETRY_SECONDS))
+
+    def connection(self):
+        """A connection to the current snapshot, or None when reads should
+        go to the live database."""
+        if not self.enabled:
+            return None
+        self._ensure_started()
+        pool = self._pool
+        return pool.get() if pool is not None else None
+
+    def age(self):
+        """Seconds since the current snapshot was taken, or None."""
+        taken_at = self.taken_at
+        return None if taken_at is None else max(0.0, time.time() - taken_at)
+
+
+snapshots = SnapshotStore(backend, SNAPSHOT_PATH)
+
+
+def snapshot_connection():
+    return snapshots.connection()
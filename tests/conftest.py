@@ -0,0 +1,85 @@
+import os
+import sys
+import uuid
+from urllib.parse import quote
+
+import pytest
+
+# Snapshots copy the SQLite file in a background thread; tests read live
+os.environ['PERF_SNAPSHOT_INTERVAL'] = '0'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analytics  # noqa: E402
+import backends  # noqa: E402
+import blobstore  # noqa: E402
+import db  # noqa: E402
+import repository.users  # noqa: E402
+import writer  # noqa: E402
+from cache import query_cache  # noqa: E402
+from migrations import migrate, seed_sample_data  # noqa: E402
+
+# The PostgreSQL half of the suite runs against PERF_DB_URL, each test in a
+# schema of its own that is dropped afterwards
+POSTGRES_URL = os.environ.get('PERF_DB_URL')
+
+BACKENDS = [
+    'sqlite',
+    pytest.param('postgres', marks=pytest.mark.skipif(not POSTGRES_URL, reason="PERF_DB_URL is not set")),
+]
+
+
+def _schema_url(url, schema):
+    # libpq passes options= to the server, which sets search_path for every
+    # connection the backend opens
+    separator = '&' if '?' in url else '?'
+    return f"{url}{separator}options={quote(f'-csearch_path={schema}')}"
+
+
+def _admin(statement):
+    import psycopg2
+    conn = psycopg2.connect(POSTGRES_URL)
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(statement)
+    finally:
+        conn.close()
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request, tmp_path, monkeypatch):
+    """A migrated, seeded database on each backend.
+
+    The app picks its backend once per process, so the fixture points the
+    process-wide backend, connection pool and writer at a fresh one for the
+    length of the test.
+    """
+    schema = None
+    if request.param == 'postgres':
+        schema = f'perf_test_{uuid.uuid4().hex[:12]}'
+        _admin(f'CREATE SCHEMA {schema}')
+        settings = {'backend': 'postgres', 'url': _schema_url(POSTGRES_URL, schema)}
+    else:
+        settings = {'backend': 'sqlite', 'path': str(tmp_path / 'performance.db')}
+    current = backends.create_backend(settings)
+    pool = db.ConnectionPool(current.connect, current.max_idle)
+    queue = writer.WriteQueue(current)
+    monkeypatch.setattr(backends, '_backend', current)
+    monkeypatch.setattr(db, 'backend', current)
+    monkeypatch.setattr(db, '_pool', pool)
+    monkeypatch.setattr(writer, 'write_queue', queue)
+    monkeypatch.setattr(repository.users, 'IntegrityError', current.IntegrityError)
+    monkeypatch.setattr(blobstore, 'BLOB_DIR', str(tmp_path / 'blobs'))
+    monkeypatch.setitem(analytics._RAW_BUCKETS, 'week', current.week_bucket.format(column='review_date'))
+    query_cache.clear()
+    conn = pool.get()
+    migrate(conn)
+    seed_sample_data(conn)
+    try:
+        yield current
+    finally:
+        queue.stop()
+        pool.close_all()
+        query_cache.clear()
+        if schema is not None:
+            _admin(f'DROP SCHEMA {schema} CASCADE')
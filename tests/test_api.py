@@ -0,0 +1,112 @@
+import base64
+import gzip
+import http.client
+import json
+
+import pytest
+
+from api import (EVALUATION_CURSOR, GET_ROUTES, GZIP_MIN_BYTES, ID_CURSOR, ApiError, decode_cursor, encode_cursor,
+                 start_api_server)
+from repository import authenticate_user, save_evaluation, save_feedback
+
+MALFORMED = [
+    'not base64!',
+    encode_cursor(['2030-01-01', 5]),
+    encode_cursor([5, 6]),
+    encode_cursor([True]),
+    encode_cursor(['5']),
+    encode_cursor([]),
+    encode_cursor([5.5]),
+]
+
+
+@pytest.mark.parametrize('text', MALFORMED)
+def test_id_cursor_rejects_malformed(text):
+    with pytest.raises(ApiError) as raised:
+        decode_cursor(text, ID_CURSOR)
+    assert raised.value.status == 400
+
+
+@pytest.mark.parametrize('values', [[5], ['2030-01-01'], [5, '2030-01-01'], ['2030-01-01', 5, 6], [None, 5]])
+def test_evaluation_cursor_rejects_malformed(values):
+    with pytest.raises(ApiError):
+        decode_cursor(encode_cursor(values), EVALUATION_CURSOR)
+
+
+def test_cursors_round_trip():
+    assert decode_cursor(encode_cursor((7,)), ID_CURSOR) == (7,)
+    assert decode_cursor(encode_cursor(('2030-01-01', 7)), EVALUATION_CURSOR) == ('2030-01-01', 7)
+    assert decode_cursor(None, ID_CURSOR) is None
+
+
+def test_pages_follow_cursors(backend):
+    manager = authenticate_user('mgr1', 'pass123')
+    for i in range(3):
+        save_evaluation(1, manager.id, 3, 3, 3, 3, f'Review {i}').result()
+        save_feedback(1, manager.id, f'Note {i}').result()
+    for path in ('/api/evaluations', '/api/feedback'):
+        status, page = GET_ROUTES[path](manager, {'limit': '2'})
+        assert status == 200 and len(page['items']) == 2
+        _, rest = GET_ROUTES[path](manager, {'limit': '2', 'cursor': page['next_cursor']})
+        assert len(rest['items']) == 1 and rest['next_cursor'] is None
+    # An evaluations cursor is the wrong shape for an id-keyed page
+    evaluations_cursor = GET_ROUTES['/api/evaluations'](manager, {'limit': '1'})[1]['next_cursor']
+    with pytest.raises(ApiError):
+        GET_ROUTES['/api/feedback'](manager, {'cursor': evaluations_cursor})
+
+
+@pytest.fixture
+def api(backend):
+    # The real server on a free port; requests authenticate as mgr1
+    server = start_api_server(0)
+    auth = 'Basic ' + base64.b64encode(b'mgr1:pass123').decode()
+
+    def get(path, **headers):
+        conn = http.client.HTTPConnection(*server.server_address)
+        try:
+            conn.request('GET', path, headers={'Authorization': auth, **headers})
+            response = conn.getresponse()
+            return response.status, response, response.read()
+        finally:
+            conn.close()
+    try:
+        yield get
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_etag_answers_304_until_the_data_changes(api):
+    status, response, body = api('/api/evaluations')
+    etag = response.getheader('ETag')
+    assert status == 200 and etag.startswith('W/"')
+    status, response, body = api('/api/evaluations', **{'If-None-Match': etag})
+    assert (status, body) == (304, b'')
+    assert response.getheader('ETag') == etag
+    save_evaluation(1, 2, 4, 4, 4, 4, 'New').result()
+    status, response, _ = api('/api/evaluations', **{'If-None-Match': etag})
+    assert status == 200 and response.getheader('ETag') != etag
+
+
+def test_last_modified_answers_if_modified_since(api):
+    _, response, _ = api('/api/evaluations')
+    last_modified = response.getheader('Last-Modified')
+    assert api('/api/evaluations', **{'If-Modified-Since': last_modified})[0] == 304
+    assert api('/api/evaluations', **{'If-Modified-Since': 'Mon, 01 Jan 2001 00:00:00 GMT'})[0] == 200
+    assert api('/api/evaluations', **{'If-Modified-Since': 'yesterday'})[0] == 200
+    # If-None-Match wins when both are sent
+    assert api('/api/evaluations', **{'If-Modified-Since': last_modified, 'If-None-Match': '"other"'})[0] == 200
+
+
+def test_large_responses_are_gzipped(api):
+    for i in range(10):
+        save_evaluation(1, 2, 3, 3, 3, 3, f'Review {i} ' + 'x' * 200).result()
+    _, plain, body = api('/api/evaluations')
+    assert len(body) >= GZIP_MIN_BYTES and plain.getheader('Content-Encoding') is None
+    status, response, compressed = api('/api/evaluations', **{'Accept-Encoding': 'gzip'})
+    assert status == 200 and response.getheader('Content-Encoding') == 'gzip'
+    assert int(response.getheader('Content-Length')) == len(compressed) < len(body)
+    assert json.loads(gzip.decompress(compressed)) == json.loads(body)
+    # Small bodies go out as they are
+    _, response, _ = api('/api/me', **{'Accept-Encoding': 'gzip'})
+    assert response.getheader('Content-Encoding') is None
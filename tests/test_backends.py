@@ -0,0 +1,266 @@
+import io
+import itertools
+import threading
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+from analytics import get_employee_stats, get_score_summary, get_score_trend
+from bulk import SPOOL_MAX_MEMORY, import_evaluations, iter_export, read_spool, spool_export, validate_evaluations
+from db import get_connection
+from migrations import LATEST_VERSION, get_schema_version, migrate, seed_sample_data
+from repository import (MeetingConflict, authenticate_user, get_all_reports, get_document, get_documents,
+                        get_draft_evaluations, get_evaluations, get_feedback, get_goals, get_meetings, get_new_changes, get_self_evaluations,
+                        get_team_employees, get_training, get_unread_counts, mark_changes_seen, read_document,
+                        register_user, save_document, save_evaluation, save_feedback, save_goal, save_self_evaluation,
+                        save_training, schedule_meeting, search_page, update_evaluation_status,
+                        update_evaluation_statuses, update_self_evaluation_statuses)
+from writer import submit, write_session
+
+# The seeded accounts: emp1 reports to mgr1
+EMPLOYEE, MANAGER = 1, 2
+
+
+def _upload(name, content):
+    uploaded = io.BytesIO(content)
+    uploaded.name = name
+    return uploaded
+
+
+def test_migrate_and_seed_are_idempotent(backend):
+    conn = get_connection()
+    assert get_schema_version(conn) == LATEST_VERSION
+    assert migrate(conn) == []
+    assert seed_sample_data(conn) == 0
+    user = authenticate_user('emp1', 'pass123')
+    assert (user.id, user.role, user.manager_id) == (EMPLOYEE, 'employee', MANAGER)
+    assert authenticate_user('emp1', 'wrong') is None
+
+
+def test_register_user(backend):
+    assert register_user('emp2', 'secret', 'employee', MANAGER)
+    assert not register_user('emp2', 'other', 'employee', MANAGER)
+    assert not register_user('emp3', 'secret', 'employee')
+    assert sorted(member.username for member in get_team_employees(MANAGER)) == ['emp1', 'emp2']
+    assert {report.username: report.depth for report in get_all_reports(MANAGER)} == {'emp1': 1, 'emp2': 1}
+
+
+_SLOTS = itertools.count()
+
+
+def _schedule():
+    # A fresh hour each call, so repeated saves never overlap
+    start = datetime(2030, 1, 7, 9) + timedelta(hours=next(_SLOTS))
+    return schedule_meeting(EMPLOYEE, MANAGER, start, start + timedelta(minutes=30), '1:1')
+
+
+SAVES = {
+    'evaluations': (lambda: save_evaluation(EMPLOYEE, MANAGER, 4, 3, 5, 4, 'Solid quarter'),
+                    lambda: get_evaluations(EMPLOYEE, 'employee', EMPLOYEE)),
+    'goals': (lambda: save_goal(EMPLOYEE, MANAGER, 'Ship the release'),
+              lambda: get_goals(EMPLOYEE, 'employee', MANAGER)),
+    'feedback': (lambda: save_feedback(EMPLOYEE, MANAGER, 'Great demo'),
+                 lambda: get_feedback(EMPLOYEE, 'employee', MANAGER)),
+    'training': (lambda: save_training(EMPLOYEE, MANAGER, 'Advanced SQL'),
+                 lambda: get_training(EMPLOYEE, 'employee', MANAGER)),
+    'self_evaluations': (lambda: save_self_evaluation(EMPLOYEE, 'I met my targets'),
+                         lambda: get_self_evaluations(EMPLOYEE, 'employee', EMPLOYEE)),
+    'meetings': (_schedule, lambda: get_meetings(EMPLOYEE, 'employee', MANAGER)),
+}
+
+
+@pytest.mark.parametrize('table', list(SAVES))
+def test_save_returns_id_and_reads_back(backend, table):
+    save, get = SAVES[table]
+    first, second = save().result(), save().result()
+    assert isinstance(first, int) and second > first
+    assert set(get()['id']) == {first, second}
+
+
+def test_cached_reads_wait_for_the_sessions_writes(backend):
+    # Hold the writer so a save stays queued while another session caches
+    # the table without it
+    release = threading.Event()
+    with write_session('blocker'):
+        submit(lambda conn: release.wait(5), None)
+    with write_session('author'):
+        save_feedback(EMPLOYEE, MANAGER, 'Queued note')
+    with write_session('reader'):
+        assert get_feedback(EMPLOYEE, 'employee', MANAGER).empty
+    threading.Timer(0.2, release.set).start()
+    with write_session('author'):
+        assert get_feedback(EMPLOYEE, 'employee', MANAGER)['message'].tolist() == ['Queued note']
+
+
+def test_meeting_conflicts(backend):
+    schedule_meeting(EMPLOYEE, MANAGER, '2030-01-07 09:00', '2030-01-07 10:00', 'Planning').result()
+    with pytest.raises(MeetingConflict):
+        schedule_meeting(EMPLOYEE, MANAGER, '2030-01-07 09:30', '2030-01-07 10:30', 'Overlap').result()
+    # Back to back is not an overlap
+    assert schedule_meeting(EMPLOYEE, MANAGER, '2030-01-07 10:00', '2030-01-07 10:30', 'Next').result()
+
+
+def test_stats_triggers(backend):
+    first = save_evaluation(EMPLOYEE, MANAGER, 4, 2, 5, 3, 'One').result()
+    save_evaluation(EMPLOYEE, MANAGER, 2, 4, 3, 5, 'Two').result()
+    summary = get_score_summary(MANAGER, EMPLOYEE)
+    assert summary['eval_count'] == 2
+    assert [summary[m] for m in ('quality', 'punctuality', 'teamwork', 'targets')] == [3, 3, 4, 4]
+    assert get_employee_stats(MANAGER).loc[0, 'final_count'] == 0
+
+    update_evaluation_status(first, 'Final').result()
+    stats = get_employee_stats(MANAGER)
+    assert (stats.loc[0, 'eval_count'], stats.loc[0, 'final_count']) == (2, 1)
+    for bucket in ('month', 'week', 'day'):
+        trend = get_score_trend(MANAGER, EMPLOYEE, bucket)
+        assert trend['eval_count'].tolist() == [2]
+
+
+def test_batch_status_update_is_guarded(backend):
+    ids = [save_evaluation(EMPLOYEE, MANAGER, 3, 3, 3, 3, '').result() for _ in range(3)]
+    update_evaluation_status(ids[0], 'Final').result()
+    # Only drafts owned by the manager change, and only those are returned
+    assert sorted(update_evaluation_statuses(ids, 'Final', MANAGER).result()) == ids[1:]
+    assert update_evaluation_statuses(ids, 'Final', MANAGER + 1).result() == []
+
+
+def test_batch_status_update_spans_chunks(backend):
+    # Unknown ids push the real ones past the first IN (...) list
+    ids = [save_self_evaluation(EMPLOYEE, 'Update').result() for _ in range(2)]
+    padded = list(range(10 ** 6, 10 ** 6 + 600)) + ids
+    assert update_self_evaluation_statuses(padded, 'Approved', EMPLOYEE).result() == []
+    assert sorted(update_self_evaluation_statuses(padded, 'Approved', MANAGER).result()) == ids
+    assert set(get_self_evaluations(EMPLOYEE, 'employee', EMPLOYEE)['status']) == {'Approved'}
+
+
+def _upload_frame(*rows):
+    return pd.DataFrame(rows, columns=['employee', 'quality', 'punctuality', 'teamwork', 'targets', 'comments',
+                                       'review_date'])
+
+
+def test_bulk_validation_reports_each_bad_row(backend):
+    team = get_team_employees(MANAGER)
+    rows, errors = validate_evaluations(_upload_frame(
+        ['emp1', '4', '3', '5', '4', 'Fine', '2030-01-07'],
+        ['nobody', '4', '3', '5', '4', None, None],
+        ['emp1', '6', 'x', '5', '4', '', 'not a date'],
+    ), team)
+    assert rows == []
+    assert errors == [
+        "Row 3: unknown employee 'nobody'",
+        "Row 4: quality must be a number from 0 to 5; punctuality must be a number from 0 to 5; "
+        "review_date is not a date",
+    ]
+    assert validate_evaluations(pd.DataFrame({'employee': ['emp1']}), team) == (
+        [], ["Missing column(s): quality, punctuality, teamwork, targets"])
+
+
+def test_bulk_import_creates_drafts(backend):
+    rows, errors = validate_evaluations(_upload_frame(
+        ['emp1', '4', '3', '5', '4', 'By name', '2030-01-07'],
+        [str(EMPLOYEE), '2.5', '3', '3', '3', None, None],
+    ), get_team_employees(MANAGER))
+    assert errors == []
+    assert import_evaluations(MANAGER, rows, batch_size=1) == 2
+    drafts = get_draft_evaluations(MANAGER).sort_values('id')
+    assert drafts['comments'].tolist() == ['By name', '']
+    assert drafts['quality'].tolist() == [4.0, 2.5]
+    assert set(drafts['status']) == {'Draft'}
+
+
+def test_bulk_export_round_trips(backend):
+    save_evaluation(EMPLOYEE, MANAGER, 4, 3, 5, 4, 'Commas, "quotes" and more').result()
+    save_evaluation(EMPLOYEE, MANAGER, 1, 2, 3, 4, '').result()
+    exported = pd.read_csv(io.BytesIO(b''.join(iter_export('evaluations', MANAGER, chunk_size=1))), dtype=str)
+    assert exported['employee'].tolist() == ['emp1', 'emp1']
+    # An export is a valid upload, and importing it copies the evaluations
+    rows, errors = validate_evaluations(exported, get_team_employees(MANAGER))
+    assert errors == []
+    import_evaluations(MANAGER, rows)
+    evaluations = get_evaluations(EMPLOYEE, 'employee', EMPLOYEE).sort_values('id')
+    columns = ['quality', 'punctuality', 'teamwork', 'targets', 'review_date']
+    assert evaluations[columns].iloc[2:].values.tolist() == evaluations[columns].iloc[:2].values.tolist()
+    assert evaluations['comments'].fillna('').tolist()[2:] == ['Commas, "quotes" and more', '']
+
+
+def test_spool_export_moves_to_disk(backend):
+    comment = 'x' * 200
+    rows = [(EMPLOYEE, 3.0, 3.0, 3.0, 3.0, comment, '2030-01-07')] * (SPOOL_MAX_MEMORY // len(comment) + 1)
+    import_evaluations(MANAGER, rows)
+    spool = spool_export('evaluations', MANAGER)
+    try:
+        assert spool._rolled
+        data = read_spool(spool)
+        assert len(data) > SPOOL_MAX_MEMORY
+        assert data == b''.join(iter_export('evaluations', MANAGER))
+        # Every download reads the whole export again
+        assert read_spool(spool) == data
+    finally:
+        spool.close()
+
+
+def test_search_page(backend):
+    register_user('emp2', 'secret', 'employee', MANAGER)
+    save_feedback(EMPLOYEE, MANAGER, 'Met every deadline this sprint').result()
+    save_goal(EMPLOYEE, MANAGER, 'Improve teamwork with design').result()
+    hits, _ = search_page('deadline', 'employee', EMPLOYEE)
+    assert hits['source'].tolist() == ['feedback']
+    hits, _ = search_page('teamwork', 'manager', MANAGER)
+    assert hits['source'].tolist() == ['goals']
+    other = authenticate_user('emp2', 'secret')
+    assert search_page('deadline', 'employee', other.id)[0].empty
+
+
+def test_search_reaches_self_evaluations_across_the_subtree(backend):
+    # mgr1 -> lead -> emp2, as on the self-evaluation review tab
+    register_user('lead', 'secret', 'manager', MANAGER)
+    lead = authenticate_user('lead', 'secret')
+    register_user('emp2', 'secret', 'employee', lead.id)
+    emp2 = authenticate_user('emp2', 'secret')
+    save_self_evaluation(emp2.id, 'Mentored the interns').result()
+    save_feedback(emp2.id, lead.id, 'Mentoring is paying off').result()
+    hits, _ = search_page('mentor', 'manager', MANAGER)
+    assert hits['source'].tolist() == ['self_evaluations']
+    hits, _ = search_page('mentor', 'manager', lead.id)
+    assert sorted(hits['source']) == ['feedback', 'self_evaluations']
+
+
+def test_documents_on_conflict(backend):
+    assert save_document(EMPLOYEE, _upload('notes.txt', b'first draft'))
+    # Same content again is a no-op, whatever the file is called
+    assert not save_document(EMPLOYEE, _upload('copy.txt', b'first draft'))
+    assert save_document(EMPLOYEE, _upload('notes.txt', b'second draft'))
+    documents = get_documents(EMPLOYEE)
+    assert documents['filename'].tolist() == ['notes.txt', 'notes.txt']
+    document = get_document(EMPLOYEE, int(documents['id'].iloc[-1]))
+    assert (document.size, document.mime) == (len(b'first draft'), 'text/plain')
+    assert read_document(document) == b'first draft'
+    assert get_document(MANAGER, document.id) is None
+
+
+def test_change_feed(backend):
+    save_feedback(EMPLOYEE, MANAGER, 'Nice work').result()
+    save_self_evaluation(EMPLOYEE, 'Good month').result()
+    assert get_unread_counts(EMPLOYEE) == {'feedback': 1}
+    assert get_unread_counts(MANAGER) == {'self_evaluations': 1}
+    changes, _ = get_new_changes(EMPLOYEE)
+    assert mark_changes_seen(EMPLOYEE, changes['id'].max()).result() == 1
+    assert get_unread_counts(EMPLOYEE) == {}
+
+
+def test_change_feed_by_source(backend):
+    save_goal(EMPLOYEE, MANAGER, 'Learn Rust', author_id=EMPLOYEE).result()
+    save_self_evaluation(EMPLOYEE, 'Good month').result()
+    goals, _ = get_new_changes(MANAGER, source='goals')
+    assert goals['summary'].tolist() == ['Learn Rust']
+    assert mark_changes_seen(MANAGER, goals['id'].max(), source='goals').result() == 1
+    assert get_unread_counts(MANAGER) == {'self_evaluations': 1}
+
+
+def test_schedule_meeting_accepts_datetimes(backend):
+    start = datetime(2030, 2, 1, 14, 0)
+    meeting_id = schedule_meeting(EMPLOYEE, MANAGER, start, start + timedelta(minutes=45), 'Review').result()
+    row = get_meetings(EMPLOYEE, 'employee', MANAGER).set_index('id').loc[meeting_id]
+    assert (row['starts_at'], row['ends_at'], row['meeting_date']) == ('2030-02-01 14:00', '2030-02-01 14:45',
+                                                                       '2030-02-01')
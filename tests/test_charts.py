@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from charts import lttb, trend_figure
+
+
+@pytest.mark.parametrize('n, threshold', [(1000, 100), (1000, 3), (101, 100), (5000, 500)])
+def test_lttb_keeps_the_ends_and_exactly_threshold_points(n, threshold):
+    x = np.arange(n, dtype=float)
+    y = np.random.default_rng(n).normal(size=n)
+    keep = lttb(x, y, threshold)
+    assert len(keep) == threshold
+    assert (keep[0], keep[-1]) == (0, n - 1)
+    assert (np.diff(keep) > 0).all()
+
+
+def test_lttb_keeps_spikes():
+    y = np.zeros(1000)
+    y[437] = 10.0
+    assert 437 in lttb(np.arange(1000), y, 50)
+
+
+@pytest.mark.parametrize('threshold', [2, 10, 20])
+def test_lttb_returns_everything_it_cannot_reduce(threshold):
+    assert lttb(np.arange(10), np.arange(10), threshold).tolist() == list(range(10))
+
+
+def test_trend_figure_downsamples_each_series():
+    days = pd.date_range('2020-01-01', periods=2000).strftime('%Y-%m-%d')
+    df = pd.DataFrame({'day': days, 'quality': np.sin(np.arange(2000) / 50)})
+    figure = trend_figure(df, 'day', ['quality'], "Quality", "Day", "Score", max_points=200)
+    assert [len(trace.x) for trace in figure.data] == [200]
@@ -0,0 +1,66 @@
+import sqlite3
+import time
+
+import pytest
+
+from db import get_connection
+from repository import save_evaluation
+from snapshot import SnapshotStore
+
+# Long enough that the refresh thread stays asleep for the rest of the run
+PARKED = 3600.0
+
+
+def _count(conn):
+    return conn.execute('SELECT COUNT(*) FROM evaluations').fetchone()[0]
+
+
+def _wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.02)
+
+
+@pytest.fixture
+def store(backend, tmp_path):
+    if backend.name != 'sqlite':
+        pytest.skip("snapshots copy the SQLite file")
+    store = SnapshotStore(backend, str(tmp_path / 'analytics.db'), interval=PARKED)
+    yield store
+    # Stops a test's short TTL from refreshing for the rest of the session
+    store.interval = PARKED
+
+
+def test_snapshot_does_not_see_later_writes(store):
+    save_evaluation(1, 2, 4, 4, 4, 4, 'Before').result()
+    store.refresh()
+    snapshot = store.connection()
+    save_evaluation(1, 2, 3, 3, 3, 3, 'After').result()
+    assert (_count(snapshot), _count(get_connection())) == (1, 2)
+    with pytest.raises(sqlite3.OperationalError):
+        snapshot.execute("DELETE FROM evaluations")
+    # The next copy has it
+    store.refresh()
+    assert _count(store.connection()) == 2 and store.refreshes == 2
+
+
+def test_snapshot_refreshes_after_its_ttl(store):
+    store.interval = 0.2
+    _wait_for(lambda: store.connection() is not None)
+    first = store.taken_at
+    save_evaluation(1, 2, 4, 4, 4, 4, 'New').result()
+    _wait_for(lambda: _count(store.connection()) == 1)
+    assert store.taken_at > first and store.refreshes >= 2
+
+
+def test_fresh_snapshot_is_reused(store):
+    store.refresh()
+    again = SnapshotStore(store.backend, store.path, interval=PARKED)
+    assert again.connection() is not None and again.refreshes == 0
+
+
+def test_snapshots_are_sqlite_only(backend, tmp_path):
+    store = SnapshotStore(backend, str(tmp_path / 'analytics.db'), interval=PARKED)
+    assert store.enabled == (backend.name == 'sqlite')
+    assert SnapshotStore(backend, interval=0).connection() is None
@@ -0,0 +1,75 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from migrations import METRICS
+from repository import save_evaluation
+from trends import get_team_trends, period_window, trend_table
+
+LABELS = ('2026-01', '2026-02', '2026-03', '2026-04')
+
+
+def _means(*rows):
+    # (employee_id, bucket, score) rows, the same score for every metric
+    return pd.DataFrame([(employee_id, bucket, *[score] * len(METRICS)) for employee_id, bucket, score in rows],
+                        columns=['employee_id', 'bucket', *METRICS])
+
+
+def test_period_window():
+    assert period_window('month', 3, date(2026, 2, 15)) == (('2025-12', '2026-01', '2026-02'), '2025-12')
+    assert period_window('quarter', 4, date(2026, 5, 1)) == (('2025-Q3', '2025-Q4', '2026-Q1', '2026-Q2'),
+                                                             '2025-07')
+    with pytest.raises(ValueError):
+        period_window('week')
+
+
+def test_trend_table_slopes_rolling_averages_and_deltas():
+    table = trend_table(_means(
+        (1, '2025-12', 5.0),  # outside the window, ignored
+        (1, '2026-01', 1.0), (1, '2026-02', 2.0), (1, '2026-03', 3.0), (1, '2026-04', 4.0),
+        # A gap in March: the slope fits the scored months only
+        (2, '2026-01', 3.0), (2, '2026-02', 3.0), (2, '2026-04', 3.0),
+        # Too few points for a slope
+        (3, '2026-03', 2.0), (3, '2026-04', 4.0),
+    ), LABELS, window=3).set_index('employee_id')
+
+    assert table['periods'].tolist() == [4, 3, 2]
+    assert table['latest'].tolist() == ['2026-04'] * 3
+    assert table['score'].tolist() == pytest.approx([3.0, 3.0, 3.0])
+    assert table.loc[1, 'slope'] == pytest.approx(1.0)
+    assert table.loc[2, 'slope'] == pytest.approx(0.0)
+    assert np.isnan(table.loc[3, 'slope'])
+    assert table['delta'].tolist() == pytest.approx([1.0, 0.0, 2.0])
+    assert table['direction'].tolist() == ['improving', 'steady', 'steady']
+    for metric in METRICS:
+        assert table[f'{metric}_slope'].iloc[:2].tolist() == pytest.approx([1.0, 0.0])
+    # Everyone has the same rolling average, so no z-scores and no outliers
+    assert table['quality_z'].isna().all() and (table['outliers'] == '').all()
+
+    assert trend_table(_means(*[(1, label, i + 1.0) for i, label in enumerate(LABELS)]), LABELS,
+                       window=2)['score'].tolist() == pytest.approx([3.5])
+
+
+def test_trend_table_outliers():
+    means = _means(*[(employee_id, '2026-04', 3.0) for employee_id in range(1, 6)])
+    means.loc[4, ['quality', 'punctuality']] = [5.0, 1.0]
+    table = trend_table(means, LABELS)
+    assert table.loc[4, 'quality_z'] == pytest.approx(2.0)
+    assert table.loc[4, 'punctuality_z'] == pytest.approx(-2.0)
+    assert table['outliers'].tolist() == [''] * 4 + ['high quality, low punctuality']
+
+
+def test_trend_table_without_rows():
+    table = trend_table(_means(), LABELS)
+    assert table.empty and 'direction' in table.columns
+
+
+def test_team_trends(backend):
+    save_evaluation(1, 2, 4, 2, 5, 3, '').result()
+    save_evaluation(1, 2, 2, 4, 3, 5, '').result()
+    table = get_team_trends(2)
+    assert table['employee_id'].tolist() == [1]
+    assert table['latest'].tolist() == [period_window('month')[0][-1]]
+    assert table[[f'{metric}_avg' for metric in METRICS]].iloc[0].tolist() == pytest.approx([3, 3, 4, 4])
@@ -0,0 +1,152 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from analytics import PERIOD_BUCKETS, get_org_period_means
+from cache import cached_query
+from migrations import METRICS
+
+# Trends cover the last TREND_PERIODS buckets up to the current one. Every
+# statistic is computed for all employees at once on an
+# (employee, metric, period) array; the only Python loops run over periods
+# or metrics, never over employees.
+TREND_PERIODS = 12
+# Buckets in each rolling average
+ROLLING_WINDOW = 3
+# Fewest scored buckets a slope is fitted to
+MIN_POINTS = 3
+# Slope, in score points per bucket, past which someone counts as
+# improving or declining
+SLOPE_THRESHOLD = 0.05
+# |z| at or above this makes a metric an outlier within the subtree
+Z_THRESHOLD = 2.0
+
+_MONTHS = {'month': 1, 'quarter': 3, 'year': 12}
+assert set(_MONTHS) == set(PERIOD_BUCKETS)
+
+
+def _label(bucket, year, month):
+    if bucket == 'month':
+        return f'{year}-{month:02d}'
+    if bucket == 'quarter':
+        return f'{year}-Q{(month + 2) // 3}'
+    return str(year)
+
+
+def period_window(bucket, periods=TREND_PERIODS, day=None):
+    """The labels of the last ``periods`` buckets up to the one holding
+    ``day`` (today by default), oldest first, and the first month they
+    cover as 'YYYY-MM'."""
+    if bucket not in _MONTHS:
+        raise ValueError(f"Unknown bucket: {bucket}")
+    day = day or date.today()
+    step = _MONTHS[bucket]
+    # Months since year 0 at the start of the current bucket
+    current = day.year * 12 + (day.month - 1) // step * step
+    starts = [divmod(current - i * step, 12) for i in range(periods - 1, -1, -1)]
+    labels = tuple(_label(bucket, year, month + 1) for year, month in starts)
+    year, month = starts[0]
+    return labels, f'{year}-{month + 1:02d}'
+
+
+def _mean(values, axis):
+    # NaN-skipping mean that stays quiet (and NaN) on all-NaN slices
+    valid = ~np.isnan(values)
+    count = valid.sum(axis)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(valid, values, 0).sum(axis) / np.where(count, count, np.nan)
+
+
+def trend_table(means, labels, window=ROLLING_WINDOW):
+    """Trend statistics per employee from get_org_period_means rows.
+
+    ``labels`` are the bucket labels of the time axis, oldest first; rows
+    for other buckets are ignored. For each metric the result has the
+    rolling average over the last ``window`` buckets (``{m}_avg``), the
+    least-squares slope per bucket (``{m}_slope``), the change between the
+    last two scored buckets (``{m}_delta``) and the z-score of the rolling
+    average among everyone in the frame (``{m}_z``). ``score``, ``slope``
+    and ``delta`` average those over the metrics, ``direction`` classifies
+    the slope and ``outliers`` names the metrics with |z| >= Z_THRESHOLD.
+    """
+    labels = np.asarray(labels)
+    cols = pd.Index(labels).get_indexer(means['bucket'])
+    known = cols >= 0
+    rows, employees = pd.factorize(means['employee_id'].to_numpy()[known], sort=True)
+    cols = cols[known]
+
+    # Periods last, so every reduction below runs over contiguous memory
+    n_employees, n_periods, n_metrics = len(employees), len(labels), len(METRICS)
+    scores = np.full((n_employees, n_metrics, n_periods), np.nan)
+    scores[rows, :, cols] = means.loc[known, list(METRICS)].to_numpy(dtype=float)
+    valid = ~np.isnan(scores)
+    filled = np.where(valid, scores, 0.0)
+
+    # Rolling average of the trailing window
+    rolling = _mean(scores[..., -window:], axis=-1)
+
+    # Latest and previous scored bucket per employee and metric
+    position = np.where(valid, np.arange(n_periods), -1)
+    last = position.max(axis=-1)
+    previous = np.where(position == last[..., None], -1, position).max(axis=-1)
+
+    def at(index):
+        values = np.take_along_axis(scores, index.clip(min=0)[..., None], axis=-1)[..., 0]
+        return np.where(index >= 0, values, np.nan)
+    delta = at(last) - at(previous)
+
+    # Least-squares slope over the scored buckets only
+    count = valid.sum(axis=-1)
+    x = np.arange(n_periods, dtype=float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x_mean = (valid * x).sum(axis=-1) / count
+        y_mean = filled.sum(axis=-1) / count
+        dx = np.where(valid, x - x_mean[..., None], 0.0)
+        slope = (dx * (filled - y_mean[..., None])).sum(axis=-1) / (dx ** 2).sum(axis=-1)
+    slope[count < MIN_POINTS] = np.nan
+
+    # z-scores of the rolling averages across employees, per metric
+    center = _mean(rolling, axis=0)
+    spread = np.sqrt(_mean((rolling - center) ** 2, axis=0))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        z = (rolling - center) / np.where(spread > 0, spread, np.nan)
+
+    table = pd.DataFrame({
+        'employee_id': employees,
+        'periods': valid.any(axis=1).sum(axis=1),
+        'latest': labels[last.max(axis=1)] if n_employees else np.array([], dtype=str),
+        'score': _mean(rolling, axis=1),
+        'slope': _mean(slope, axis=1),
+        'delta': _mean(delta, axis=1),
+    })
+    table['direction'] = np.select([table['slope'] >= SLOPE_THRESHOLD, table['slope'] <= -SLOPE_THRESHOLD],
+                                   ['improving', 'declining'], 'steady')
+    outliers = pd.Series('', index=table.index)
+    for i, metric in enumerate(METRICS):
+        table[f'{metric}_avg'] = rolling[:, i]
+        table[f'{metric}_slope'] = slope[:, i]
+        table[f'{metric}_delta'] = delta[:, i]
+        table[f'{metric}_z'] = z[:, i]
+        outliers += np.select([z[:, i] >= Z_THRESHOLD, z[:, i] <= -Z_THRESHOLD],
+                              [f'high {metric}, ', f'low {metric}, '], '')
+    table['outliers'] = outliers.str.removesuffix(', ')
+    return table
+
+
+@cached_query('evaluations')
+def _team_trends(manager_id, bucket, labels, start, window):
+    means = get_org_period_means(manager_id, bucket, start)
+    return trend_table(means, labels, window)
+
+
+def get_team_trends(manager_id, bucket='month', periods=TREND_PERIODS, window=ROLLING_WINDOW, day=None):
+    """trend_table for everyone evaluated in the subtree of ``manager_id``
+    over the last ``periods`` buckets.
+
+    Cached per time window, so a new month, quarter or year starts a fresh
+    entry; like the org roll-ups it is unscoped, since a write by any
+    manager below may change it.
+    """
+    labels, start = period_window(bucket, periods, day)
+    return _team_trends(int(manager_id), bucket, labels, start, window)
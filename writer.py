@@ -0,0 +1,229 @@
+import atexit
+import contextvars
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future, wait
+from contextlib import contextmanager
+
+from cache import query_cache
+from db import backend, get_connection
+from log import get_logger
+
+# Writes go through one background thread unless PERF_WRITE_BEHIND=0, in
+# which case they run inline in the caller's thread (scripts, debugging).
+ENABLED = os.environ.get('PERF_WRITE_BEHIND', '1').lower() not in ('0', 'false', 'no', 'off')
+# Most writes per transaction, and how long the writer waits for more to
+# arrive after the first before committing.
+MAX_BATCH = int(os.environ.get('PERF_WRITE_BATCH', '64'))
+BATCH_WINDOW_MS = float(os.environ.get('PERF_WRITE_WINDOW_MS', '2'))
+# Longest a read waits for its session's queued writes before going ahead
+WAIT_TIMEOUT = 10.0
+# Failed writes kept per session until the UI reports them
+MAX_FAILURES = 20
+
+log = get_logger('writer')
+
+_STOP = object()
+_session = contextvars.ContextVar('write_session', default=None)
+
+
+@contextmanager
+def write_session(key):
+    """Tag writes submitted inside the block with ``key``.
+
+    Reads made under the same key wait for those writes first, which gives
+    one browser session read-your-writes without slowing down the others.
+    """
+    token = _session.set(key)
+    try:
+        yield
+    finally:
+        _session.reset(token)
+
+
+class _Job:
+    __slots__ = ('work', 'invalidate', 'on_commit', 'future')
+
+    def __init__(self, work, invalidate, on_commit):
+        self.work = work
+        self.invalidate = invalidate
+        self.on_commit = on_commit
+        self.future = Future()
+
+
+class WriteQueue:
+    """Serializes writes through a single thread and connection.
+
+    Callers submit ``work(conn)`` and get a Future right away. The writer
+    thread takes whatever is queued, up to ``max_batch`` jobs, and runs
+    them in one transaction, each inside its own savepoint so a failing
+    job is rolled back alone. Futures resolve once the batch commits.
+    With one writer there is no lock contention between sessions, and a
+    batch costs one commit instead of one per write.
+    """
+
+    def __init__(self, backend, max_batch=MAX_BATCH, window_ms=BATCH_WINDOW_MS, enabled=ENABLED):
+        self.backend = backend
+        self.max_batch = max_batch
+        self.window = window_ms / 1000
+        self.enabled = enabled
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pending = defaultdict(set)
+        self._failures = defaultdict(list)
+        self.batches = self.writes = 0
+
+    def submit(self, work, invalidate=None, on_commit=None):
+        """Queue ``work(conn)`` and return a Future for its result.
+
+        ``invalidate`` is the ``(table, employee_id, manager_id)`` the write
+        touches; matching cache entries are evicted now, so reads fall
+        through to the database, and again after the commit.
+        ``on_commit(result)`` runs on the writer thread after the commit.
+        """
+        job = _Job(work, invalidate, on_commit)
+        if invalidate:
+            query_cache.invalidate(*invalidate)
+        key = _session.get()
+        with self._lock:
+            self._pending[key].add(job.future)
+        job.future.add_done_callback(lambda future: self._settle(key, future))
+        if self.enabled:
+            self._ensure_started()
+            self._queue.put(job)
+        else:
+            self._run_batch(get_connection(), [job])
+        return job.future
+
+    def _settle(self, key, future):
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is not None:
+                pending.discard(future)
+                if not pending:
+                    del self._pending[key]
+            if future.exception() is not None:
+                failures = self._failures[key]
+                failures.append(future.exception())
+                del failures[:-MAX_FAILURES]
+
+    def wait(self, timeout=WAIT_TIMEOUT):
+        """Block until the current session's queued writes have committed."""
+        key = _session.get()
+        with self._lock:
+            pending = list(self._pending.get(key, ()))
+        if pending:
+            _, not_done = wait(pending, timeout)
+            if not_done:
+                log.warning('write_wait_timeout', pending=len(not_done), timeout=timeout)
+
+    def take_failures(self):
+        """Errors from the current session's failed writes, oldest first;
+        each is returned once."""
+        with self._lock:
+            return self._failures.pop(_session.get(), [])
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name='perf-writer', daemon=True)
+                self._thread.start()
+
+    def _loop(self):
+        conn = self.backend.connect()
+        try:
+            while True:
+                batch, stop = self._next_batch()
+                if batch:
+                    self._run_batch(conn, batch)
+                if stop:
+                    return
+        finally:
+            conn.close()
+
+    def _next_batch(self):
+        job = self._queue.get()
+        if job is _STOP:
+            return [], True
+        batch = [job]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            try:
+                job = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                break
+            if job is _STOP:
+                return batch, True
+            batch.append(job)
+        return batch, False
+
+    def _run_batch(self, conn, batch):
+        started = time.perf_counter()
+        outcomes = []
+        try:
+            with self.backend.transaction(conn):
+                for job in batch:
+                    conn.execute('SAVEPOINT write_job')
+                    try:
+                        outcomes.append((True, job.work(conn)))
+                    except Exception as e:
+                        conn.execute('ROLLBACK TO SAVEPOINT write_job')
+                        outcomes.append((False, e))
+                    conn.execute('RELEASE SAVEPOINT write_job')
+        except Exception as e:
+            # The commit itself failed, so nothing in the batch was written
+            log.exception('write_batch_failed', size=len(batch))
+            for job in batch:
+                job.future.set_exception(e)
+            return
+        with self._lock:
+            self.batches += 1
+            self.writes += len(batch)
+        log.debug('write_batch', size=len(batch), ms=round((time.perf_counter() - started) * 1000, 2))
+        for job, (ok, value) in zip(batch, outcomes):
+            if not ok:
+                log.error('write_failed', error=repr(value))
+                job.future.set_exception(value)
+                continue
+            if job.invalidate:
+                query_cache.invalidate(*job.invalidate)
+            if job.on_commit:
+                try:
+                    job.on_commit(value)
+                except Exception:
+                    log.exception('write_on_commit_failed')
+            job.future.set_result(value)
+
+    def flush(self, timeout=None):
+        """Wait for every write queued so far, from any session."""
+        with self._lock:
+            pending = [f for futures in self._pending.values() for f in futures]
+        wait(pending, timeout)
+
+    def stop(self, timeout=None):
+        # Drains the queue first; registered with atexit so queued writes
+        # are not lost when the process exits
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+
+write_queue = WriteQueue(backend)
+atexit.register(write_queue.stop)
+
+
+def submit(work, invalidate=None, on_commit=None):
+    return write_queue.submit(work, invalidate, on_commit)
+
+
+def wait_for_writes(timeout=WAIT_TIMEOUT):
+    write_queue.wait(timeout)
+
+
+def take_failed_writes():
+    return write_queue.take_failures()